@@ -0,0 +1,101 @@
+"""
+Equivalence check of the price attributes with their reference implementation.
+Developed and maintained by Javisen.
+
+Usage:
+    python benchmarks/check_price_attributes.py
+
+For hourly prices of today (and tomorrow), the attributes at each hour
+of the day must be the same, key order included, with and without
+the cache of day statistics, on regular and DST days.
+The exit code is 1 if any case is different.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Iterator
+from datetime import timedelta
+from pathlib import Path
+
+_REPO_ROOT = Path(__file__).resolve().parents[1]
+# the library is imported alone, as the integration package needs Home Assistant
+sys.path.insert(0, str(_REPO_ROOT / "custom_components" / "pvpc_pro"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from aiopvpc.const import KEY_INJECTION, KEY_PVPC, REFERENCE_TZ  # noqa: E402
+from aiopvpc.parser import extract_prices_from_esios_token  # noqa: E402
+from aiopvpc.prices import PriceStatsCache, make_price_sensor_attributes  # noqa: E402
+from aiopvpc.series import PriceSeries  # noqa: E402
+from fixtures import (  # noqa: E402
+    DST_LONG_DAY,
+    DST_SHORT_DAY,
+    REGULAR_DAY,
+    make_indicator_payload,
+)
+from price_attributes_reference import (  # noqa: E402
+    make_price_sensor_attributes_reference,
+)
+
+Case = tuple[str, str, PriceSeries]
+
+
+def iter_corpus() -> Iterator[Case]:
+    """Iterate over the cases to check: (name, sensor key, hourly prices)."""
+    # the DST days, as today and as tomorrow
+    days = (
+        REGULAR_DAY,
+        DST_SHORT_DAY,
+        DST_SHORT_DAY - timedelta(days=1),
+        DST_LONG_DAY,
+        DST_LONG_DAY - timedelta(days=1),
+    )
+    for day in days:
+        for num_days in (1, 2):
+            payload = make_indicator_payload(1001, day, num_days, (8741,), 60)
+            for sensor_key in (KEY_PVPC, KEY_INJECTION):
+                prices = extract_prices_from_esios_token(
+                    payload, sensor_key, "Península", look_back=False
+                ).series[sensor_key]
+                yield f"{day}_{num_days}day_{sensor_key}", sensor_key, prices
+
+
+def main() -> int:
+    """Check all the cases of the corpus, and time both implementations."""
+    failures = 0
+    elapsed = {"reference": 0.0, "current": 0.0}
+    for name, sensor_key, prices in iter_corpus():
+        first_day = prices.first_timestamp.astimezone(REFERENCE_TZ).date()
+        price_dict = dict(prices.items())
+        stats_cache = PriceStatsCache()
+        for utc_time in prices:
+            if utc_time.astimezone(REFERENCE_TZ).date() != first_day:
+                continue
+            start = time.perf_counter()
+            expected = make_price_sensor_attributes_reference(
+                sensor_key, price_dict, utc_time, REFERENCE_TZ
+            )
+            elapsed["reference"] += time.perf_counter() - start
+            start = time.perf_counter()
+            results = [
+                make_price_sensor_attributes(
+                    sensor_key, prices, utc_time, REFERENCE_TZ, cache
+                )
+                for cache in (None, stats_cache)
+            ]
+            elapsed["current"] += (time.perf_counter() - start) / len(results)
+            for result in results:
+                if list(result.items()) != list(expected.items()):
+                    print(f"{name} at {utc_time.isoformat()}: different attributes")
+                    failures += 1
+
+    print(
+        f"reference: {1000 * elapsed['reference']:.1f} ms, "
+        f"current: {1000 * elapsed['current']:.1f} ms, failures: {failures}"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Equivalence check of the ESIOS token parser with its reference implementation.
+Developed and maintained by Javisen.
+
+Usage:
+    python benchmarks/check_token_parser.py
+
+Each case of the corpus is parsed with both parsers, and the results
+(series start, step and values, with the gaps) must be the same.
+The exit code is 1 if any case is different.
+"""
+
+from __future__ import annotations
+
+import copy
+import sys
+import time
+from collections.abc import Iterator
+from datetime import date
+from pathlib import Path
+from typing import Any
+import zoneinfo
+
+_REPO_ROOT = Path(__file__).resolve().parents[1]
+# the library is imported alone, as the integration package needs Home Assistant
+sys.path.insert(0, str(_REPO_ROOT / "custom_components" / "pvpc_pro"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from aiopvpc.const import (  # noqa: E402
+    KEY_ADJUSTMENT,
+    KEY_CO2,
+    KEY_DEMAND,
+    KEY_INJECTION,
+    KEY_PVPC,
+    KEY_RENEWABLES,
+    EsiosResponse,
+)
+from aiopvpc.parser import extract_prices_from_esios_token  # noqa: E402
+from fixtures import (  # noqa: E402
+    ALL_GEO_IDS,
+    DST_LONG_DAY,
+    DST_SHORT_DAY,
+    REGULAR_DAY,
+    make_indicator_payload,
+)
+from token_parser_reference import (  # noqa: E402
+    extract_prices_from_esios_token_reference,
+)
+
+Case = tuple[str, dict[str, Any], str, str, zoneinfo.ZoneInfo]
+
+_MADRID = zoneinfo.ZoneInfo("Europe/Madrid")
+_CANARY = zoneinfo.ZoneInfo("Atlantic/Canary")
+
+
+def _with_values(payload: dict[str, Any], values: list[dict[str, Any]]):
+    return {"indicator": {**payload["indicator"], "values": values}}
+
+
+def iter_corpus() -> Iterator[Case]:
+    """Iterate over the cases to check: (name, data, sensor key, geo zone, tz)."""
+    for day in (REGULAR_DAY, DST_SHORT_DAY, DST_LONG_DAY):
+        for geo_ids in ((8741,), ALL_GEO_IDS):
+            for step_minutes in (60, 15):
+                payload = make_indicator_payload(1001, day, 1, geo_ids, step_minutes)
+                for geo_zone in ("Península", "Canarias", "Ceuta"):
+                    for tz in (_MADRID, _CANARY):
+                        yield (
+                            f"{day}_{len(geo_ids)}geo_{step_minutes}min_{geo_zone}_{tz}",
+                            payload,
+                            KEY_PVPC,
+                            geo_zone,
+                            tz,
+                        )
+
+    range_payload = make_indicator_payload(1001, date(2025, 3, 20), 20, ALL_GEO_IDS)
+    yield "20day_range", range_payload, KEY_PVPC, "Baleares", _MADRID
+    yield "no_values", _with_values(range_payload, []), KEY_PVPC, "Península", _MADRID
+
+    base = make_indicator_payload(1739, REGULAR_DAY, 1, (8741, 8742), 60)
+    values = base["indicator"]["values"]
+    yield "injection", base, KEY_INJECTION, "Península", _MADRID
+    yield "adjustment", base, KEY_ADJUSTMENT, "Península", _MADRID
+    yield "missing_zone", base, KEY_PVPC, "Melilla", _MADRID
+    yield "reversed", _with_values(base, values[::-1]), KEY_PVPC, "Península", _MADRID
+    yield "gaps", _with_values(base, values[::3]), KEY_PVPC, "Canarias", _MADRID
+    yield "single_value", _with_values(base, values[:1]), KEY_PVPC, "Península", _MADRID
+    yield (
+        "none_values",
+        _with_values(base, [{**item, "value": None} for item in values[:5]]),
+        KEY_PVPC,
+        "Península",
+        _MADRID,
+    )
+    yield (
+        "repeated_times",
+        _with_values(base, values[:4] + [{**values[2], "value": 1.0}]),
+        KEY_PVPC,
+        "Península",
+        _MADRID,
+    )
+    yield (
+        "unknown_and_historic_geo",
+        _with_values(
+            base,
+            [{**item, "geo_id": 9999} for item in values[:6]]
+            + [{**item, "geo_id": 3, "value": 7.0} for item in values[:6]],
+        ),
+        KEY_PVPC,
+        "Canarias",
+        _MADRID,
+    )
+    yield (
+        "historic_and_current_geo",
+        _with_values(
+            base, [{**item, "geo_id": 3, "value": 7.0} for item in values[:6]] + values
+        ),
+        KEY_PVPC,
+        "Península",
+        _MADRID,
+    )
+    yield (
+        "utc_and_no_millis",
+        _with_values(
+            base,
+            [
+                (
+                    {**item, "datetime": item["datetime_utc"]}
+                    if i % 2
+                    else {**item, "datetime": item["datetime"].replace(".000", "")}
+                )
+                for i, item in enumerate(values)
+            ],
+        ),
+        KEY_PVPC,
+        "Península",
+        _MADRID,
+    )
+    for sensor_key, scale in (
+        (KEY_CO2, 0.1),
+        (KEY_CO2, 10.0),
+        (KEY_RENEWABLES, 0.01),
+        (KEY_DEMAND, 300.0),
+    ):
+        yield (
+            f"{sensor_key}_{scale}",
+            _with_values(
+                base,
+                [{**item, "value": round(item["value"] * scale, 4)} for item in values],
+            ),
+            sensor_key,
+            "Península",
+            _MADRID,
+        )
+
+
+def _series_state(response: EsiosResponse, sensor_key: str) -> tuple[Any, ...]:
+    series = response.series[sensor_key]
+    return (
+        response.name,
+        response.data_id,
+        response.unit,
+        tuple(response.series),
+        series.raw_epochs(),
+        repr(list(series.raw_values())),
+    )
+
+
+def main() -> int:
+    """Check all the cases of the corpus, and time both parsers."""
+    failures = 0
+    elapsed = {"reference": 0.0, "current": 0.0}
+    for name, data, sensor_key, geo_zone, tz in iter_corpus():
+        # the reference parser takes the 'indicator' out of its input
+        expected_data = copy.deepcopy(data)
+        start = time.perf_counter()
+        expected = extract_prices_from_esios_token_reference(
+            expected_data, sensor_key, geo_zone, tz, look_back=False
+        )
+        elapsed["reference"] += time.perf_counter() - start
+        current_data = copy.deepcopy(data)
+        start = time.perf_counter()
+        result = extract_prices_from_esios_token(
+            current_data, sensor_key, geo_zone, tz, look_back=False
+        )
+        elapsed["current"] += time.perf_counter() - start
+        if current_data != data:
+            print(f"{name}: input data modified")
+            failures += 1
+        if _series_state(result, sensor_key) != _series_state(expected, sensor_key):
+            print(f"{name}: different result")
+            failures += 1
+
+    print(
+        f"reference: {1000 * elapsed['reference']:.1f} ms, "
+        f"current: {1000 * elapsed['current']:.1f} ms, failures: {failures}"
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Synthetic ESIOS payloads for the benchmarks of PVPC REE Data.
+Developed and maintained by Javisen.
+
+Payloads follow the shape of the real API responses, with deterministic values,
+so the timings of different versions can be compared.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+import zoneinfo
+
+REFERENCE_TZ = zoneinfo.ZoneInfo("Europe/Madrid")
+UTC_TZ = zoneinfo.ZoneInfo("UTC")
+
+# Península, Canarias, Baleares, Ceuta, Melilla
+ALL_GEO_IDS = (8741, 8742, 8743, 8744, 8745)
+# days with 23 and 25 hours, with the DST changes in Spain
+DST_SHORT_DAY = date(2025, 3, 30)
+DST_LONG_DAY = date(2025, 10, 26)
+REGULAR_DAY = date(2025, 11, 18)
+
+
+def iter_day_steps(day: date, step_minutes: int = 60) -> Iterable[datetime]:
+    """Iterate over the UTC times of the steps of a local day in Spain."""
+    ts = datetime(day.year, day.month, day.day, tzinfo=REFERENCE_TZ).astimezone(UTC_TZ)
+    next_day = day + timedelta(days=1)
+    end = datetime(
+        next_day.year, next_day.month, next_day.day, tzinfo=REFERENCE_TZ
+    ).astimezone(UTC_TZ)
+    while ts < end:
+        yield ts
+        ts += timedelta(minutes=step_minutes)
+
+
+def _make_value(index: int, seed: int) -> float:
+    """Return a deterministic price-like value (€/MWh) with a daily shape."""
+    return round(60.0 + 45.0 * ((index * 7 + seed * 13) % 24) / 23 + seed % 5, 2)
+
+
+def make_public_archive_day(day: date, step_minutes: int = 60) -> dict[str, Any]:
+    """Make the daily json file of PVPC prices, as in the public archive."""
+    rows = []
+    for i, _ in enumerate(iter_day_steps(day, step_minutes)):
+        rows.append(
+            {
+                "Dia": day.strftime("%d/%m/%Y"),
+                "Hora": f"{i:02d}-{i + 1:02d}",
+                "PCB": f"{_make_value(i, 1) + 50:.2f}".replace(".", ","),
+                "CYM": f"{_make_value(i, 2) + 50:.2f}".replace(".", ","),
+            }
+        )
+    return {"PVPC": rows}
+
+
+def make_indicator_payload(
+    indicator_id: int,
+    first_day: date,
+    num_days: int = 1,
+    geo_ids: Iterable[int] = (8741,),
+    step_minutes: int = 60,
+    name: str = "Indicator",
+) -> dict[str, Any]:
+    """Make the json of an indicator, as downloaded with a token."""
+    geo_ids = tuple(geo_ids)
+    values = []
+    for geo_id in geo_ids:
+        index = 0
+        for day_offset in range(num_days):
+            day = first_day + timedelta(days=day_offset)
+            for ts in iter_day_steps(day, step_minutes):
+                values.append(
+                    {
+                        "value": _make_value(index, geo_id + day_offset),
+                        "datetime": ts.astimezone(REFERENCE_TZ).isoformat(
+                            timespec="milliseconds"
+                        ),
+                        "datetime_utc": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        "tz_time": ts.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                        "geo_id": geo_id,
+                        "geo_name": str(geo_id),
+                    }
+                )
+                index += 1
+    return {
+        "indicator": {
+            "name": name,
+            "short_name": name,
+            "id": indicator_id,
+            "composited": False,
+            "step_type": "linear",
+            "disaggregated": len(geo_ids) > 1,
+            "values_updated_at": datetime.now(REFERENCE_TZ).isoformat(
+                timespec="milliseconds"
+            ),
+            "values": values,
+            "geos": [{"geo_id": geo_id, "geo_name": str(geo_id)} for geo_id in geo_ids],
+        }
+    }
+
+
+class FakeContent:
+    """Body of a fake response, readable in chunks."""
+
+    def __init__(self, body: bytes) -> None:
+        """Set up the body."""
+        self._body = body
+
+    async def iter_chunked(self, size: int):
+        """Iterate over the body in chunks."""
+        for i in range(0, len(self._body), size):
+            yield self._body[i : i + size]
+
+
+class FakeResponse:
+    """Response of `FakeSession`, with the parts of aiohttp used by PVPCData."""
+
+    def __init__(self, status: int, payload: dict[str, Any] | None = None) -> None:
+        """Set up the response."""
+        self.status = status
+        self.headers: dict[str, str] = {}
+        self._body = json.dumps(payload).encode() if payload is not None else b""
+        self.content = FakeContent(self._body)
+
+    async def read(self) -> bytes:
+        """Return the whole body."""
+        return self._body
+
+    async def json(self) -> Any:
+        """Return the decoded body."""
+        return json.loads(self._body)
+
+    def release(self) -> None:
+        """Release the response."""
+
+
+class FakeSession:
+    """
+    Fake aiohttp session serving synthetic ESIOS payloads by URL.
+
+    Payloads are encoded once per URL, so the timings measure the client.
+    """
+
+    def __init__(self, step_minutes: int = 60) -> None:
+        """Set up the session."""
+        self.step_minutes = step_minutes
+        self.num_requests = 0
+        self._payloads: dict[str, dict[str, Any]] = {}
+
+    def _make_payload(self, url: str) -> dict[str, Any]:
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        if "/archives/" in parts.path:
+            return make_public_archive_day(
+                date.fromisoformat(query["date"][0]), self.step_minutes
+            )
+        first_day = date.fromisoformat(query["start_date"][0][:10])
+        last_day = date.fromisoformat(query["end_date"][0][:10])
+        geo_ids = [int(geo_id) for geo_id in query.get("geo_ids[]", ALL_GEO_IDS)]
+        return make_indicator_payload(
+            int(parts.path.rsplit("/", 1)[-1]),
+            first_day,
+            (last_day - first_day).days + 1,
+            geo_ids,
+            self.step_minutes,
+        )
+
+    async def get(self, url: str, headers: dict[str, str] | None = None, **kwargs):
+        """Return the payload for a URL."""
+        self.num_requests += 1
+        if url not in self._payloads:
+            self._payloads[url] = self._make_payload(url)
+        return FakeResponse(200, self._payloads[url])
@@ -0,0 +1,428 @@
+"""
+Benchmarks of the ESIOS API handler of PVPC REE Data: fetch, parse, compose
+and attributes, with synthetic payloads.
+Developed and maintained by Javisen.
+
+Usage:
+    python benchmarks/run.py [--output results.json] [--compare baseline.json]
+
+With `--compare`, cases slower than the baseline by more than `--threshold`
+are reported, and the exit code is 1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+_REPO_ROOT = Path(__file__).resolve().parents[1]
+# the library is imported alone, as the integration package needs Home Assistant
+sys.path.insert(0, str(_REPO_ROOT / "custom_components" / "pvpc_pro"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from aiopvpc import EsiosApiData, PVPCData  # noqa: E402
+from aiopvpc.const import (  # noqa: E402
+    KEY_ADJUSTMENT,
+    KEY_CO2,
+    KEY_DEMAND,
+    KEY_INJECTION,
+    KEY_MAG,
+    KEY_OMIE,
+    KEY_PVPC,
+    KEY_RENEWABLES,
+)
+from aiopvpc.parser import (  # noqa: E402
+    extract_prices_from_esios_public,
+    extract_prices_from_esios_token,
+)
+from aiopvpc.prices import (  # noqa: E402
+    PriceStatsCache,
+    add_composed_price_sensors,
+    make_price_sensor_attributes,
+)
+from aiopvpc.pvpc_tariff import get_current_and_next_tariff_periods  # noqa: E402
+from fixtures import (  # noqa: E402
+    ALL_GEO_IDS,
+    DST_LONG_DAY,
+    DST_SHORT_DAY,
+    REFERENCE_TZ,
+    REGULAR_DAY,
+    UTC_TZ,
+    FakeSession,
+    make_indicator_payload,
+    make_public_archive_day,
+)
+
+ALL_API_KEYS = (
+    KEY_PVPC,
+    KEY_INJECTION,
+    KEY_MAG,
+    KEY_OMIE,
+    KEY_ADJUSTMENT,
+    KEY_CO2,
+    KEY_DEMAND,
+    KEY_RENEWABLES,
+)
+DEFAULT_THRESHOLD = 1.25
+
+
+@dataclass
+class BenchResult:
+    """Timings of a benchmark case, in milliseconds per call."""
+
+    name: str
+    calls: int
+    repeat: int
+    min_ms: float
+    median_ms: float
+    mean_ms: float
+
+
+def _make_result(name: str, calls: int, timings: list[float]) -> BenchResult:
+    per_call = [1000 * t / calls for t in timings]
+    return BenchResult(
+        name=name,
+        calls=calls,
+        repeat=len(per_call),
+        min_ms=round(min(per_call), 4),
+        median_ms=round(statistics.median(per_call), 4),
+        mean_ms=round(statistics.fmean(per_call), 4),
+    )
+
+
+def bench(
+    name: str,
+    func: Callable[[], Any],
+    calls: int,
+    repeat: int,
+    setup: Callable[[], Any] | None = None,
+) -> BenchResult:
+    """
+    Time `calls` runs of `func`, `repeat` times.
+
+    The optional `setup` runs before each call, out of the timing,
+    and its result is passed to `func`.
+    """
+    timings = []
+    for _ in range(repeat):
+        elapsed = 0.0
+        for _ in range(calls):
+            if setup is None:
+                start = time.perf_counter()
+                func()
+            else:
+                arg = setup()
+                start = time.perf_counter()
+                func(arg)
+            elapsed += time.perf_counter() - start
+        timings.append(elapsed)
+    return _make_result(name, calls, timings)
+
+
+def bench_async(
+    name: str,
+    func: Callable[[int], Awaitable[Any]],
+    calls: int,
+    repeat: int,
+) -> BenchResult:
+    """Time `calls` awaits of `func(i)`, `repeat` times, in one event loop."""
+
+    async def _run() -> list[float]:
+        timings = []
+        counter = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(calls):
+                await func(counter)
+                counter += 1
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    return _make_result(name, calls, asyncio.run(_run()))
+
+
+def _local_noon(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, 12, tzinfo=REFERENCE_TZ).astimezone(
+        UTC_TZ
+    )
+
+
+def _bench_parse_public(scale: int) -> list[BenchResult]:
+    results = []
+    cases = {
+        "regular": (REGULAR_DAY, 60),
+        "dst_23h": (DST_SHORT_DAY, 60),
+        "dst_25h": (DST_LONG_DAY, 60),
+        "15min": (REGULAR_DAY, 15),
+    }
+    for case, (day, step_minutes) in cases.items():
+        payload = make_public_archive_day(day, step_minutes)
+        results.append(
+            bench(
+                f"parse_public[{case}]",
+                lambda: extract_prices_from_esios_public(payload, "PCB"),
+                calls=50 * scale,
+                repeat=5,
+            )
+        )
+    return results
+
+
+def _bench_parse_token(scale: int) -> list[BenchResult]:
+    results = []
+    cases = {
+        "1day_1geo": (REGULAR_DAY, 1, (8741,), 60),
+        "1day_5geo": (REGULAR_DAY, 1, ALL_GEO_IDS, 60),
+        "dst_23h_5geo": (DST_SHORT_DAY, 1, ALL_GEO_IDS, 60),
+        "dst_25h_5geo": (DST_LONG_DAY, 1, ALL_GEO_IDS, 60),
+        "2day_1geo_15min": (REGULAR_DAY, 2, (8741,), 15),
+        "2day_5geo_15min": (REGULAR_DAY, 2, ALL_GEO_IDS, 15),
+        "31day_1geo": (REGULAR_DAY, 31, (8741,), 60),
+    }
+    for case, (day, num_days, geo_ids, step_minutes) in cases.items():
+        payload = make_indicator_payload(1001, day, num_days, geo_ids, step_minutes)
+        indicator = payload["indicator"]
+        results.append(
+            bench(
+                f"parse_token[{case}]",
+                # a new input for each call, as the parser used to take the
+                # 'indicator' out of it, to compare with the old results
+                lambda data: extract_prices_from_esios_token(
+                    data, KEY_PVPC, "Península", look_back=False
+                ),
+                calls=max(1, 20 * scale // num_days),
+                repeat=5,
+                setup=lambda: {"indicator": indicator},
+            )
+        )
+    return results
+
+
+def _make_api_data(
+    day: date, num_days: int, pvpc_step: int, adjustment_step: int
+) -> EsiosApiData:
+    sensors = {}
+    for key, indicator_id, step_minutes in (
+        (KEY_PVPC, 1001, pvpc_step),
+        (KEY_ADJUSTMENT, 2108, adjustment_step),
+    ):
+        sensors[key] = extract_prices_from_esios_token(
+            make_indicator_payload(indicator_id, day, num_days, (8741,), step_minutes),
+            key,
+            "Península",
+            look_back=False,
+        ).series[key]
+    return EsiosApiData(
+        last_update=_local_noon(day),
+        data_source="esios",
+        sensors=sensors,
+        availability=dict.fromkeys(sensors, True),
+    )
+
+
+def _bench_compose(scale: int) -> list[BenchResult]:
+    results = []
+    cases = {
+        "2day_hourly": (2, 60, 60),
+        "2day_15min_hourly": (2, 15, 60),
+        "2day_15min": (2, 15, 15),
+    }
+    for case, (num_days, pvpc_step, adjustment_step) in cases.items():
+        data = _make_api_data(REGULAR_DAY, num_days, pvpc_step, adjustment_step)
+        results.append(
+            bench(
+                f"compose_indexed[{case}]",
+                lambda: add_composed_price_sensors(data),
+                calls=20 * scale,
+                repeat=5,
+            )
+        )
+    return results
+
+
+def _bench_attributes(scale: int) -> list[BenchResult]:
+    results = []
+    cases = {
+        "hourly": (REGULAR_DAY, 60),
+        "hourly_dst_25h": (DST_LONG_DAY, 60),
+        "15min": (REGULAR_DAY, 15),
+    }
+    for case, (day, step_minutes) in cases.items():
+        utc_time = _local_noon(day)
+        prices = extract_prices_from_esios_token(
+            make_indicator_payload(1001, day, 2, (8741,), step_minutes),
+            KEY_PVPC,
+            "Península",
+            look_back=False,
+        ).series[KEY_PVPC]
+        results.append(
+            bench(
+                f"attributes[{case}]",
+                lambda: make_price_sensor_attributes(
+                    KEY_PVPC, prices, utc_time, REFERENCE_TZ
+                ),
+                calls=50 * scale,
+                repeat=5,
+            )
+        )
+        stats_cache = PriceStatsCache()
+        results.append(
+            bench(
+                f"attributes_cached[{case}]",
+                lambda: make_price_sensor_attributes(
+                    KEY_PVPC, prices, utc_time, REFERENCE_TZ, stats_cache
+                ),
+                calls=50 * scale,
+                repeat=5,
+            )
+        )
+    return results
+
+
+def _bench_tariff_periods(scale: int) -> list[BenchResult]:
+    start = datetime(2025, 1, 1, tzinfo=REFERENCE_TZ).astimezone(UTC_TZ)
+    year_hours = [
+        (start + timedelta(hours=i)).astimezone(REFERENCE_TZ) for i in range(8760)
+    ]
+
+    def _year_periods() -> None:
+        for local_ts in year_hours:
+            get_current_and_next_tariff_periods(local_ts, False)
+
+    return [bench("tariff_periods[year_hourly]", _year_periods, calls=scale, repeat=5)]
+
+
+def _bench_update_all(scale: int) -> list[BenchResult]:
+    results = []
+    # in the evening, with prices for today and tomorrow
+    utc_now = datetime(
+        REGULAR_DAY.year, REGULAR_DAY.month, REGULAR_DAY.day, 21, tzinfo=REFERENCE_TZ
+    ).astimezone(UTC_TZ)
+    cases = {
+        "public_pvpc": ("esios_public", (KEY_PVPC,), 60),
+        "public_pvpc_15min": ("esios_public", (KEY_PVPC,), 15),
+        "token_all": ("esios", ALL_API_KEYS, 60),
+        "token_all_15min": ("esios", ALL_API_KEYS, 15),
+    }
+    for case, (data_source, sensor_keys, step_minutes) in cases.items():
+        session = FakeSession(step_minutes)
+
+        async def _update(
+            i: int, data_source=data_source, sensor_keys=sensor_keys, session=session
+        ) -> EsiosApiData:
+            # a new handler (and token) each time, to download everything
+            handler = PVPCData(
+                session=session,
+                data_source=data_source,
+                api_token=f"bench-{i}" if data_source == "esios" else None,
+                sensor_keys=sensor_keys,
+            )
+            return await handler.async_update_all(None, utc_now)
+
+        results.append(
+            bench_async(f"update_all[{case}]", _update, calls=5 * scale, repeat=5)
+        )
+    return results
+
+
+BENCHMARKS: dict[str, Callable[[int], list[BenchResult]]] = {
+    "parse_public": _bench_parse_public,
+    "parse_token": _bench_parse_token,
+    "compose": _bench_compose,
+    "attributes": _bench_attributes,
+    "tariff_periods": _bench_tariff_periods,
+    "update_all": _bench_update_all,
+}
+
+
+def _get_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=_REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(
+    results: list[dict[str, Any]],
+    baseline: list[dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[str]:
+    """Print the ratio of median timings to a baseline, and return the regressions."""
+    baseline_by_name = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        if (base := baseline_by_name.get(result["name"])) is None:
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        flag = ""
+        if ratio > threshold:
+            flag = "  << slower"
+            regressions.append(result["name"])
+        print(
+            f"{result['name']:<40} {base['median_ms']:>10.3f} "
+            f"{result['median_ms']:>10.3f} ms  x{ratio:.2f}{flag}"
+        )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", type=Path, help="json file for the results")
+    parser.add_argument("--compare", type=Path, help="json results to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument(
+        "--only", nargs="+", choices=sorted(BENCHMARKS), help="groups to run"
+    )
+    parser.add_argument(
+        "--scale", type=int, default=1, help="multiplier of the calls of each case"
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    for group, run_group in BENCHMARKS.items():
+        if args.only and group not in args.only:
+            continue
+        for result in run_group(args.scale):
+            print(f"{result.name:<40} {result.median_ms:>10.3f} ms")
+            results.append(asdict(result))
+
+    report = {
+        "meta": {
+            "revision": _get_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(UTC_TZ).isoformat(timespec="seconds"),
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+        print(f"\n{'case':<40} {'baseline':>10} {'current':>10}")
+        if compare_results(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
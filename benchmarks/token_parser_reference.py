@@ -0,0 +1,112 @@
+"""
+Reference parser of ESIOS token data, for the equivalence checks of the benchmarks.
+Developed and maintained by Javisen.
+
+It is the previous `extract_prices_from_esios_token`, with sort and groupby
+by geo id and `fromisoformat` for each value, kept as the expected behaviour
+of the fast parser.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from typing import Any
+import zoneinfo
+
+from aiopvpc.const import (
+    GEOZONE_FALLBACKS,
+    GEOZONE_ID2NAME,
+    KEY_ADJUSTMENT,
+    KEY_CO2,
+    KEY_INJECTION,
+    KEY_MAG,
+    KEY_OMIE,
+    KEY_PVPC,
+    KEY_RENEWABLES,
+    REFERENCE_TZ,
+    UTC_TZ,
+    EsiosResponse,
+)
+from aiopvpc.parser import _timezone_offset, fill_current_value_with_look_back
+from aiopvpc.series import PriceSeries
+
+
+def extract_prices_from_esios_token_reference(
+    data: dict[str, Any],
+    sensor_key: str,
+    geo_zone: str,
+    tz: zoneinfo.ZoneInfo = REFERENCE_TZ,
+    look_back: bool = True,
+) -> EsiosResponse:
+    """Parse the contents of an 'indicator' json file with ESIOS Token."""
+    indicator_data = data.pop("indicator")
+
+    offset_timezone = _timezone_offset(tz)
+    ts_update = datetime.now(UTC_TZ).replace(microsecond=0)
+
+    def _parse_dt(ts: str) -> datetime:
+        return datetime.fromisoformat(ts).astimezone(UTC_TZ) + offset_timezone
+
+    def _value_unit_conversion(value: float) -> float:
+        if value is None:
+            return 0.0
+        # Conversión de Precios
+        if sensor_key in [KEY_PVPC, KEY_INJECTION, KEY_MAG, KEY_OMIE, KEY_ADJUSTMENT]:
+            return round(float(value) / 1000.0, 5)
+        # Conversión de CO2
+        if sensor_key == KEY_CO2:
+            val = float(value)
+            return round(val / 1000.0, 3) if val > 10 else round(val, 3)
+        # Renovables y otros
+        if sensor_key == KEY_RENEWABLES:
+            val = float(value)
+            return round(val * 100.0, 1) if (0 < val < 1.0) else round(val, 1)
+        return round(float(value), 1)
+
+    if not indicator_data.get("values"):
+        return EsiosResponse(
+            name=indicator_data["name"],
+            data_id=str(indicator_data["id"]),
+            last_update=ts_update,
+            unit="N/A",
+            series={sensor_key: PriceSeries()},
+        )
+
+    values = indicator_data["values"]
+    first_geo_id = values[0]["geo_id"]
+    if all(item["geo_id"] == first_geo_id for item in values):
+        # single-zone payload (as filtered by the server), no need to group
+        value_gen = iter([(first_geo_id, values)])
+    else:
+        value_gen = groupby(
+            sorted(values, key=itemgetter("geo_id")), itemgetter("geo_id")
+        )
+    parsed_data = {
+        GEOZONE_ID2NAME.get(g_id, f"Unknown_{g_id}"): PriceSeries.from_items(
+            (_parse_dt(i["datetime"]), _value_unit_conversion(i["value"]))
+            for i in group
+        )
+        for g_id, group in value_gen
+    }
+
+    selected_zone_values = PriceSeries()
+    for zone in [geo_zone, *GEOZONE_FALLBACKS]:
+        if zone in parsed_data:
+            selected_zone_values = parsed_data[zone]
+            break
+
+    if not selected_zone_values and parsed_data:
+        selected_zone_values = list(parsed_data.values())[0]
+
+    if look_back:
+        fill_current_value_with_look_back(selected_zone_values, sensor_key)
+
+    return EsiosResponse(
+        name=indicator_data["name"],
+        data_id=str(indicator_data["id"]),
+        last_update=ts_update,
+        unit="N/A",
+        series={sensor_key: selected_zone_values},
+    )
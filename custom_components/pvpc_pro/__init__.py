@@ -6,11 +6,25 @@ Custom component to collect Spain official electric prices (PVPC).
 
 from homeassistant.const import CONF_API_TOKEN, Platform
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers import entity_registry as er
-from .coordinator import ElecPricesDataUpdateCoordinator, PVPCConfigEntry
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+from homeassistant.helpers.typing import ConfigType
+from .const import DOMAIN
+from .coordinator import (
+    ElecPricesDataUpdateCoordinator,
+    PVPCConfigEntry,
+    make_data_store,
+)
 from .helpers import get_enabled_sensor_keys
+from .services import async_setup_services
 
 PLATFORMS: list[Platform] = [Platform.SENSOR]
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the PVPC REE Data services."""
+    async_setup_services(hass)
+    return True
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: PVPCConfigEntry) -> bool:
@@ -23,6 +37,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: PVPCConfigEntry) -> bool
     )
 
     coordinator = ElecPricesDataUpdateCoordinator(hass, entry, sensor_keys)
+    await coordinator.async_restore_data()
     await coordinator.async_config_entry_first_refresh()
 
     entry.runtime_data = coordinator
@@ -33,3 +48,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: PVPCConfigEntry) -> bool
 async def async_unload_entry(hass: HomeAssistant, entry: PVPCConfigEntry) -> bool:
     """Unload a config entry."""
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: PVPCConfigEntry) -> None:
+    """Remove the stored data snapshot of a deleted config entry."""
+    await make_data_store(hass, entry.entry_id).async_remove()
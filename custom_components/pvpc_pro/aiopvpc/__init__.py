@@ -3,15 +3,38 @@ Simple aio library to download Spanish electricity hourly prices (PVPC).
 Maintained by Javisen for PVPC REE Data Pro.
 """
 
+from .backfill import BackfillReport
+from .battery import Battery, BatteryPlan
+from .costs import CostAccumulator
 from .const import DEFAULT_POWER_KW, EsiosApiData, TARIFFS
 from .ha_helpers import get_enabled_sensor_keys
+from .metrics import FetchMetrics
+from .history import HistoryStore
+from .loads import Load, LoadSchedule
 from .pvpc_data import BadApiTokenAuthError, PVPCData
+from .retry import CircuitBreaker, RetryPolicy
+from .series import PriceSeries
+from .shared_cache import SharedFetchCache
+from .windows import PriceWindow
 
 __all__ = (
+    "BackfillReport",
+    "Battery",
+    "BatteryPlan",
     "BadApiTokenAuthError",
+    "CircuitBreaker",
+    "CostAccumulator",
     "EsiosApiData",
+    "FetchMetrics",
     "DEFAULT_POWER_KW",
+    "HistoryStore",
+    "Load",
+    "LoadSchedule",
+    "PriceSeries",
+    "PriceWindow",
     "PVPCData",
+    "RetryPolicy",
+    "SharedFetchCache",
     "TARIFFS",
     "get_enabled_sensor_keys",
 )
@@ -0,0 +1,146 @@
+"""
+ESIOS API handler for HomeAssistant. Historical backfill.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+_CHECKPOINT_VERSION = 1
+
+
+@dataclass
+class BackfillReport:
+    """Summary of a backfill run, with its throughput."""
+
+    days_requested: int = 0
+    days_downloaded: int = 0
+    days_skipped: int = 0
+    days_failed: int = 0
+    requests: int = 0
+    bytes_downloaded: int = 0
+    elapsed: float = 0.0
+    failed: dict[str, list[date]] = field(default_factory=dict)
+
+    @property
+    def days_per_second(self) -> float:
+        """Return the downloaded days per second."""
+        return self.days_downloaded / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Return the downloaded bytes per second."""
+        return self.bytes_downloaded / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable summary."""
+        return {
+            "days_requested": self.days_requested,
+            "days_downloaded": self.days_downloaded,
+            "days_skipped": self.days_skipped,
+            "days_failed": self.days_failed,
+            "requests": self.requests,
+            "bytes_downloaded": self.bytes_downloaded,
+            "elapsed": round(self.elapsed, 3),
+            "days_per_second": round(self.days_per_second, 3),
+            "bytes_per_second": round(self.bytes_per_second, 1),
+            "failed": {
+                key: [day.isoformat() for day in days]
+                for key, days in self.failed.items()
+            },
+        }
+
+
+class BackfillCheckpoint:
+    """
+    Days already downloaded by a backfill, saved in a JSON file.
+
+    The file is rewritten (atomically) after each finished request,
+    so an interrupted backfill resumes with the pending days.
+    It is only valid for the same data source and geo zone.
+    """
+
+    def __init__(self, path: str | None, source_key: str) -> None:
+        """Set up a checkpoint for a file (None to keep it only in memory)."""
+        self._path = path
+        self._source_key = source_key
+        self._done: dict[str, set[date]] = {}
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> dict[str, set[date]]:
+        assert self._path is not None
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                raw = json.load(file)
+        except FileNotFoundError:
+            return {}
+        if (
+            raw.get("version") != _CHECKPOINT_VERSION
+            or raw.get("source") != self._source_key
+        ):
+            _LOGGER.debug("Ignoring backfill checkpoint of another source")
+            return {}
+        return {
+            key: {date.fromisoformat(day) for day in days}
+            for key, days in raw["done"].items()
+        }
+
+    def _save(self, done: dict[str, list[str]]) -> None:
+        assert self._path is not None
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "version": _CHECKPOINT_VERSION,
+                    "source": self._source_key,
+                    "done": done,
+                },
+                file,
+            )
+        os.replace(tmp_path, self._path)
+
+    async def async_load(self) -> None:
+        """Load the days done in previous runs."""
+        if self._path is not None:
+            self._done = await asyncio.get_running_loop().run_in_executor(
+                None, self._load
+            )
+
+    def is_done(self, sensor_key: str, day: date) -> bool:
+        """Check if a day of an indicator was already downloaded."""
+        return day in self._done.get(sensor_key, ())
+
+    async def async_mark_done(self, sensor_key: str, days: list[date]) -> None:
+        """Record some downloaded days and save the checkpoint."""
+        self._done.setdefault(sensor_key, set()).update(days)
+        if self._path is None:
+            return
+        done = {
+            key: sorted(day.isoformat() for day in days)
+            for key, days in self._done.items()
+        }
+        async with self._lock:
+            await asyncio.get_running_loop().run_in_executor(None, self._save, done)
+
+
+def split_pending_days(days: list[date], max_days: int) -> list[tuple[date, date]]:
+    """Group sorted days in ranges of consecutive days, with `max_days` at most."""
+    ranges: list[tuple[date, date]] = []
+    for day in days:
+        if (
+            ranges
+            and ranges[-1][1] + timedelta(days=1) == day
+            and (day - ranges[-1][0]).days < max_days
+        ):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
@@ -0,0 +1,223 @@
+"""
+ESIOS API handler for HomeAssistant. Home battery optimization.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import datetime
+from math import inf, isnan, sqrt
+from typing import Any, Literal
+
+from .const import DEFAULT_BATTERY_SOC_STEPS, PRICE_PRECISION, UTC_TZ
+from .series import PriceSeries
+from .utils import floor_to_resolution, get_series_resolution
+
+BatteryAction = Literal["charge", "discharge", "idle"]
+
+
+@dataclass(frozen=True)
+class Battery:
+    """
+    Home battery, with its capacity (kWh) and power limits (kW).
+
+    The `efficiency` is for the round trip, split evenly between charge
+    and discharge. The state of charge is discretised in `soc_steps` levels,
+    so coarser grids are faster to optimize.
+    """
+
+    capacity: float
+    charge_power: float
+    discharge_power: float
+    efficiency: float = 0.9
+    soc_steps: int = DEFAULT_BATTERY_SOC_STEPS
+
+
+@dataclass(frozen=True)
+class BatteryStep:
+    """Planned battery action for a time step."""
+
+    start: datetime
+    action: BatteryAction
+    # energy into (+) or out of (-) the battery, in kWh
+    energy: float
+    soc: float
+    buy_price: float
+    sell_price: float
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {
+            "start": self.start.isoformat(),
+            "action": self.action,
+            "energy": self.energy,
+            "soc": self.soc,
+            "buy_price": self.buy_price,
+            "sell_price": self.sell_price,
+        }
+
+
+@dataclass
+class BatteryPlan:
+    """Battery actions for the price horizon, with their expected cost."""
+
+    steps: list[BatteryStep] = field(default_factory=list)
+    cost: float = 0.0
+    baseline_cost: float = 0.0
+
+    @property
+    def savings(self) -> float:
+        """Return the cost saved with the battery, in €."""
+        return round(self.baseline_cost - self.cost, PRICE_PRECISION)
+
+    @property
+    def current_action(self) -> BatteryAction | None:
+        """Return the planned action for the first time step."""
+        return self.steps[0].action if self.steps else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {
+            "cost": self.cost,
+            "baseline_cost": self.baseline_cost,
+            "savings": self.savings,
+            "steps": [step.as_dict() for step in self.steps],
+        }
+
+
+def _get_sell_prices(
+    buy_prices: PriceSeries,
+    indexes: range,
+    sell_prices: Mapping[datetime, float] | None,
+) -> list[float]:
+    """Align the sell prices with the steps of the buy prices (0 if missing)."""
+    if not sell_prices:
+        return [0.0] * len(indexes)
+    resolution = get_series_resolution(sell_prices)
+    epochs = buy_prices.raw_epochs()
+    return [
+        sell_prices.get(
+            floor_to_resolution(
+                datetime.fromtimestamp(epochs[idx], UTC_TZ), resolution
+            ),
+            0.0,
+        )
+        for idx in indexes
+    ]
+
+
+def _grid_cost(net_energy: float, buy_price: float, sell_price: float) -> float:
+    if net_energy >= 0:
+        return net_energy * buy_price
+    return net_energy * sell_price
+
+
+def optimize_battery(
+    buy_prices: PriceSeries,
+    sell_prices: Mapping[datetime, float] | None,
+    battery: Battery,
+    soc: float,
+    start_after: datetime | None = None,
+    load: Sequence[float] | None = None,
+) -> BatteryPlan:
+    """
+    Plan the charge and discharge of a battery for the lowest energy cost.
+
+    The plan covers the contiguous buy prices from `start_after`, with the
+    state of charge (`soc`, 0 to 1) of the battery at that time.
+    The optional `load` has the home consumption (kW) for each hour from the
+    start of the plan. Energy imported is paid with the buy price, and energy
+    exported is paid with the sell price, and the energy left in the battery
+    at the end of the plan is not valued.
+
+    Dynamic programming over the discretised state of charge finds it
+    in O(steps · levels · moves).
+    """
+    values = buy_prices.raw_values()
+    indexes = buy_prices.step_range(start_after)
+    end_idx = indexes.start
+    while end_idx < indexes.stop and not isnan(values[end_idx]):
+        end_idx += 1
+    indexes = range(indexes.start, end_idx)
+    if not indexes:
+        return BatteryPlan()
+
+    step = buy_prices.step
+    step_hours = step.total_seconds() / 3600
+    num_levels = max(1, battery.soc_steps)
+    level_energy = battery.capacity / num_levels
+    one_way_efficiency = sqrt(battery.efficiency)
+    max_up = int(battery.charge_power * step_hours / level_energy + 1e-9)
+    max_down = int(battery.discharge_power * step_hours / level_energy + 1e-9)
+    first_level = min(num_levels, max(0, round(soc * num_levels)))
+
+    buy = [values[idx] for idx in indexes]
+    sell = _get_sell_prices(buy_prices, indexes, sell_prices)
+    loads = [0.0] * len(indexes)
+    for n in range(len(indexes) if load else 0):
+        hour = int(n * step_hours)
+        if hour < len(load):
+            loads[n] = load[hour] * step_hours
+    # grid energy for each change of level, from -max_down to +max_up
+    moves = range(-max_down, max_up + 1)
+    move_grid_energy = {
+        move: (
+            move * level_energy / one_way_efficiency
+            if move > 0
+            else move * level_energy * one_way_efficiency
+        )
+        for move in moves
+    }
+
+    # backwards: cost_to_go[level] is the lowest cost from a step to the end
+    num_steps = len(indexes)
+    cost_to_go = [0.0] * (num_levels + 1)
+    best_moves: list[list[int]] = [[]] * num_steps
+    for n in range(num_steps - 1, -1, -1):
+        step_costs = {
+            move: _grid_cost(loads[n] + grid_energy, buy[n], sell[n])
+            for move, grid_energy in move_grid_energy.items()
+        }
+        new_cost_to_go = [inf] * (num_levels + 1)
+        choices = [0] * (num_levels + 1)
+        for level in range(num_levels + 1):
+            best_cost, best_move = inf, 0
+            for move in moves:
+                next_level = level + move
+                if not 0 <= next_level <= num_levels:
+                    continue
+                cost = step_costs[move] + cost_to_go[next_level]
+                # prefer idle, then the smallest move, for equal costs
+                if cost < best_cost - 1e-12 or (
+                    abs(cost - best_cost) <= 1e-12 and abs(move) < abs(best_move)
+                ):
+                    best_cost, best_move = cost, move
+            new_cost_to_go[level] = best_cost
+            choices[level] = best_move
+        cost_to_go = new_cost_to_go
+        best_moves[n] = choices
+
+    plan = BatteryPlan()
+    epochs = buy_prices.raw_epochs()
+    level = first_level
+    total_cost = baseline_cost = 0.0
+    for n, idx in enumerate(indexes):
+        move = best_moves[n][level]
+        level += move
+        total_cost += _grid_cost(loads[n] + move_grid_energy[move], buy[n], sell[n])
+        baseline_cost += _grid_cost(loads[n], buy[n], sell[n])
+        plan.steps.append(
+            BatteryStep(
+                start=datetime.fromtimestamp(epochs[idx], UTC_TZ),
+                action="charge" if move > 0 else "discharge" if move < 0 else "idle",
+                energy=round(move * level_energy, 3),
+                soc=round(level / num_levels, 3),
+                buy_price=buy[n],
+                sell_price=sell[n],
+            )
+        )
+    plan.cost = round(total_cost, PRICE_PRECISION)
+    plan.baseline_cost = round(baseline_cost, PRICE_PRECISION)
+    return plan
@@ -0,0 +1,77 @@
+"""
+ESIOS API handler for HomeAssistant. HTTP response cache.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from .const import DEFAULT_RESPONSE_CACHE_SIZE
+
+
+@dataclass
+class CachedResponse:
+    """Parsed response with the HTTP validators to revalidate it."""
+
+    etag: str | None
+    last_modified: str | None
+    parsed: Any
+
+
+class EsiosResponseCache:
+    """
+    LRU cache of parsed ESIOS responses, keyed by URL.
+
+    Only responses with `ETag` or `Last-Modified` validators are stored,
+    so they can be revalidated with a conditional request, and reused without
+    decoding nor parsing the body again when the server answers with a 304.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_RESPONSE_CACHE_SIZE) -> None:
+        """Set up an empty cache with a maximum number of entries."""
+        self._max_size = max_size
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> CachedResponse | None:
+        """Return the cached response for `url`, marking it as recently used."""
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def put(
+        self, url: str, etag: str | None, last_modified: str | None, parsed: Any
+    ) -> None:
+        """Store a parsed response, evicting the least recently used ones."""
+        if self._max_size <= 0:
+            return
+        if etag is None and last_modified is None:
+            # nothing to revalidate with, so it would never be reused
+            self._entries.pop(url, None)
+            return
+        self._entries[url] = CachedResponse(etag, last_modified, parsed)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        self._entries.clear()
+
+
+def make_conditional_headers(entry: CachedResponse | None) -> dict[str, str]:
+    """Make the HTTP headers to revalidate a cached response."""
+    if entry is None:
+        return {}
+    headers = {}
+    if entry.etag is not None:
+        headers["If-None-Match"] = entry.etag
+    if entry.last_modified is not None:
+        headers["If-Modified-Since"] = entry.last_modified
+    return headers
@@ -6,14 +6,39 @@ Includes sustainability indicators and 2026 grid data.
 
 import zoneinfo
 from dataclasses import dataclass
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import Literal
 
+from .series import PriceSeries
+
 DATE_CHANGE_TO_20TD = date(2021, 6, 1)
 REFERENCE_TZ = zoneinfo.ZoneInfo("Europe/Madrid")
 UTC_TZ = zoneinfo.ZoneInfo("UTC")
 DEFAULT_TIMEOUT = 10
+DEFAULT_RESPONSE_CACHE_SIZE = 32
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_BASE_DELAY = 2.0
+DEFAULT_RETRY_MAX_DELAY = 30.0
+DEFAULT_CIRCUIT_FAILURE_THRESHOLD = 5
+DEFAULT_CIRCUIT_RESET_TIMEOUT = 300.0
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+DEFAULT_DAILY_REQUEST_BUDGET = 2000
+DEFAULT_SHARED_CACHE_TTL = 60.0
+DEFAULT_STREAM_CHUNK_SIZE = 16384
+DEFAULT_HISTORY_DB_NAME = "pvpc_pro_history.db"
+DEFAULT_BACKFILL_CONCURRENCY = 4
+DEFAULT_BACKFILL_CHUNK_DAYS = 31
+DEFAULT_SCHEDULE_TIME_BUDGET = 2.0
+MAX_EXACT_SCHEDULE_LOADS = 8
+DEFAULT_BATTERY_SOC_STEPS = 20
+# longest time between meter readings to spread their energy over the prices
+MAX_COST_READING_SPAN = timedelta(days=1)
+# upper bounds (ms) of the buckets of the latency histogram of the requests
+LATENCY_HISTOGRAM_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
 PRICE_PRECISION = 5
+# prices come in hourly or quarter-hourly (15 min) steps
+DEFAULT_RESOLUTION = timedelta(hours=1)
+QUARTER_HOUR_RESOLUTION = timedelta(minutes=15)
 
 KEY_PVPC = "PVPC"
 KEY_INJECTION = "INJECTION"
@@ -38,10 +63,15 @@ ESIOS_RENEWABLES = "10491"  # % Generación renovable sobre el total
 TARIFF_20TD_IDS = ["PCB", "CYM"]
 TARIFFS = ["2.0TD", "2.0TD (Ceuta/Melilla)"]
 TARIFF2ID = dict(zip(TARIFFS, TARIFF_20TD_IDS))
+# geo zone of the public PVPC prices of each tariff (Ceuta & Melilla share prices)
+TARIFF_ID2GEOZONE = {"PCB": "Península", "CYM": "Ceuta"}
 DEFAULT_POWER_KW = 3.3
 
 DataSource = Literal["esios_public", "esios"]
 GEOZONES = ["Península", "Canarias", "Baleares", "Ceuta", "Melilla", "España"]
+DEFAULT_GEO_ZONE = "Península"
+# zones used, in order, when the indicator has no values for the wanted zone
+GEOZONE_FALLBACKS = ("España", "Península")
 GEOZONE_ID2NAME: dict[int, str] = {
     3: "Península",  # ID Histórico
     8741: "Península",
@@ -101,6 +131,40 @@ SENSOR_KEY_TO_API_SERIES = {
     KEY_RENEWABLES: [KEY_RENEWABLES],
 }
 
+# indicators with values for many geo zones, decoded as they are downloaded
+MULTI_GEO_SENSOR_KEYS = {KEY_CO2, KEY_DEMAND, KEY_RENEWABLES}
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+SENSOR_KEY_TO_PRIORITY = {
+    KEY_PVPC: PRIORITY_HIGH,
+    KEY_INJECTION: PRIORITY_HIGH,
+    KEY_MAG: PRIORITY_NORMAL,
+    KEY_OMIE: PRIORITY_NORMAL,
+    KEY_ADJUSTMENT: PRIORITY_NORMAL,
+    KEY_CO2: PRIORITY_LOW,
+    KEY_DEMAND: PRIORITY_LOW,
+    KEY_RENEWABLES: PRIORITY_LOW,
+}
+# fraction of the daily request budget available for each priority class
+PRIORITY_TO_BUDGET_RATIO = {
+    PRIORITY_HIGH: 1.0,
+    PRIORITY_NORMAL: 0.9,
+    PRIORITY_LOW: 0.75,
+}
+
+# next-day prices are published in the evening (local time), polled with a ramp
+DAY_AHEAD_PUBLICATION_HOUR = 20
+PUBLICATION_RAMP_MINUTES = (0, 5, 10, 15, 30, 45, 60)
+PUBLICATION_RETRY_MINUTES = 30
+# near-real-time indicators, refreshed during the day with their own cadence
+SENSOR_KEY_TO_UPDATE_CADENCE_MINUTES = {
+    KEY_CO2: 15,
+    KEY_DEMAND: 15,
+    KEY_RENEWABLES: 15,
+}
+DEFAULT_UPDATE_INTERVAL_MINUTES = 5
 
 URL_PUBLIC_PVPC_RESOURCE = (
     "https://api.esios.ree.es/archives/70/download_json?locale=es&date={day:%Y-%m-%d}"
@@ -109,6 +173,10 @@ URL_ESIOS_TOKEN_RESOURCE = (
     "https://api.esios.ree.es/indicators/{ind}?"
     "start_date={day:%Y-%m-%d}T00:00&end_date={day:%Y-%m-%d}T23:59"
 )
+URL_ESIOS_TOKEN_RANGE_RESOURCE = (
+    "https://api.esios.ree.es/indicators/{ind}?"
+    "start_date={start:%Y-%m-%d}T00:00&end_date={end:%Y-%m-%d}T23:59"
+)
 
 ATTRIBUTIONS: dict[DataSource, str] = {
     "esios_public": "Data retrieved from api.esios.ree.es by REE",
@@ -123,7 +191,7 @@ class EsiosResponse:
     data_id: str
     last_update: datetime
     unit: str
-    series: dict[str, dict[datetime, float]]
+    series: dict[str, PriceSeries]
 
 
 @dataclass
@@ -131,5 +199,5 @@ class EsiosApiData:
 
     last_update: datetime
     data_source: str
-    sensors: dict[str, dict[datetime, float]]
+    sensors: dict[str, PriceSeries]
     availability: dict[str, bool]
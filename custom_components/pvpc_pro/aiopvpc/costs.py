@@ -0,0 +1,224 @@
+"""
+ESIOS API handler for HomeAssistant. Energy cost accumulator.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from .const import DEFAULT_RESOLUTION, MAX_COST_READING_SPAN, PRICE_PRECISION, UTC_TZ
+from .utils import floor_to_resolution
+
+_LOGGER = logging.getLogger(__name__)
+
+_PERIODS = ("P1", "P2", "P3")
+COST_SCOPES = ("today", "month", "billing")
+
+
+@dataclass
+class PeriodTotals:
+    """Energy (kWh) and cost (€) totals, split by tariff period."""
+
+    start: date
+    energy: dict[str, float] = field(
+        default_factory=lambda: dict.fromkeys(_PERIODS, 0.0)
+    )
+    cost: dict[str, float] = field(default_factory=lambda: dict.fromkeys(_PERIODS, 0.0))
+
+    @property
+    def total_cost(self) -> float:
+        """Return the cost of all periods."""
+        return sum(self.cost.values())
+
+    @property
+    def total_energy(self) -> float:
+        """Return the energy of all periods."""
+        return sum(self.energy.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {
+            "start": self.start.isoformat(),
+            "energy": dict(self.energy),
+            "cost": dict(self.cost),
+        }
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any]) -> PeriodTotals:
+        """Load totals made with `as_dict`."""
+        return cls(
+            start=date.fromisoformat(raw["start"]),
+            energy={period: float(raw["energy"][period]) for period in _PERIODS},
+            cost={period: float(raw["cost"][period]) for period in _PERIODS},
+        )
+
+
+def _get_billing_start(day: date, billing_day: int) -> date:
+    """Return the first day of the billing period of a day."""
+    if day.day >= billing_day:
+        return day.replace(day=billing_day)
+    if day.month == 1:
+        return date(day.year - 1, 12, billing_day)
+    return date(day.year, day.month - 1, billing_day)
+
+
+class CostAccumulator:
+    """
+    Running totals of energy and cost for the current day, month and billing period.
+
+    Each meter reading adds its delta of energy, spread over the time steps since
+    the previous reading, with the price and tariff period of each step.
+    Totals start again when their period changes.
+    The `billing_day` of the month starts each billing period.
+    """
+
+    def __init__(self, billing_day: int = 1) -> None:
+        """Set up empty totals."""
+        assert 1 <= billing_day <= 28, billing_day
+        self._billing_day = billing_day
+        self.totals: dict[str, PeriodTotals] = {}
+        self.last_reading: float | None = None
+        self.last_reading_time: datetime | None = None
+
+    def _get_scope_starts(self, day: date) -> dict[str, date]:
+        return {
+            "today": day,
+            "month": day.replace(day=1),
+            "billing": _get_billing_start(day, self._billing_day),
+        }
+
+    def roll_over(self, local_time: datetime) -> bool:
+        """Start new totals for the periods that have changed; return if any."""
+        changed = False
+        for scope, start in self._get_scope_starts(local_time.date()).items():
+            current = self.totals.get(scope)
+            if current is None or current.start != start:
+                self.totals[scope] = PeriodTotals(start)
+                changed = True
+        return changed
+
+    def add_reading(
+        self,
+        reading: float,
+        local_time: datetime,
+        get_price: Callable[[datetime], float | None],
+        get_tariff_period: Callable[[datetime], str],
+        step: timedelta = DEFAULT_RESOLUTION,
+    ) -> float:
+        """
+        Add a cumulative meter reading (kWh), and return its delta of energy.
+
+        The first reading only sets the reference. When the meter goes back,
+        it has been reset, so the new reading is the delta.
+        The delta is spread evenly over the time since the previous reading,
+        split in time steps, and each part is charged with the price (by UTC time)
+        and the tariff period (by local time) of its step. Energy without a price
+        is not accumulated, and neither is a delta over more than
+        `MAX_COST_READING_SPAN` (like after a long stop), as its time is unknown.
+        """
+        previous, self.last_reading = self.last_reading, reading
+        previous_time, self.last_reading_time = self.last_reading_time, local_time
+        if previous is None:
+            return 0.0
+        delta = reading - previous if reading >= previous else reading
+        self.roll_over(local_time)
+        if not delta:
+            return delta
+        if (
+            previous_time is None
+            or not timedelta(0) <= local_time - previous_time <= MAX_COST_READING_SPAN
+        ):
+            _LOGGER.warning(
+                "Energy of %.3f kWh since %s not accumulated, as its time is unknown",
+                delta,
+                previous_time,
+            )
+            return delta
+
+        span = (local_time - previous_time).total_seconds()
+        utc_time = local_time.astimezone(UTC_TZ)
+        part_start = previous_time.astimezone(UTC_TZ)
+        while True:
+            step_start = floor_to_resolution(part_start, step)
+            part_end = min(step_start + step, utc_time)
+            energy = (
+                delta * (part_end - part_start).total_seconds() / span
+                if span
+                else delta
+            )
+            self._add_energy(
+                energy,
+                get_price(step_start),
+                get_tariff_period(step_start.astimezone(local_time.tzinfo)),
+                step_start.astimezone(local_time.tzinfo).date(),
+            )
+            if part_end >= utc_time:
+                return delta
+            part_start = part_end
+
+    def _add_energy(
+        self, energy: float, price: float | None, tariff_period: str, day: date
+    ) -> None:
+        """Add energy to the totals of the periods that include its day."""
+        if price is None:
+            return
+        for totals in self.totals.values():
+            if day >= totals.start:
+                totals.energy[tariff_period] += energy
+                totals.cost[tariff_period] += energy * price
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation, to restore it."""
+        return {
+            "billing_day": self._billing_day,
+            "last_reading": self.last_reading,
+            "last_reading_time": (
+                self.last_reading_time.isoformat()
+                if self.last_reading_time is not None
+                else None
+            ),
+            "totals": {
+                scope: totals.as_dict() for scope, totals in self.totals.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any], billing_day: int) -> CostAccumulator:
+        """
+        Load an accumulator made with `as_dict`.
+
+        With a different billing day, the billing totals start again.
+        """
+        accumulator = cls(billing_day)
+        accumulator.last_reading = raw.get("last_reading")
+        if (last_reading_time := raw.get("last_reading_time")) is not None:
+            accumulator.last_reading_time = datetime.fromisoformat(last_reading_time)
+        accumulator.totals = {
+            scope: PeriodTotals.from_dict(raw_totals)
+            for scope, raw_totals in raw.get("totals", {}).items()
+            if scope in COST_SCOPES
+            and (scope != "billing" or raw.get("billing_day") == billing_day)
+        }
+        return accumulator
+
+    def as_attributes(self) -> dict[str, float]:
+        """Return the totals as flat state attributes."""
+        attributes = {}
+        for scope in COST_SCOPES:
+            if (totals := self.totals.get(scope)) is None:
+                continue
+            attributes[f"{scope}_cost"] = round(totals.total_cost, PRICE_PRECISION)
+            attributes[f"{scope}_energy"] = round(totals.total_energy, 3)
+            for period in _PERIODS:
+                attributes[f"{scope}_cost_{period.lower()}"] = round(
+                    totals.cost[period], PRICE_PRECISION
+                )
+                attributes[f"{scope}_energy_{period.lower()}"] = round(
+                    totals.energy[period], 3
+                )
+        return attributes
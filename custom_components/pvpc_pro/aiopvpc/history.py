@@ -0,0 +1,194 @@
+"""
+ESIOS API handler for HomeAssistant. Local history store.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from array import array
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import TypeVar
+
+from .const import EsiosResponse, REFERENCE_TZ
+from .series import PriceSeries
+
+_LOGGER = logging.getLogger(__name__)
+_T = TypeVar("_T")
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series_days (
+    indicator TEXT NOT NULL,
+    geo_zone TEXT NOT NULL,
+    day TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    step INTEGER NOT NULL,
+    price_values BLOB NOT NULL,
+    updated INTEGER NOT NULL,
+    PRIMARY KEY (indicator, geo_zone, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS series_days_start
+    ON series_days (indicator, geo_zone, start);
+"""
+# a local day starts, at most, 25 hours before the first hour of the next one
+_MAX_DAY_SECONDS = 25 * 3600
+
+
+def _split_local_days(series: PriceSeries) -> dict[date, PriceSeries]:
+    """Split a series in copies for each local day in Spain."""
+    first_ts, last_ts = series.first_timestamp, series.last_timestamp
+    if first_ts is None or last_ts is None:
+        return {}
+    day = first_ts.astimezone(REFERENCE_TZ).date()
+    last_day = last_ts.astimezone(REFERENCE_TZ).date()
+    days = {}
+    while day <= last_day:
+        if day_series := series.day_slice(day, REFERENCE_TZ):
+            # copied, as the worker thread reads it while the loop goes on
+            days[day] = day_series.copy()
+        day += timedelta(days=1)
+    return days
+
+
+def _to_blob(series: PriceSeries) -> bytes:
+    return series.raw_values().tobytes()
+
+
+def _from_blob(start: int, step: int, blob: bytes) -> PriceSeries:
+    values = array("d")
+    values.frombytes(blob)
+    return PriceSeries(start, step, values)
+
+
+class HistoryStore:
+    """
+    Local SQLite store of the downloaded series, to keep their history.
+
+    Series are stored in one row per (indicator, geo zone, local day), with the
+    prices of the day as a block of doubles, and an index on its start time.
+    All database access runs in a single worker thread, off the event loop.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Set up the store for a database file, which is opened on first use."""
+        self._path = path
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pvpc_history"
+        )
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def path(self) -> str:
+        """Return the path of the database file."""
+        return self._path
+
+    async def _run(self, func: Callable[..., _T], *args) -> _T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, func, *args
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self._path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.executescript(_SCHEMA)
+                conn.execute(f"PRAGMA user_version={_SCHEMA_VERSION}")
+            self._conn = conn
+        return self._conn
+
+    def _append_days(
+        self, indicator: str, geo_zone: str, days: dict[date, PriceSeries]
+    ) -> None:
+        conn = self._connect()
+        updated = int(time.time())
+        with conn:
+            for day, series in days.items():
+                row = conn.execute(
+                    "SELECT start, step, price_values FROM series_days "
+                    "WHERE indicator = ? AND geo_zone = ? AND day = ?",
+                    (indicator, geo_zone, day.isoformat()),
+                ).fetchone()
+                if row is not None:
+                    # keep stored values missing in partial (near-real-time) days
+                    stored = _from_blob(*row)
+                    stored.update(series)
+                    series = stored
+                conn.execute(
+                    "INSERT OR REPLACE INTO series_days VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        indicator,
+                        geo_zone,
+                        day.isoformat(),
+                        int(series.raw_epochs().start),
+                        int(series.step.total_seconds()),
+                        _to_blob(series),
+                        updated,
+                    ),
+                )
+
+    def _get_series(
+        self, indicator: str, geo_zone: str, start: int, end: int
+    ) -> PriceSeries:
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT start, step, price_values FROM series_days "
+                "WHERE indicator = ? AND geo_zone = ? AND start >= ? AND start < ? "
+                "ORDER BY start",
+                (indicator, geo_zone, start - _MAX_DAY_SECONDS, end),
+            )
+            .fetchall()
+        )
+        return PriceSeries.concat(_from_blob(*row) for row in rows)
+
+    def _get_days(self, indicator: str, geo_zone: str) -> list[date]:
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT day FROM series_days WHERE indicator = ? AND geo_zone = ? "
+                "ORDER BY day",
+                (indicator, geo_zone),
+            )
+            .fetchall()
+        )
+        return [date.fromisoformat(day) for (day,) in rows]
+
+    async def async_append(self, response: EsiosResponse, geo_zone: str) -> None:
+        """Store the series of a downloaded response, merged by local day."""
+        for indicator, series in response.series.items():
+            if days := _split_local_days(series):
+                await self._run(self._append_days, indicator, geo_zone, days)
+
+    async def async_get_series(
+        self, indicator: str, start: datetime, end: datetime, geo_zone: str
+    ) -> PriceSeries:
+        """Return the stored prices of an indicator between `start` and `end`."""
+        series = await self._run(
+            self._get_series,
+            indicator,
+            geo_zone,
+            int(start.timestamp()),
+            int(end.timestamp()),
+        )
+        return series.slice(start, end).copy()
+
+    async def async_get_days(self, indicator: str, geo_zone: str) -> list[date]:
+        """Return the local days with stored data for an indicator."""
+        return await self._run(self._get_days, indicator, geo_zone)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def async_close(self) -> None:
+        """Close the database and stop the worker thread."""
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
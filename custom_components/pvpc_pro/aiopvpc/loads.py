@@ -0,0 +1,309 @@
+"""
+ESIOS API handler for HomeAssistant. Scheduling of appliance loads.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, tzinfo
+from math import inf, isnan
+from typing import Any
+
+from .const import (
+    DEFAULT_SCHEDULE_TIME_BUDGET,
+    MAX_EXACT_SCHEDULE_LOADS,
+    PRICE_PRECISION,
+    UTC_TZ,
+)
+from .pvpc_tariff import get_tariff_period_codes
+from .series import PriceSeries
+
+# margin for float sums of power when checking the limits
+_POWER_TOLERANCE = 1e-9
+# nodes of the search between checks of the time budget
+_NODES_PER_DEADLINE_CHECK = 256
+
+
+@dataclass(frozen=True)
+class Load:
+    """
+    Appliance run to schedule.
+
+    The `power` profile (kW) is split in equal parts along the run,
+    so a single value means constant power.
+    """
+
+    name: str
+    duration: timedelta
+    power: tuple[float, ...]
+    earliest_start: datetime | None = None
+    latest_end: datetime | None = None
+
+    def step_powers(self, num_steps: int) -> list[float]:
+        """Return the power of the load at each time step of its run."""
+        num_parts = len(self.power)
+        return [self.power[j * num_parts // num_steps] for j in range(num_steps)]
+
+
+@dataclass(frozen=True)
+class LoadAssignment:
+    """Start time assigned to a load, with its cost."""
+
+    name: str
+    start: datetime
+    end: datetime
+    cost: float
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {
+            "name": self.name,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "cost": self.cost,
+        }
+
+
+@dataclass
+class LoadSchedule:
+    """Result of scheduling a group of loads."""
+
+    assignments: list[LoadAssignment] = field(default_factory=list)
+    unscheduled: list[str] = field(default_factory=list)
+    optimal: bool = False
+    # "exact", "exact_partial" (search out of time) or "greedy"
+    method: str = "greedy"
+
+    @property
+    def total_cost(self) -> float:
+        """Return the cost of the scheduled loads, in €."""
+        return round(sum((a.cost for a in self.assignments), 0.0), PRICE_PRECISION)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {
+            "loads": [assignment.as_dict() for assignment in self.assignments],
+            "unscheduled": list(self.unscheduled),
+            "total_cost": self.total_cost,
+            "optimal": self.optimal,
+            "method": self.method,
+        }
+
+
+@dataclass
+class _LoadOptions:
+    """Feasible starts of a load (indexes in the series), sorted by cost."""
+
+    load: Load
+    powers: list[float]
+    starts: list[int]
+    costs: list[float]
+
+
+def make_power_limits(
+    prices: PriceSeries,
+    power: float,
+    power_valley: float,
+    timezone: tzinfo,
+    zone_ceuta_melilla: bool,
+) -> list[float]:
+    """
+    Return the contracted power (kW) for each time step of a series.
+
+    It is `power_valley` in the P3 tariff period, and `power` in P1 and P2.
+    """
+    epochs = prices.raw_epochs()
+    if not epochs:
+        return []
+    first_day = datetime.fromtimestamp(epochs[0], timezone).date()
+    last_day = datetime.fromtimestamp(epochs[-1], timezone).date()
+    periods = get_tariff_period_codes(first_day, last_day, zone_ceuta_melilla)
+    limits = []
+    for epoch in epochs:
+        local_ts = datetime.fromtimestamp(epoch, timezone)
+        period = periods[(local_ts.date() - first_day).days * 24 + local_ts.hour]
+        limits.append(power_valley if period == 3 else power)
+    return limits
+
+
+def _make_load_options(
+    load: Load,
+    prices: PriceSeries,
+    power_limits: Sequence[float],
+    start_after: datetime | None,
+) -> _LoadOptions:
+    step = int(prices.step.total_seconds())
+    step_hours = step / 3600
+    values = prices.raw_values()
+    num_steps = max(1, -(-int(load.duration.total_seconds()) // step))
+    powers = load.step_powers(num_steps)
+    earliest = load.earliest_start
+    if start_after is not None and (earliest is None or earliest < start_after):
+        earliest = start_after
+    indexes = prices.step_range(earliest, load.latest_end)
+
+    options = []
+    for start in range(indexes.start, indexes.stop - num_steps + 1):
+        cost = 0.0
+        for j, load_power in enumerate(powers):
+            price = values[start + j]
+            if isnan(price) or load_power > power_limits[start + j]:
+                break
+            cost += price * load_power * step_hours
+        else:
+            options.append((cost, start))
+    options.sort()
+    return _LoadOptions(
+        load, powers, [start for _, start in options], [cost for cost, _ in options]
+    )
+
+
+def _fits(usage: list[float], limits: Sequence[float], start: int, powers) -> bool:
+    return all(
+        usage[start + j] + load_power <= limits[start + j] + _POWER_TOLERANCE
+        for j, load_power in enumerate(powers)
+    )
+
+
+def _add_usage(usage: list[float], start: int, powers, sign: float = 1.0) -> None:
+    for j, load_power in enumerate(powers):
+        usage[start + j] += sign * load_power
+
+
+def _schedule_greedy(
+    options: list[_LoadOptions], limits: Sequence[float]
+) -> dict[int, int]:
+    """Place the biggest loads first, each one in its cheapest free start."""
+    usage = [0.0] * len(limits)
+    chosen: dict[int, int] = {}
+    order = sorted(
+        range(len(options)),
+        key=lambda i: (-sum(options[i].powers), len(options[i].starts)),
+    )
+    for i in order:
+        for pos, start in enumerate(options[i].starts):
+            if _fits(usage, limits, start, options[i].powers):
+                _add_usage(usage, start, options[i].powers)
+                chosen[i] = pos
+                break
+    return chosen
+
+
+def _schedule_exact(
+    options: list[_LoadOptions],
+    limits: Sequence[float],
+    incumbent: dict[int, int] | None,
+    deadline: float,
+) -> tuple[dict[int, int] | None, bool]:
+    """
+    Branch and bound over the starts of all loads.
+
+    Loads with fewer options go first, and their options are tried by cost,
+    with the cheapest options of the pending loads as lower bound.
+    Return the best assignment found and whether the search finished in time.
+    """
+    order = sorted(range(len(options)), key=lambda i: len(options[i].starts))
+    # lower bound of the cost of the loads after each depth
+    min_rest = [0.0] * (len(order) + 1)
+    for depth in range(len(order) - 1, -1, -1):
+        min_rest[depth] = min_rest[depth + 1] + options[order[depth]].costs[0]
+
+    best = incumbent
+    best_cost = (
+        inf
+        if incumbent is None
+        else sum(options[i].costs[pos] for i, pos in incumbent.items())
+    )
+    usage = [0.0] * len(limits)
+    current: dict[int, int] = {}
+    nodes = 0
+    timed_out = False
+
+    def _search(depth: int, cost: float) -> None:
+        nonlocal best, best_cost, nodes, timed_out
+        if depth == len(order):
+            best, best_cost = dict(current), cost
+            return
+        i = order[depth]
+        load_options = options[i]
+        for pos, start in enumerate(load_options.starts):
+            nodes += 1
+            if nodes % _NODES_PER_DEADLINE_CHECK == 0 and time.monotonic() > deadline:
+                timed_out = True
+            if timed_out:
+                return
+            new_cost = cost + load_options.costs[pos]
+            if new_cost + min_rest[depth + 1] >= best_cost - _POWER_TOLERANCE:
+                # the next options are not cheaper
+                return
+            if not _fits(usage, limits, start, load_options.powers):
+                continue
+            _add_usage(usage, start, load_options.powers)
+            current[i] = pos
+            _search(depth + 1, new_cost)
+            del current[i]
+            _add_usage(usage, start, load_options.powers, -1.0)
+
+    _search(0, 0.0)
+    return best, not timed_out
+
+
+def schedule_loads(
+    prices: PriceSeries,
+    loads: Sequence[Load],
+    power_limits: Sequence[float],
+    start_after: datetime | None = None,
+    time_budget: float = DEFAULT_SCHEDULE_TIME_BUDGET,
+    max_exact_loads: int = MAX_EXACT_SCHEDULE_LOADS,
+) -> LoadSchedule:
+    """
+    Assign start times to loads, for the lowest total cost with a series of prices.
+
+    The sum of power of the loads running at the same time step must stay under
+    the `power_limits` of each step of the series (see `make_power_limits`).
+    Up to `max_exact_loads`, the optimal schedule is searched with branch and bound
+    during `time_budget` seconds, starting from a greedy heuristic, which is used
+    alone if there are more loads. Out of time, the best schedule found is returned,
+    with `method` telling how. Loads that do not fit are reported as unscheduled.
+
+    It is CPU-bound, so it is meant to run in an executor.
+    """
+    deadline = time.monotonic() + time_budget
+    options = [
+        _make_load_options(load, prices, power_limits, start_after) for load in loads
+    ]
+    chosen = _schedule_greedy(options, power_limits)
+    schedule = LoadSchedule()
+    feasible = all(load_options.starts for load_options in options)
+    if feasible and len(loads) <= max_exact_loads:
+        incumbent = chosen if len(chosen) == len(options) else None
+        exact, finished = _schedule_exact(options, power_limits, incumbent, deadline)
+        # without a full assignment, no way to fit all loads (or no time to find it)
+        if exact is not None:
+            if finished:
+                schedule.method = "exact"
+            elif exact is not incumbent:
+                # out of time, with a better schedule than the greedy one
+                schedule.method = "exact_partial"
+            chosen = exact
+            schedule.optimal = finished
+
+    epochs = prices.raw_epochs()
+    for i, load_options in enumerate(options):
+        if i not in chosen:
+            schedule.unscheduled.append(load_options.load.name)
+            continue
+        start_idx = load_options.starts[chosen[i]]
+        start = datetime.fromtimestamp(epochs[start_idx], UTC_TZ)
+        schedule.assignments.append(
+            LoadAssignment(
+                name=load_options.load.name,
+                start=start,
+                end=start + len(load_options.powers) * prices.step,
+                cost=round(load_options.costs[chosen[i]], PRICE_PRECISION),
+            )
+        )
+    return schedule
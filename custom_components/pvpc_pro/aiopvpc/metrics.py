@@ -0,0 +1,191 @@
+"""
+ESIOS API handler for HomeAssistant. Fetch and processing metrics.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+from .const import LATENCY_HISTOGRAM_BUCKETS_MS
+
+SkipReason = Literal[
+    # the update plan has nothing new to download until later
+    "not_due",
+    # in the evening, with the prices for today and tomorrow
+    "evening_complete",
+    # during the day, with the prices for today
+    "day_complete",
+    # with the prices for today, only tomorrow is requested
+    "today_complete",
+    # the daily request budget is running low
+    "budget_deferred",
+    # the data source is failing
+    "circuit_open",
+]
+
+
+@dataclass
+class IndicatorMetrics:
+    """Counters and timings of the downloads and processing of an indicator."""
+
+    requests: int = 0
+    bytes_received: int = 0
+    latency_total_ms: float = 0.0
+    # requests by latency bucket, with the last bucket for the slowest ones
+    latency_histogram: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_HISTOGRAM_BUCKETS_MS) + 1)
+    )
+    status_codes: Counter[int] = field(default_factory=Counter)
+    # responses with a body that could not be decoded
+    decode_errors: int = 0
+    parse_count: int = 0
+    parse_total_ms: float = 0.0
+    last_parse_ms: float | None = None
+    attributes_count: int = 0
+    attributes_total_ms: float = 0.0
+    last_attributes_ms: float | None = None
+    skipped: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def average_latency_ms(self) -> float | None:
+        """Return the average time of the requests."""
+        if not self.requests:
+            return None
+        return self.latency_total_ms / self.requests
+
+    @property
+    def average_parse_ms(self) -> float | None:
+        """Return the average time to parse a response."""
+        if not self.parse_count:
+            return None
+        return self.parse_total_ms / self.parse_count
+
+    @property
+    def average_attributes_ms(self) -> float | None:
+        """Return the average time to make the state attributes."""
+        if not self.attributes_count:
+            return None
+        return self.attributes_total_ms / self.attributes_count
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {
+            "requests": self.requests,
+            "bytes_received": self.bytes_received,
+            "average_latency_ms": _round(self.average_latency_ms),
+            "latency_histogram": {
+                label: num_requests
+                for label, num_requests in zip(
+                    _LATENCY_BUCKET_LABELS, self.latency_histogram
+                )
+            },
+            "status_codes": {
+                str(status): count
+                for status, count in sorted(self.status_codes.items())
+            },
+            "decode_errors": self.decode_errors,
+            "parse_count": self.parse_count,
+            "average_parse_ms": _round(self.average_parse_ms),
+            "last_parse_ms": _round(self.last_parse_ms),
+            "attributes_count": self.attributes_count,
+            "average_attributes_ms": _round(self.average_attributes_ms),
+            "last_attributes_ms": _round(self.last_attributes_ms),
+            "skipped": dict(sorted(self.skipped.items())),
+        }
+
+
+_LATENCY_BUCKET_LABELS = (
+    *(f"<={limit}ms" for limit in LATENCY_HISTOGRAM_BUCKETS_MS),
+    f">{LATENCY_HISTOGRAM_BUCKETS_MS[-1]}ms",
+)
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 3)
+
+
+class FetchMetrics:
+    """
+    Metrics of `PVPCData`, by sensor key.
+
+    They are kept in memory, from the start of the handler, and recording
+    them is O(1), so they can be always on.
+    """
+
+    def __init__(self) -> None:
+        """Set up empty metrics."""
+        self.indicators: dict[str, IndicatorMetrics] = {}
+
+    def __getitem__(self, sensor_key: str) -> IndicatorMetrics:
+        """Return the metrics of a sensor key, empty if there are none yet."""
+        if sensor_key not in self.indicators:
+            self.indicators[sensor_key] = IndicatorMetrics()
+        return self.indicators[sensor_key]
+
+    def record_request(self, sensor_key: str, status: int, latency: float) -> None:
+        """Count a response, with its time (s) from the request to the full body."""
+        metrics = self[sensor_key]
+        latency_ms = 1000 * latency
+        metrics.requests += 1
+        metrics.latency_total_ms += latency_ms
+        metrics.latency_histogram[
+            bisect_left(LATENCY_HISTOGRAM_BUCKETS_MS, latency_ms)
+        ] += 1
+        metrics.status_codes[status] += 1
+
+    def record_bytes(self, sensor_key: str, num_bytes: int) -> None:
+        """Count the bytes of a response body."""
+        self[sensor_key].bytes_received += num_bytes
+
+    def record_decode_error(self, sensor_key: str) -> None:
+        """Count a response with a body that is not a valid json document."""
+        self[sensor_key].decode_errors += 1
+
+    def record_parse(self, sensor_key: str, elapsed: float) -> None:
+        """Count the time (s) to parse a response."""
+        metrics = self[sensor_key]
+        metrics.parse_count += 1
+        metrics.last_parse_ms = 1000 * elapsed
+        metrics.parse_total_ms += metrics.last_parse_ms
+
+    def record_attributes(self, sensor_key: str, elapsed: float) -> None:
+        """Count the time (s) to make the state and attributes of a sensor."""
+        metrics = self[sensor_key]
+        metrics.attributes_count += 1
+        metrics.last_attributes_ms = 1000 * elapsed
+        metrics.attributes_total_ms += metrics.last_attributes_ms
+
+    def record_skip(self, sensor_key: str, reason: SkipReason) -> None:
+        """Count a download avoided, by its reason."""
+        self[sensor_key].skipped[reason] += 1
+
+    def merged(self) -> IndicatorMetrics:
+        """Return the metrics of all sensor keys together."""
+        total = IndicatorMetrics()
+        for metrics in self.indicators.values():
+            total.requests += metrics.requests
+            total.bytes_received += metrics.bytes_received
+            total.latency_total_ms += metrics.latency_total_ms
+            total.latency_histogram = [
+                a + b
+                for a, b in zip(total.latency_histogram, metrics.latency_histogram)
+            ]
+            total.status_codes.update(metrics.status_codes)
+            total.decode_errors += metrics.decode_errors
+            total.parse_count += metrics.parse_count
+            total.parse_total_ms += metrics.parse_total_ms
+            total.attributes_count += metrics.attributes_count
+            total.attributes_total_ms += metrics.attributes_total_ms
+            total.skipped.update(metrics.skipped)
+        return total
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Return a JSON-serializable representation."""
+        return {
+            sensor_key: metrics.as_dict()
+            for sensor_key, metrics in sorted(self.indicators.items())
+        }
@@ -4,15 +4,18 @@ Developed by Javisen.
 Robust data extraction with look-back logic and geo-fallback.
 """
 
-from datetime import datetime, timedelta
-from itertools import groupby
-from operator import itemgetter
+from collections.abc import Callable, Iterable
+from datetime import date, datetime, timedelta
 from typing import Any
+from urllib.parse import parse_qs, urlsplit
 import logging
 
 from .const import (
     DataSource,
+    DEFAULT_GEO_ZONE,
+    DEFAULT_RESOLUTION,
     EsiosResponse,
+    GEOZONE_FALLBACKS,
     GEOZONE_ID2NAME,
     GEOZONES,
     KEY_PVPC,
@@ -24,14 +27,19 @@ from .const import (
     KEY_DEMAND,
     KEY_RENEWABLES,
     PRICE_PRECISION,
+    QUARTER_HOUR_RESOLUTION,
     REFERENCE_TZ,
     SENSOR_KEY_TO_DATAID,
     TARIFF2ID,
+    TARIFF_20TD_IDS,
     TARIFFS,
+    URL_ESIOS_TOKEN_RANGE_RESOURCE,
     URL_ESIOS_TOKEN_RESOURCE,
     URL_PUBLIC_PVPC_RESOURCE,
     UTC_TZ,
 )
+from .series import PriceSeries
+from .utils import floor_to_resolution
 
 try:
     import zoneinfo
@@ -48,30 +56,160 @@ def _timezone_offset(tz: zoneinfo.ZoneInfo = REFERENCE_TZ) -> timedelta:
     return loc_ts - ref_ts
 
 
-def extract_prices_from_esios_public(
-    data: dict[str, Any], key: str, tz: zoneinfo.ZoneInfo = REFERENCE_TZ
-) -> EsiosResponse:
-    """Parse the contents of a daily PVPC json file (Public API)."""
+def _parse_tariff_value(value: str, prec: int = PRICE_PRECISION) -> float:
+    return round(float(value.replace(",", ".")) / 1000.0, prec)
+
+
+def extract_prices_from_esios_public_tariffs(
+    data: dict[str, Any],
+    tz: zoneinfo.ZoneInfo = REFERENCE_TZ,
+    keys: tuple[str, ...] = tuple(TARIFF_20TD_IDS),
+) -> dict[str, EsiosResponse]:
+    """
+    Parse the prices for several tariffs of a daily PVPC json file in one pass.
+
+    Days with more than 25 rows (92, 96 or 100) come in 15-minute steps.
+    """
     ts_init = datetime(
         *datetime.strptime(data["PVPC"][0]["Dia"], "%d/%m/%Y").timetuple()[:3],
         tzinfo=tz,
-    ).astimezone(UTC_TZ)
+    )
+    step = QUARTER_HOUR_RESOLUTION if len(data["PVPC"]) > 25 else DEFAULT_RESOLUTION
 
-    def _parse_tariff_val(value, prec=PRICE_PRECISION) -> float:
-        return round(float(value.replace(",", ".")) / 1000.0, prec)
+    tariff_prices = {
+        key: PriceSeries(
+            int(ts_init.timestamp()),
+            int(step.total_seconds()),
+            [_parse_tariff_value(values_step[key]) for values_step in data["PVPC"]],
+        )
+        for key in keys
+    }
 
-    pvpc_prices = {
-        ts_init + timedelta(hours=i): _parse_tariff_val(values_hour[key])
-        for i, values_hour in enumerate(data["PVPC"])
+    ts_update = datetime.now(UTC_TZ).replace(microsecond=0)
+    return {
+        key: EsiosResponse(
+            name="PVPC ESIOS",
+            data_id="legacy",
+            last_update=ts_update,
+            unit="€/kWh",
+            series={KEY_PVPC: pvpc_prices},
+        )
+        for key, pvpc_prices in tariff_prices.items()
     }
 
-    return EsiosResponse(
-        name="PVPC ESIOS",
-        data_id="legacy",
-        last_update=datetime.now(UTC_TZ).replace(microsecond=0),
-        unit="€/kWh",
-        series={KEY_PVPC: pvpc_prices},
-    )
+
+def extract_prices_from_esios_public(
+    data: dict[str, Any], key: str, tz: zoneinfo.ZoneInfo = REFERENCE_TZ
+) -> EsiosResponse:
+    """Parse the contents of a daily PVPC json file (Public API)."""
+    return extract_prices_from_esios_public_tariffs(data, tz, (key,))[key]
+
+
+def fill_current_value_with_look_back(values: PriceSeries, sensor_key: str) -> None:
+    """Fill a missing value for the current time step with the latest published one."""
+    if not values:
+        return
+    now_utc = floor_to_resolution(datetime.now(UTC_TZ), values.step)
+    if now_utc not in values:
+        past_values = values.slice(end=now_utc + values.step)
+        if (latest_ts := past_values.last_timestamp) is not None:
+            values[now_utc] = values[latest_ts]
+            _LOGGER.debug(
+                "[%s] Look-back: Usando valor de %s para hora actual",
+                sensor_key,
+                latest_ts,
+            )
+
+
+# conversions of the ESIOS values to the units of each sensor
+def _convert_price(value: Any) -> float:
+    return round(float(value) / 1000.0, 5)
+
+
+def _convert_co2(value: Any) -> float:
+    val = float(value)
+    return round(val / 1000.0, 3) if val > 10 else round(val, 3)
+
+
+def _convert_renewables(value: Any) -> float:
+    val = float(value)
+    return round(val * 100.0, 1) if (0 < val < 1.0) else round(val, 1)
+
+
+def _convert_other(value: Any) -> float:
+    return round(float(value), 1)
+
+
+_PRICE_SENSOR_KEYS = {KEY_PVPC, KEY_INJECTION, KEY_MAG, KEY_OMIE, KEY_ADJUSTMENT}
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _get_value_conversion(sensor_key: str) -> Callable[[Any], float]:
+    """Return the unit conversion of the values of an indicator."""
+    if sensor_key in _PRICE_SENSOR_KEYS:
+        return _convert_price
+    if sensor_key == KEY_CO2:
+        return _convert_co2
+    if sensor_key == KEY_RENEWABLES:
+        return _convert_renewables
+    return _convert_other
+
+
+def _make_epoch_parser(shift: int) -> Callable[[str], int]:
+    """
+    Make a parser of ESIOS datetimes (as '2024-03-31T03:00:00.000+02:00').
+
+    The epoch of each day and the seconds of each UTC offset are parsed once,
+    so each timestamp is integer arithmetic. Other formats use `fromisoformat`.
+    The `shift` (s) is added to all timestamps.
+    """
+    day_epochs: dict[str, int] = {}
+    offsets: dict[str, int] = {}
+
+    def _parse_epoch(ts: str) -> int:
+        if not (
+            len(ts) in (25, 29)
+            and ts[10] == "T"
+            and ts[13] == ts[16] == ts[-3] == ":"
+            and ts[-6] in "+-"
+        ):
+            return int(datetime.fromisoformat(ts).timestamp()) + shift
+        day = ts[:10]
+        if (day_epoch := day_epochs.get(day)) is None:
+            day_epoch = day_epochs[day] = (
+                date.fromisoformat(day).toordinal() - _EPOCH_ORDINAL
+            ) * 86400 + shift
+        offset_str = ts[-6:]
+        if (offset := offsets.get(offset_str)) is None:
+            offset = offsets[offset_str] = (1 if offset_str[0] == "+" else -1) * (
+                int(offset_str[1:3]) * 3600 + int(offset_str[4:6]) * 60
+            )
+        return (
+            day_epoch
+            + int(ts[11:13]) * 3600
+            + int(ts[14:16]) * 60
+            + int(ts[17:19])
+            - offset
+        )
+
+    return _parse_epoch
+
+
+def _make_token_series(
+    items: list[dict[str, Any]],
+    parse_epoch: Callable[[str], int],
+    convert: Callable[[Any], float],
+) -> PriceSeries:
+    epochs = [parse_epoch(item["datetime"]) for item in items]
+    values = [
+        0.0 if (value := item["value"]) is None else convert(value) for item in items
+    ]
+    if len(epochs) > 1:
+        start, step = epochs[0], epochs[1] - epochs[0]
+        if step > 0 and epochs == list(range(start, start + len(epochs) * step, step)):
+            # values in order, without gaps, as published
+            return PriceSeries(start, step, values)
+    return PriceSeries.from_epoch_items(zip(epochs, values))
 
 
 def extract_prices_from_esios_token(
@@ -79,78 +217,60 @@ def extract_prices_from_esios_token(
     sensor_key: str,
     geo_zone: str,
     tz: zoneinfo.ZoneInfo = REFERENCE_TZ,
+    look_back: bool = True,
 ) -> EsiosResponse:
-    """Parse the contents of an 'indicator' json file with ESIOS Token."""
-    indicator_data = data.pop("indicator")
+    """
+    Parse the contents of an 'indicator' json file with ESIOS Token.
+
+    Values are bucketed by geo id in one pass, and only the series of the
+    selected geo zone is parsed. The input data is not modified.
+    """
+    indicator_data = data["indicator"]
     _LOGGER.debug("[%s] Parsing ESIOS ID: %s", sensor_key, indicator_data.get("id"))
 
-    offset_timezone = _timezone_offset(tz)
     ts_update = datetime.now(UTC_TZ).replace(microsecond=0)
-
-    def _parse_dt(ts: str) -> datetime:
-        return datetime.fromisoformat(ts).astimezone(UTC_TZ) + offset_timezone
-
-    def _value_unit_conversion(value: float) -> float:
-        if value is None:
-            return 0.0
-        # Conversión de Precios
-        if sensor_key in [KEY_PVPC, KEY_INJECTION, KEY_MAG, KEY_OMIE, KEY_ADJUSTMENT]:
-            return round(float(value) / 1000.0, 5)
-        # Conversión de CO2
-        if sensor_key == KEY_CO2:
-            val = float(value)
-            return round(val / 1000.0, 3) if val > 10 else round(val, 3)
-        # Renovables y otros
-        if sensor_key == KEY_RENEWABLES:
-            val = float(value)
-            return round(val * 100.0, 1) if (0 < val < 1.0) else round(val, 1)
-        return round(float(value), 1)
-
-    if not indicator_data.get("values"):
+    values = indicator_data.get("values")
+    if not values:
         return EsiosResponse(
             name=indicator_data["name"],
             data_id=str(indicator_data["id"]),
             last_update=ts_update,
             unit="N/A",
-            series={sensor_key: {}},
+            series={sensor_key: PriceSeries()},
         )
 
-    value_gen = groupby(
-        sorted(indicator_data["values"], key=itemgetter("geo_id")), itemgetter("geo_id")
+    buckets: dict[int, list[dict[str, Any]]] = {}
+    for item in values:
+        geo_id = item["geo_id"]
+        if (bucket := buckets.get(geo_id)) is None:
+            bucket = buckets[geo_id] = []
+        bucket.append(item)
+    # geo id of each zone, in order of geo ids, with the last one for repeated zones
+    zone_geo_ids: dict[str, int] = {}
+    for geo_id in sorted(buckets) if len(buckets) > 1 else buckets:
+        zone_geo_ids[GEOZONE_ID2NAME.get(geo_id, f"Unknown_{geo_id}")] = geo_id
+
+    parse_epoch = _make_epoch_parser(int(_timezone_offset(tz).total_seconds()))
+    convert = _get_value_conversion(sensor_key)
+    first_geo_id = next(iter(zone_geo_ids.values()))
+    selected_geo_id = next(
+        (
+            zone_geo_ids[zone]
+            for zone in [geo_zone, *GEOZONE_FALLBACKS]
+            if zone in zone_geo_ids
+        ),
+        first_geo_id,
     )
-    parsed_data = {
-        GEOZONE_ID2NAME.get(g_id, f"Unknown_{g_id}"): dict(
-            sorted(
-                [
-                    (_parse_dt(i["datetime"]), _value_unit_conversion(i["value"]))
-                    for i in list(group)
-                ]
-            )
+    selected_zone_values = _make_token_series(
+        buckets[selected_geo_id], parse_epoch, convert
+    )
+    if not selected_zone_values and selected_geo_id != first_geo_id:
+        selected_zone_values = _make_token_series(
+            buckets[first_geo_id], parse_epoch, convert
         )
-        for g_id, group in value_gen
-    }
 
-    selected_zone_values = {}
-    for zone in [geo_zone, "España", "Península"]:
-        if zone in parsed_data:
-            selected_zone_values = parsed_data[zone]
-            break
-
-    if not selected_zone_values and parsed_data:
-        selected_zone_values = list(parsed_data.values())[0]
-
-    if selected_zone_values:
-        now_utc = datetime.now(UTC_TZ).replace(minute=0, second=0, microsecond=0)
-        if now_utc not in selected_zone_values:
-            past_hours = [ts for ts in selected_zone_values.keys() if ts <= now_utc]
-            if past_hours:
-                latest_ts = max(past_hours)
-                selected_zone_values[now_utc] = selected_zone_values[latest_ts]
-                _LOGGER.debug(
-                    "[%s] Look-back: Usando valor de %s para hora actual",
-                    sensor_key,
-                    latest_ts,
-                )
+    if look_back:
+        fill_current_value_with_look_back(selected_zone_values, sensor_key)
 
     return EsiosResponse(
         name=indicator_data["name"],
@@ -161,16 +281,83 @@ def extract_prices_from_esios_token(
     )
 
 
+def get_url_data_source(url: str) -> DataSource:
+    """Return the data source serving an ESIOS URL."""
+    return "esios_public" if "/archives/" in url else "esios"
+
+
+def get_url_fetch_key(url: str) -> tuple[str, str, str, str]:
+    """
+    Return the (data source, indicator, day, geo filter) requested by an ESIOS URL.
+
+    The geo filter is the comma-separated `geo_ids[]` of the URL, empty without it.
+    """
+    url_parts = urlsplit(url)
+    query = parse_qs(url_parts.query)
+    if get_url_data_source(url) == "esios_public":
+        return "esios_public", url_parts.path.split("/")[-2], query["date"][0], ""
+    day = query["start_date"][0][:10]
+    if (end_day := query["end_date"][0][:10]) != day:
+        day = f"{day}/{end_day}"
+    geo_filter = ",".join(query.get("geo_ids[]", []))
+    return "esios", url_parts.path.split("/")[-1], day, geo_filter
+
+
 def extract_esios_data(
     data: dict[str, Any],
     url: str,
     sensor_key: str,
     tariff: str,
     tz: zoneinfo.ZoneInfo = REFERENCE_TZ,
+    geo_zone: str = DEFAULT_GEO_ZONE,
 ) -> EsiosResponse:
     if "/archives/" in url:
         return extract_prices_from_esios_public(data, TARIFF2ID[tariff], tz)
-    return extract_prices_from_esios_token(data, sensor_key, "Península", tz)
+    return extract_prices_from_esios_token(data, sensor_key, geo_zone, tz)
+
+
+def split_esios_token_data_by_day(data: dict[str, Any]) -> dict[date, dict[str, Any]]:
+    """
+    Split a multi-day 'indicator' json file into daily chunks.
+
+    Values are grouped by the local day of their ESIOS `datetime`,
+    so each chunk has the same shape as a single-day response.
+    """
+    indicator_data = data["indicator"]
+    values_by_day: dict[str, list[dict[str, Any]]] = {}
+    for item in indicator_data.get("values") or []:
+        values_by_day.setdefault(item["datetime"][:10], []).append(item)
+
+    return {
+        date.fromisoformat(day): {"indicator": {**indicator_data, "values": values}}
+        for day, values in sorted(values_by_day.items())
+    }
+
+
+def extract_esios_range_data(
+    data: dict[str, Any],
+    sensor_key: str,
+    tz: zoneinfo.ZoneInfo = REFERENCE_TZ,
+    geo_zone: str = DEFAULT_GEO_ZONE,
+) -> dict[date, EsiosResponse]:
+    """Parse a multi-day 'indicator' json file into daily responses."""
+    return {
+        day: extract_prices_from_esios_token(
+            day_data, sensor_key, geo_zone, tz, look_back=False
+        )
+        for day, day_data in split_esios_token_data_by_day(data).items()
+    }
+
+
+def _make_geo_filter(sensor_key: str, geo_ids: dict[str, Iterable[int]] | None) -> str:
+    if not geo_ids or sensor_key not in geo_ids:
+        return ""
+    return "".join(f"&geo_ids[]={geo_id}" for geo_id in geo_ids[sensor_key])
+
+
+def get_url_without_geo_filter(url: str) -> str:
+    """Remove the `geo_ids[]` parameters from an indicator URL."""
+    return url.split("&geo_ids[]=", 1)[0]
 
 
 def get_daily_urls_to_download(
@@ -178,7 +365,14 @@ def get_daily_urls_to_download(
     sensor_keys: set[str],
     now_local_ref: datetime,
     next_day_local_ref: datetime,
+    geo_ids: dict[str, Iterable[int]] | None = None,
 ) -> tuple[list[str], list[str]]:
+    """
+    Build the URLs to download today and tomorrow for each indicator.
+
+    With `geo_ids`, indicators are requested only for those geo ids,
+    so the server filters out the zones that the parser would discard.
+    """
     if source == "esios_public":
         u = URL_PUBLIC_PVPC_RESOURCE.format(day=now_local_ref.date())
         un = URL_PUBLIC_PVPC_RESOURCE.format(day=next_day_local_ref.date())
@@ -189,12 +383,48 @@ def get_daily_urls_to_download(
         URL_ESIOS_TOKEN_RESOURCE.format(
             ind=SENSOR_KEY_TO_DATAID[k], day=now_local_ref.date()
         )
+        + _make_geo_filter(k, geo_ids)
         for k in downloadable_keys
     ]
     tomorrow = [
         URL_ESIOS_TOKEN_RESOURCE.format(
             ind=SENSOR_KEY_TO_DATAID[k], day=next_day_local_ref.date()
         )
+        + _make_geo_filter(k, geo_ids)
         for k in downloadable_keys
     ]
     return today, tomorrow
+
+
+def get_range_urls_to_download(
+    source: DataSource,
+    sensor_keys: set[str],
+    start: date,
+    end: date,
+    geo_ids: dict[str, Iterable[int]] | None = None,
+) -> dict[str, list[str]]:
+    """
+    Build the URLs to download a range of days for each indicator.
+
+    The public archive only serves single days, so it needs one URL per day;
+    with the ESIOS token, each indicator is requested once for the whole range.
+    """
+    if source == "esios_public":
+        num_days = (end - start).days + 1
+        return {
+            KEY_PVPC: [
+                URL_PUBLIC_PVPC_RESOURCE.format(day=start + timedelta(days=i))
+                for i in range(num_days)
+            ]
+        }
+
+    return {
+        k: [
+            URL_ESIOS_TOKEN_RANGE_RESOURCE.format(
+                ind=SENSOR_KEY_TO_DATAID[k], start=start, end=end
+            )
+            + _make_geo_filter(k, geo_ids)
+        ]
+        for k in sensor_keys
+        if k in SENSOR_KEY_TO_DATAID
+    }
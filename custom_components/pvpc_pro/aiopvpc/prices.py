@@ -1,45 +1,75 @@
 """
-ESIOS API handler for HomeAssistant. Hourly price attributes.
+ESIOS API handler for HomeAssistant. Price attributes.
 Modified and maintained by Javisen - 2026.
 """
 
+from __future__ import annotations
+
 import zoneinfo
+from collections.abc import Sequence
 from contextlib import suppress
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
 from typing import Any
 
-from .const import EsiosApiData, KEY_ADJUSTMENT, KEY_INDEXED, KEY_INJECTION, KEY_PVPC
-
+from .const import (
+    DEFAULT_RESOLUTION,
+    EsiosApiData,
+    KEY_ADJUSTMENT,
+    KEY_INDEXED,
+    KEY_INJECTION,
+    KEY_PVPC,
+    PRICE_PRECISION,
+)
+from .series import PriceSeries
+from .utils import floor_to_resolution, get_series_resolution
 
-def _is_tomorrow_price(ts: datetime, ref: datetime) -> bool:
-    return any(
-        ts_comp > ts_tz_ref
-        for ts_comp, ts_tz_ref in zip(ts.isocalendar(), ref.isocalendar())
-    )
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 
 def _split_today_tomorrow_prices(
-    current_prices: dict[datetime, float],
+    current_prices: PriceSeries,
     utc_time: datetime,
     timezone: zoneinfo.ZoneInfo,
-) -> tuple[dict[datetime, float], dict[datetime, float]]:
-    local_time = utc_time.astimezone(timezone)
-    today, tomorrow = {}, {}
-    for ts_utc, price_h in current_prices.items():
-        ts_local = ts_utc.astimezone(timezone)
-        if _is_tomorrow_price(ts_local, local_time):
-            tomorrow[ts_utc] = price_h
-        else:
-            today[ts_utc] = price_h
-    return today, tomorrow
+) -> tuple[PriceSeries, PriceSeries]:
+    # views over the same buffer, split at the start of the next local day
+    tomorrow_start = datetime.combine(
+        utc_time.astimezone(timezone).date() + timedelta(days=1), time(), timezone
+    )
+    return (
+        current_prices.slice(end=tomorrow_start),
+        current_prices.slice(start=tomorrow_start),
+    )
+
+
+def _make_hourly_prices(prices: PriceSeries) -> PriceSeries:
+    """Average the prices of each hour, for series with sub-hourly steps."""
+    if get_series_resolution(prices) == DEFAULT_RESOLUTION:
+        return prices
+    hourly_values: dict[datetime, list[float]] = {}
+    for ts_utc, price in prices.items():
+        hourly_values.setdefault(
+            floor_to_resolution(ts_utc, DEFAULT_RESOLUTION), []
+        ).append(price)
+    return PriceSeries.from_items(
+        (
+            (ts_hour, round(sum(values) / len(values), PRICE_PRECISION))
+            for ts_hour, values in hourly_values.items()
+        ),
+        step=int(DEFAULT_RESOLUTION.total_seconds()),
+    )
 
 
 def _make_price_tag_attributes(
-    prices: dict[datetime, float], timezone: zoneinfo.ZoneInfo, tomorrow: bool
+    prices: PriceSeries, timezone: zoneinfo.ZoneInfo, tomorrow: bool
 ) -> dict[str, Any]:
+    # one tag per hour, also for quarter-hour prices, to keep attributes bounded
     prefix = "price_next_day_" if tomorrow else "price_"
     attributes = {}
-    for ts_utc, price_h in prices.items():
+    for ts_utc, price_h in _make_hourly_prices(prices).items():
         ts_local = ts_utc.astimezone(timezone)
         attr_key = f"{prefix}{ts_local.hour:02d}h"
         if attr_key in attributes:
@@ -48,96 +78,303 @@ def _make_price_tag_attributes(
     return attributes
 
 
+def _local_hours(epochs: "np.ndarray", timezone: zoneinfo.ZoneInfo) -> "np.ndarray":
+    offsets = {
+        datetime.fromtimestamp(int(epochs[i]), timezone).utcoffset() for i in (0, -1)
+    }
+    if len(offsets) == 1:
+        # same UTC offset for the whole series, so no DST change in between
+        offset = int(offsets.pop().total_seconds())
+        return (epochs + offset) // 3600 % 24
+    return np.array(
+        [datetime.fromtimestamp(int(epoch), timezone).hour for epoch in epochs]
+    )
+
+
+@dataclass
+class DayPriceStats:
+    """
+    Derived data of the prices of one day, which does not depend on the time.
+
+    With NumPy, the sequences are arrays; without it, lists.
+    """
+
+    sign_is_best: int
+    epochs: Sequence[int]
+    prices: Sequence[float]
+    sort_keys: Sequence[float]
+    sorted_epochs: Sequence[int]
+    sorted_hours: Sequence[int]
+    positions: dict[float, int]
+    min_price: float
+    max_price: float
+    min_price_at: int
+    max_price_at: int
+    price_tags: dict[str, Any]
+    sub_hourly: bool
+
+
+def _make_day_price_stats_np(
+    sign_is_best: int, prices: PriceSeries, timezone: zoneinfo.ZoneInfo
+) -> tuple[Any, ...]:
+    raw_values = np.frombuffer(prices.raw_values(), dtype=np.float64)
+    raw_epochs = prices.raw_epochs()
+    valid = np.flatnonzero(~np.isnan(raw_values))
+    values = raw_values[valid]
+    epochs = raw_epochs.start + valid * raw_epochs.step
+    sort_keys = sign_is_best * values
+    order = np.argsort(sort_keys, kind="stable")
+    return (
+        epochs,
+        values,
+        sort_keys,
+        epochs[order],
+        _local_hours(epochs, timezone)[order],
+        values[order].tolist(),
+        float(values.min()),
+        float(values.max()),
+    )
+
+
+def _make_day_price_stats_py(
+    sign_is_best: int, prices: PriceSeries, timezone: zoneinfo.ZoneInfo
+) -> tuple[Any, ...]:
+    epochs = [int(ts.timestamp()) for ts in prices]
+    values = list(prices.values())
+    sort_keys = [sign_is_best * price for price in values]
+    order = sorted(range(len(values)), key=sort_keys.__getitem__)
+    sorted_epochs = [epochs[i] for i in order]
+    return (
+        epochs,
+        values,
+        sort_keys,
+        sorted_epochs,
+        [datetime.fromtimestamp(epoch, timezone).hour for epoch in sorted_epochs],
+        [values[i] for i in order],
+        min(values),
+        max(values),
+    )
+
+
+def make_day_price_stats(
+    sensor_key: str, prices: PriceSeries, timezone: zoneinfo.ZoneInfo, tomorrow: bool
+) -> DayPriceStats:
+    """Sort the prices of a day and collect what does not change with the time."""
+    sign_is_best = 1 if sensor_key != KEY_INJECTION else -1
+    make_stats = (
+        _make_day_price_stats_np if np is not None else _make_day_price_stats_py
+    )
+    (
+        epochs,
+        values,
+        sort_keys,
+        sorted_epochs,
+        sorted_hours,
+        sorted_prices,
+        min_price,
+        max_price,
+    ) = make_stats(sign_is_best, prices, timezone)
+    positions: dict[float, int] = {}
+    for position, price in enumerate(sorted_prices, 1):
+        positions.setdefault(price, position)
+    first_price_at = int(sorted_hours[0])
+    last_price_at = int(sorted_hours[-1])
+    return DayPriceStats(
+        sign_is_best=sign_is_best,
+        epochs=epochs,
+        prices=values,
+        sort_keys=sort_keys,
+        sorted_epochs=sorted_epochs,
+        sorted_hours=sorted_hours,
+        positions=positions,
+        min_price=min_price,
+        max_price=max_price,
+        min_price_at=first_price_at if sign_is_best == 1 else last_price_at,
+        max_price_at=last_price_at if sign_is_best == 1 else first_price_at,
+        price_tags=_make_price_tag_attributes(prices, timezone, tomorrow),
+        sub_hourly=prices.step < timedelta(hours=1),
+    )
+
+
 def _make_price_stats_attributes(
-    sensor_key: str,
-    current_price: float,
-    current_prices: dict[datetime, float],
-    utc_time: datetime,
-    timezone: zoneinfo.ZoneInfo,
+    stats: DayPriceStats, current_price: float, utc_time: datetime
 ) -> dict[str, Any]:
     attributes: dict[str, Any] = {}
-    sign_is_best = 1 if sensor_key != KEY_INJECTION else -1
-    prices_sorted = dict(
-        sorted(current_prices.items(), key=lambda x: sign_is_best * x[1])
-    )
-    better_prices_ahead = [
-        (ts, price)
-        for ts, price in current_prices.items()
-        if ts > utc_time and price * sign_is_best < current_price * sign_is_best
-    ]
-    if better_prices_ahead:
-        next_better_ts, next_better_price = better_prices_ahead[0]
-        delta_better = next_better_ts - utc_time
-        attributes["next_better_price"] = next_better_price
-        attributes["hours_to_better_price"] = int(delta_better.total_seconds()) // 3600
-        attributes["num_better_prices_ahead"] = len(better_prices_ahead)
+    utc_epoch = utc_time.timestamp()
+    best_key = current_price * stats.sign_is_best
+    if np is not None and isinstance(stats.epochs, np.ndarray):
+        better_ahead = np.flatnonzero(
+            (stats.epochs > utc_epoch) & (stats.sort_keys < best_key)
+        ).tolist()
+        next_best_at = stats.sorted_hours[stats.sorted_epochs >= utc_epoch].tolist()
+    else:
+        better_ahead = [
+            i
+            for i, (epoch, sort_key) in enumerate(zip(stats.epochs, stats.sort_keys))
+            if epoch > utc_epoch and sort_key < best_key
+        ]
+        next_best_at = [
+            hour
+            for epoch, hour in zip(stats.sorted_epochs, stats.sorted_hours)
+            if epoch >= utc_epoch
+        ]
 
-    with suppress(ValueError):
-        attributes["price_position"] = (
-            list(prices_sorted.values()).index(current_price) + 1
+    if better_ahead:
+        next_better = better_ahead[0]
+        delta_better = (
+            datetime.fromtimestamp(int(stats.epochs[next_better]), utc_time.tzinfo)
+            - utc_time
         )
+        attributes["next_better_price"] = float(stats.prices[next_better])
+        attributes["hours_to_better_price"] = int(delta_better.total_seconds()) // 3600
+        attributes["num_better_prices_ahead"] = len(better_ahead)
+
+    if (position := stats.positions.get(current_price)) is not None:
+        attributes["price_position"] = position
 
-    max_price = max(current_prices.values())
-    min_price = min(current_prices.values())
     with suppress(ZeroDivisionError):
         attributes["price_ratio"] = round(
-            (current_price - min_price) / (max_price - min_price), 2
+            (current_price - stats.min_price) / (stats.max_price - stats.min_price), 2
         )
 
-    attributes["max_price"] = max_price
-    first_price_at = next(iter(prices_sorted)).astimezone(timezone).hour
-    last_price_at = next(iter(reversed(prices_sorted))).astimezone(timezone).hour
-    attributes["max_price_at"] = last_price_at if sign_is_best == 1 else first_price_at
-    attributes["min_price"] = min_price
-    attributes["min_price_at"] = first_price_at if sign_is_best == 1 else last_price_at
-    attributes["next_best_at"] = [
-        ts.astimezone(timezone).hour for ts in prices_sorted if ts >= utc_time
-    ]
+    attributes["max_price"] = stats.max_price
+    attributes["max_price_at"] = stats.max_price_at
+    attributes["min_price"] = stats.min_price
+    attributes["min_price_at"] = stats.min_price_at
+    # quarter-hours of the same hour are listed once, but hourly prices keep
+    # the local hour repeated in the long DST day, as before
+    attributes["next_best_at"] = (
+        list(dict.fromkeys(next_best_at)) if stats.sub_hourly else next_best_at
+    )
     return attributes
 
 
+class PriceStatsCache:
+    """
+    Day statistics of each price series, reused while the series does not change.
+
+    Entries are checked against the series object and its `version`,
+    so new or updated data (and pruning) is processed again.
+    """
+
+    def __init__(self) -> None:
+        """Set up an empty cache."""
+        self._entries: dict[
+            str,
+            tuple[
+                PriceSeries,
+                int,
+                date,
+                zoneinfo.ZoneInfo,
+                tuple[DayPriceStats, DayPriceStats | None],
+            ],
+        ] = {}
+
+    def get_day_stats(
+        self,
+        sensor_key: str,
+        current_prices: PriceSeries,
+        utc_time: datetime,
+        timezone: zoneinfo.ZoneInfo,
+    ) -> tuple[DayPriceStats, DayPriceStats | None]:
+        """Return the statistics of today and tomorrow (if available)."""
+        day = utc_time.astimezone(timezone).date()
+        entry = self._entries.get(sensor_key)
+        if (
+            entry is not None
+            and entry[0] is current_prices
+            and entry[1:4] == (current_prices.version, day, timezone)
+        ):
+            return entry[4]
+
+        day_stats = _make_today_tomorrow_stats(
+            sensor_key, current_prices, utc_time, timezone
+        )
+        self._entries[sensor_key] = (
+            current_prices,
+            current_prices.version,
+            day,
+            timezone,
+            day_stats,
+        )
+        return day_stats
+
+
+def _make_today_tomorrow_stats(
+    sensor_key: str,
+    current_prices: PriceSeries,
+    utc_time: datetime,
+    timezone: zoneinfo.ZoneInfo,
+) -> tuple[DayPriceStats, DayPriceStats | None]:
+    today, tomorrow = _split_today_tomorrow_prices(current_prices, utc_time, timezone)
+    return (
+        make_day_price_stats(sensor_key, today, timezone, False),
+        (
+            make_day_price_stats(sensor_key, tomorrow, timezone, True)
+            if tomorrow
+            else None
+        ),
+    )
+
+
 def make_price_sensor_attributes(
     sensor_key: str,
-    current_prices: dict[datetime, float],
+    current_prices: PriceSeries,
     utc_time: datetime,
     timezone: zoneinfo.ZoneInfo,
+    stats_cache: PriceStatsCache | None = None,
 ) -> dict[str, Any]:
-    """Generate sensor attributes for hourly prices variables."""
+    """
+    Generate sensor attributes for hourly or quarter-hourly prices variables.
+
+    With a `stats_cache`, only the attributes depending on the current time
+    are computed while the series does not change.
+    """
     current_price = current_prices[utc_time]
-    today, tomorrow = _split_today_tomorrow_prices(current_prices, utc_time, timezone)
-    price_attrs = _make_price_stats_attributes(
-        sensor_key, current_price, today, utc_time, timezone
+    today, tomorrow = (
+        stats_cache.get_day_stats(sensor_key, current_prices, utc_time, timezone)
+        if stats_cache is not None
+        else _make_today_tomorrow_stats(sensor_key, current_prices, utc_time, timezone)
     )
-    price_tags = _make_price_tag_attributes(today, timezone, False)
-    if tomorrow:
+    price_attrs = _make_price_stats_attributes(today, current_price, utc_time)
+    price_tags = today.price_tags
+    if tomorrow is not None:
         tomorrow_prices = {
             f"{key} (next day)": value
             for key, value in _make_price_stats_attributes(
-                sensor_key, current_price, tomorrow, utc_time, timezone
+                tomorrow, current_price, utc_time
             ).items()
         }
-        tomorrow_price_tags = _make_price_tag_attributes(tomorrow, timezone, True)
         price_attrs = {**price_attrs, **tomorrow_prices}
-        price_tags = {**price_tags, **tomorrow_price_tags}
+        price_tags = {**price_tags, **tomorrow.price_tags}
     return {**price_attrs, **price_tags}
 
 
 def add_composed_price_sensors(data: EsiosApiData):
-    """Calculate price sensors derived from multiple data series."""
-    if (
+    """
+    Calculate price sensors derived from multiple data series.
+
+    When the series have different time steps, they are combined in the finer one,
+    using for the coarser series the price of the step containing each timestamp.
+    """
+    if not (
         data.availability.get(KEY_PVPC, False)
         and data.availability.get(KEY_ADJUSTMENT, False)
-        and (
-            common_ts_prices := set(data.sensors[KEY_PVPC]).intersection(
-                set(data.sensors[KEY_ADJUSTMENT])
-            )
-        )
     ):
-        # generate 'indexed tariff' as: PRICE = PVPC - ADJUSTMENT
-        pvpc = data.sensors[KEY_PVPC]
-        adjustment = data.sensors[KEY_ADJUSTMENT]
-        data.sensors[KEY_INDEXED] = {
-            ts_hour: round(pvpc[ts_hour] - adjustment[ts_hour], 5)
-            for ts_hour in sorted(common_ts_prices)
-        }
+        return
+
+    # generate 'indexed tariff' as: PRICE = PVPC - ADJUSTMENT
+    pvpc = data.sensors[KEY_PVPC]
+    adjustment = data.sensors[KEY_ADJUSTMENT]
+    pvpc_resolution = get_series_resolution(pvpc)
+    adjustment_resolution = get_series_resolution(adjustment)
+    finer = pvpc if pvpc_resolution <= adjustment_resolution else adjustment
+    indexed = PriceSeries(step=int(finer.step.total_seconds()))
+    for ts in finer:
+        pvpc_ts = floor_to_resolution(ts, pvpc_resolution)
+        adjustment_ts = floor_to_resolution(ts, adjustment_resolution)
+        if pvpc_ts in pvpc and adjustment_ts in adjustment:
+            indexed[ts] = round(pvpc[pvpc_ts] - adjustment[adjustment_ts], 5)
+    if indexed:
+        data.sensors[KEY_INDEXED] = indexed
         data.availability[KEY_INDEXED] = True
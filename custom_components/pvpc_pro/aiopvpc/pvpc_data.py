@@ -8,11 +8,27 @@ Based on the original work for the HomeAssistant integration.
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import json
 import logging
+import sqlite3
+import time
 from collections import deque
-from datetime import datetime, timedelta
+from dataclasses import replace
+from functools import partial
+from datetime import date, datetime, timedelta
 from random import random
-from typing import Any
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Mapping,
+    Sequence,
+    TypeVar,
+)
 
 import aiohttp
 import async_timeout
@@ -21,24 +37,78 @@ from .const import (
     ALL_SENSORS,
     ATTRIBUTIONS,
     DataSource,
+    DAY_AHEAD_PUBLICATION_HOUR,
+    DEFAULT_BACKFILL_CHUNK_DAYS,
+    DEFAULT_BACKFILL_CONCURRENCY,
+    DEFAULT_GEO_ZONE,
     DEFAULT_POWER_KW,
+    DEFAULT_RESOLUTION,
+    DEFAULT_RESPONSE_CACHE_SIZE,
+    DEFAULT_SCHEDULE_TIME_BUDGET,
+    DEFAULT_STREAM_CHUNK_SIZE,
     DEFAULT_TIMEOUT,
     EsiosApiData,
     EsiosResponse,
+    GEOZONE_FALLBACKS,
+    GEOZONES,
+    KEY_INJECTION,
     KEY_PVPC,
+    MULTI_GEO_SENSOR_KEYS,
+    PRIORITY_LOW,
     REFERENCE_TZ,
     SENSOR_KEY_TO_API_SERIES,
     SENSOR_KEY_TO_DATAID,
+    SENSOR_KEY_TO_UPDATE_CADENCE_MINUTES,
+    TARIFF2ID,
+    TARIFF_ID2GEOZONE,
     TARIFFS,
     UTC_TZ,
     zoneinfo,
 )
-from .parser import extract_esios_data, get_daily_urls_to_download
-from .prices import add_composed_price_sensors, make_price_sensor_attributes
+from .battery import Battery, BatteryPlan, optimize_battery
+from .backfill import BackfillCheckpoint, BackfillReport, split_pending_days
+from .cache import EsiosResponseCache, make_conditional_headers
+from .parser import (
+    extract_esios_range_data,
+    extract_prices_from_esios_public,
+    extract_prices_from_esios_public_tariffs,
+    extract_prices_from_esios_token,
+    fill_current_value_with_look_back,
+    get_daily_urls_to_download,
+    get_range_urls_to_download,
+    get_url_data_source,
+    get_url_fetch_key,
+    get_url_without_geo_filter,
+)
+from .prices import (
+    add_composed_price_sensors,
+    make_price_sensor_attributes,
+    PriceStatsCache,
+)
 from .pvpc_tariff import get_current_and_next_tariff_periods
-from .utils import ensure_utc_time
+from .series import PriceSeries
+from .history import HistoryStore
+from .loads import Load, LoadSchedule, make_power_limits, schedule_loads
+from .metrics import FetchMetrics
+from .shared_cache import SharedFetchCache
+from .streaming import decode_indicator_stream, get_geo_ids_for_zones
+from .scheduler import (
+    get_request_scheduler,
+    RequestDeferredError,
+    RequestScheduler,
+)
+from .retry import (
+    CircuitBreaker,
+    parse_retry_after,
+    RetryableStatusError,
+    RetryPolicy,
+)
+from .update_plan import get_next_update_time
+from .utils import ensure_utc_time, floor_to_resolution, get_series_resolution
 
 _LOGGER = logging.getLogger(__name__)
+_T = TypeVar("_T")
+_ResponsesT = TypeVar("_ResponsesT", bound=Mapping[Any, EsiosResponse])
 
 _STANDARD_USER_AGENTS = [
     (
@@ -74,7 +144,7 @@ class PVPCData:
     * Async download of prices for each day
     * Generate state attributes for HA integration.
 
-    - Prices are returned in a `dict[datetime, float]`,
+    - Prices are returned in a `PriceSeries` (a mapping of datetimes to prices),
     with timestamps in UTC and prices in €/kWh.
     """
 
@@ -90,6 +160,11 @@ class PVPCData:
         data_source: DataSource = "esios_public",
         api_token: str | None = None,
         sensor_keys: tuple[str, ...] = (KEY_PVPC,),
+        response_cache_size: int = DEFAULT_RESPONSE_CACHE_SIZE,
+        retry_policy: RetryPolicy | None = None,
+        shared_cache: SharedFetchCache | None = None,
+        geo_zone: str = DEFAULT_GEO_ZONE,
+        history: HistoryStore | None = None,
     ) -> None:
         """Set up API access."""
         self.states: dict[str, float | None] = {}
@@ -104,6 +179,24 @@ class PVPCData:
             self._data_source = "esios"
         assert (data_source != "esios") or self._api_token is not None, data_source
         self._user_agents = deque(sorted(_STANDARD_USER_AGENTS, key=lambda _: random()))
+        self._response_cache = EsiosResponseCache(response_cache_size)
+        self._price_stats_cache = PriceStatsCache()
+        self._shared_cache = shared_cache
+        self._history = history
+        self._bytes_downloaded = 0
+        self._metrics = FetchMetrics()
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._circuit_breakers: dict[DataSource, CircuitBreaker] = {
+            "esios": CircuitBreaker(),
+            "esios_public": CircuitBreaker(),
+        }
+
+        assert geo_zone in GEOZONES, geo_zone
+        self._geo_zone = geo_zone
+        self._geo_ids = get_geo_ids_for_zones((geo_zone, *GEOZONE_FALLBACKS))
+        # indicators not published for the wanted geo ids, requested unfiltered
+        self._unfiltered_geo_keys: set[str] = set()
+        self._next_updates: dict[str, datetime] = {}
 
         self._local_timezone = zoneinfo.ZoneInfo(str(local_timezone))
         assert tariff in TARIFFS
@@ -112,17 +205,36 @@ class PVPCData:
         self._power = power
         self._power_valley = power_valley
 
+    @property
+    def _scheduler(self) -> RequestScheduler:
+        return get_request_scheduler(
+            self._api_token if self.using_private_api else None
+        )
+
+    @property
+    def request_stats(self) -> dict[str, dict[str, int]]:
+        """Return the requests issued and deferred per day with the current token."""
+        return self._scheduler.ledger.stats
+
     @property
     def using_private_api(self) -> bool:
         """Check if an API token is available and data-source is ESIOS."""
         return self._api_token is not None and self._data_source == "esios"
 
-    async def _api_get_data(self, sensor_key: str, url: str) -> EsiosResponse | None:
+    async def _api_get_parsed(
+        self,
+        sensor_key: str,
+        url: str,
+        parse: Callable[[str, str, dict[str, Any]], _T],
+        stream: bool = False,
+    ) -> _T | None:
+        cached = self._response_cache.get(url)
         headers = {
             "Accept": "application/json",
             "Content-Type": "application/json",
             "Host": "api.esios.ree.es",
             "User-Agent": self._user_agents[0],
+            **make_conditional_headers(cached),
         }
         if self.using_private_api:
             assert self._api_token is not None
@@ -130,12 +242,58 @@ class PVPCData:
             headers["Authorization"] = f"Token token={self._api_token}"
 
         assert self._session is not None
+        time_start = time.perf_counter()
         resp = await self._session.get(url, headers=headers)
-        if resp.status < 400:
-            data = await resp.json()
-            return extract_esios_data(
-                data, url, sensor_key, self.tariff, tz=self._local_timezone
+        not_modified = resp.status == 304 and cached is not None
+        if not_modified or resp.status >= 400:
+            # no body to wait for
+            self._metrics.record_request(
+                sensor_key, resp.status, time.perf_counter() - time_start
+            )
+        if not_modified:
+            _LOGGER.debug("[%s] Not modified since last download: %s", sensor_key, url)
+            return cached.parsed
+        elif resp.status < 400:
+            try:
+                if stream:
+                    # decode only the values of the wanted geo zones, as they arrive
+                    data = await decode_indicator_stream(
+                        self._count_bytes(
+                            sensor_key,
+                            resp.content.iter_chunked(DEFAULT_STREAM_CHUNK_SIZE),
+                        ),
+                        self._geo_ids,
+                    )
+                else:
+                    body = await resp.read()
+                    self._bytes_downloaded += len(body)
+                    self._metrics.record_bytes(sensor_key, len(body))
+                    self._metrics.record_request(
+                        sensor_key, resp.status, time.perf_counter() - time_start
+                    )
+                    data = json.loads(body)
+            except ValueError:
+                if stream:
+                    # the body (or its first part) was received, but it is not valid
+                    self._metrics.record_request(
+                        sensor_key, resp.status, time.perf_counter() - time_start
+                    )
+                self._metrics.record_decode_error(sensor_key)
+                raise
+            if stream:
+                self._metrics.record_request(
+                    sensor_key, resp.status, time.perf_counter() - time_start
+                )
+            time_start = time.perf_counter()
+            parsed = parse(sensor_key, url, data)
+            self._metrics.record_parse(sensor_key, time.perf_counter() - time_start)
+            self._response_cache.put(
+                url,
+                resp.headers.get("ETag"),
+                resp.headers.get("Last-Modified"),
+                parsed,
             )
+            return parsed
         elif resp.status in (401, 403) and self._data_source == "esios":
             _LOGGER.warning(
                 "[%s] Unauthorized error with '%s': %s",
@@ -152,6 +310,10 @@ class PVPCData:
             )
             # loop user-agent and data-source
             self._user_agents.rotate()
+        elif resp.status == 429 or resp.status >= 500:
+            raise RetryableStatusError(
+                resp.status, parse_retry_after(resp.headers.get("Retry-After"))
+            )
         else:
             _LOGGER.error(
                 "[%s] Unknown error [%d] with '%s': %s",
@@ -162,29 +324,282 @@ class PVPCData:
             )
         return None
 
-    async def _download_daily_data(
+    async def _count_bytes(
+        self, sensor_key: str, chunks: AsyncIterable[bytes]
+    ) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            self._bytes_downloaded += len(chunk)
+            self._metrics.record_bytes(sensor_key, len(chunk))
+            yield chunk
+
+    @property
+    def bytes_downloaded(self) -> int:
+        """Return the size of all the response bodies downloaded so far."""
+        return self._bytes_downloaded
+
+    @property
+    def metrics(self) -> FetchMetrics:
+        """Return the metrics of the downloads and processing, by sensor key."""
+        return self._metrics
+
+    def _parse_daily_data(
+        self, sensor_key: str, url: str, data: dict[str, Any]
+    ) -> dict[str, EsiosResponse]:
+        if get_url_data_source(url) == "esios_public":
+            # parse all tariffs at once, so the download can be shared
+            return extract_prices_from_esios_public_tariffs(data, self._local_timezone)
+        # no look-back here, so the history only gets published values
+        return {
+            sensor_key: extract_prices_from_esios_token(
+                data, sensor_key, self._geo_zone, self._local_timezone, look_back=False
+            )
+        }
+
+    def _parse_range_data(
+        self, sensor_key: str, url: str, data: dict[str, Any]
+    ) -> dict[date, EsiosResponse]:
+        if "/archives/" in url:
+            day_prices = extract_prices_from_esios_public(
+                data, TARIFF2ID[self.tariff], self._local_timezone
+            )
+            first_ts = day_prices.series[KEY_PVPC].first_timestamp
+            assert first_ts is not None
+            return {first_ts.astimezone(REFERENCE_TZ).date(): day_prices}
+        return extract_esios_range_data(
+            data, sensor_key, tz=self._local_timezone, geo_zone=self._geo_zone
+        )
+
+    async def _api_get_data(
         self, sensor_key: str, url: str
+    ) -> dict[str, EsiosResponse] | None:
+        return await self._api_get_parsed(
+            sensor_key,
+            url,
+            self._parse_daily_data,
+            stream=(
+                sensor_key in MULTI_GEO_SENSOR_KEYS
+                and get_url_data_source(url) == "esios"
+            ),
+        )
+
+    async def _api_get_range_data(
+        self, sensor_key: str, url: str
+    ) -> dict[date, EsiosResponse] | None:
+        return await self._api_get_parsed(
+            sensor_key,
+            url,
+            self._parse_range_data,
+            stream=get_url_data_source(url) == "esios",
+        )
+
+    async def _download_daily_data(
+        self, sensor_key: str, url: str, published: bool = False
     ) -> EsiosResponse | None:
         """
         PVPC data extractor.
 
         Make GET request to 'api.esios.ree.es' and extract hourly prices.
+        With a shared cache, concurrent requests for the same data are coalesced.
+        For `published` days, an empty geo-filtered response is repeated without
+        the filter (an empty response for tomorrow just means 'not yet').
 
         Prices are referenced with datetimes in UTC.
         """
+        if get_url_data_source(url) == "esios_public":
+            responses = await self._download_shared_daily_data(sensor_key, url)
+            if responses is None:
+                return None
+            response = responses[TARIFF2ID[self.tariff]]
+            await self._append_to_history(response, url)
+            return response
+
+        responses = await self._download_shared_daily_data(sensor_key, url)
+        unfiltered_url = get_url_without_geo_filter(url)
+        if (
+            published
+            and unfiltered_url != url
+            and responses is not None
+            and not responses[sensor_key].series[sensor_key]
+        ):
+            responses = await self._download_unfiltered(
+                sensor_key, unfiltered_url, self._download_shared_daily_data
+            )
+        if responses is None:
+            return None
+
+        response = responses[sensor_key]
+        await self._append_to_history(response, url)
+        # the look-back goes in a copy, as the parsed responses are cached and shared
+        prices = response.series[sensor_key].copy()
+        fill_current_value_with_look_back(prices, sensor_key)
+        return replace(response, series={**response.series, sensor_key: prices})
+
+    async def _download_shared_daily_data(
+        self, sensor_key: str, url: str
+    ) -> dict[str, EsiosResponse] | None:
+        download = partial(
+            self._download_with_retries, sensor_key, url, self._api_get_data
+        )
+        if self._shared_cache is None:
+            return await download()
+
+        fetch_key = get_url_fetch_key(url)
+        if fetch_key[0] == "esios":
+            # token indicators are parsed for a geo zone, and shared only between
+            # entries with the same token, so an invalid one gets its own error
+            token_hash = hashlib.sha256((self._api_token or "").encode()).hexdigest()
+            fetch_key = (*fetch_key, self._geo_zone, token_hash)
+        return await self._shared_cache.get_or_fetch(fetch_key, download)
+
+    async def _download_range_data(
+        self,
+        sensor_key: str,
+        url: str,
+        priority: int | None = None,
+        api_get: (
+            Callable[[str, str], Awaitable[dict[date, EsiosResponse] | None]] | None
+        ) = None,
+    ) -> dict[date, EsiosResponse] | None:
+        """Make GET request for a range of days and extract daily prices."""
+        api_get = api_get or self._api_get_range_data
+        day_responses = await self._download_with_retries(
+            sensor_key, url, api_get, priority
+        )
+        unfiltered_url = get_url_without_geo_filter(url)
+        if (
+            unfiltered_url != url
+            and day_responses is not None
+            and not any(r.series[sensor_key] for r in day_responses.values())
+        ):
+            day_responses = await self._download_unfiltered(
+                sensor_key,
+                unfiltered_url,
+                partial(
+                    self._download_with_retries,
+                    api_get=api_get,
+                    priority=priority,
+                ),
+            )
+        for day_response in (day_responses or {}).values():
+            await self._append_to_history(day_response, url)
+        return day_responses
+
+    def _get_history_geo_zone(self, data_source: DataSource) -> str:
+        if data_source == "esios_public":
+            return TARIFF_ID2GEOZONE[TARIFF2ID[self.tariff]]
+        return self._geo_zone
+
+    async def _append_to_history(self, response: EsiosResponse, url: str) -> None:
+        """Keep a downloaded response in the local history, if there is one."""
+        if self._history is None:
+            return
+        geo_zone = self._get_history_geo_zone(get_url_data_source(url))
         try:
-            async with async_timeout.timeout(self._timeout):
-                return await self._api_get_data(sensor_key, url)
-        except (AttributeError, KeyError) as exc:
-            _LOGGER.debug("[%s] Bad try on getting prices (%s)", sensor_key, exc)
-        except asyncio.TimeoutError:
-            _LOGGER.warning(
-                "[%s] Timeout error requesting data from '%s'", sensor_key, url
+            await self._history.async_append(response, geo_zone)
+        except sqlite3.Error as exc:
+            _LOGGER.warning("Error storing the history of %s: %s", url, exc)
+
+    async def _download_unfiltered(
+        self,
+        sensor_key: str,
+        url: str,
+        download: Callable[[str, str], Awaitable[_ResponsesT | None]],
+    ) -> _ResponsesT | None:
+        """Repeat a geo-filtered request that came out empty without the filter."""
+        _LOGGER.debug(
+            "[%s] No data for geo zone '%s', requesting all zones: %s",
+            sensor_key,
+            self._geo_zone,
+            url,
+        )
+        result = await download(sensor_key, url)
+        if result is not None and any(
+            response.series[sensor_key] for response in result.values()
+        ):
+            # remember it, the filter is useless for this indicator
+            self._unfiltered_geo_keys.add(sensor_key)
+        return result
+
+    def _get_geo_ids_by_key(self, sensor_keys: set[str]) -> dict[str, list[int]]:
+        """Return the geo ids to request for each token indicator."""
+        geo_ids = sorted(self._geo_ids)
+        return {
+            sensor_key: geo_ids
+            for sensor_key in sensor_keys
+            if sensor_key not in self._unfiltered_geo_keys
+        }
+
+    async def _download_with_retries(
+        self,
+        sensor_key: str,
+        url: str,
+        api_get: Callable[[str, str], Awaitable[_T | None]],
+        priority: int | None = None,
+    ) -> _T | None:
+        circuit = self._circuit_breakers[get_url_data_source(url)]
+        for attempt in range(self._retry_policy.attempts):
+            if not circuit.allow_request():
+                _LOGGER.debug(
+                    "[%s] Request skipped, '%s' is failing: %s",
+                    sensor_key,
+                    get_url_data_source(url),
+                    url,
+                )
+                self._metrics.record_skip(sensor_key, "circuit_open")
+                return None
+
+            retry_after = None
+            try:
+                async with self._scheduler.slot(sensor_key, priority):
+                    async with async_timeout.timeout(self._timeout):
+                        result = await api_get(sensor_key, url)
+                circuit.record_success()
+                return result
+            except RequestDeferredError:
+                _LOGGER.debug(
+                    "[%s] Request deferred, daily budget is running low: %s",
+                    sensor_key,
+                    url,
+                )
+                circuit.record_skipped()
+                self._metrics.record_skip(sensor_key, "budget_deferred")
+                return None
+            except (AttributeError, KeyError, ValueError) as exc:
+                # bad payload, like a body that is not valid json
+                _LOGGER.debug("[%s] Bad try on getting prices (%s)", sensor_key, exc)
+                circuit.record_success()
+                return None
+            except asyncio.TimeoutError:
+                _LOGGER.warning(
+                    "[%s] Timeout error requesting data from '%s'", sensor_key, url
+                )
+            except aiohttp.ClientError as exc:
+                _LOGGER.warning("[%s] Client error in '%s' -> %s", sensor_key, url, exc)
+            except RetryableStatusError as exc:
+                _LOGGER.warning(
+                    "[%s] Temporary error [%d] with '%s': %s",
+                    sensor_key,
+                    exc.status,
+                    self._data_source,
+                    url,
+                )
+                retry_after = exc.retry_after
+            except BadApiTokenAuthError:
+                circuit.record_success()
+                raise
+
+            circuit.record_failure()
+            delay = self._retry_policy.get_delay(attempt, retry_after)
+            if delay is None:
+                break
+            _LOGGER.debug(
+                "[%s] Retrying in %.1f s (attempt %d of %d)",
+                sensor_key,
+                delay,
+                attempt + 2,
+                self._retry_policy.attempts,
             )
-        except aiohttp.ClientError as exc:
-            _LOGGER.warning("[%s] Client error in '%s' -> %s", sensor_key, url, exc)
-        except BadApiTokenAuthError:
-            raise
+            await asyncio.sleep(delay)
         return None
 
     async def check_api_token(
@@ -215,6 +630,161 @@ class PVPCData:
         elif data_id in self._sensor_keys:
             self._sensor_keys.remove(data_id)
 
+    def _get_api_sensor_keys(self, sensor_keys: set[str] | None = None) -> set[str]:
+        if sensor_keys is None:
+            sensor_keys = self._sensor_keys
+        return {
+            api_sensor_key
+            for sensor_key in sensor_keys
+            for api_sensor_key in SENSOR_KEY_TO_API_SERIES[sensor_key]
+        }
+
+    async def async_download_range(
+        self, start: date, end: date, sensor_keys: set[str] | None = None
+    ) -> dict[str, dict[date, EsiosResponse]]:
+        """
+        Download all prices between `start` and `end` local days (both included).
+
+        With the ESIOS token each indicator is requested only once for the
+        whole range, and the response is split in daily chunks.
+        The public source only serves single days, so it needs one request per day.
+        Days that could not be downloaded are missing in the results.
+        """
+        api_sensors = self._get_api_sensor_keys(sensor_keys)
+        urls_by_key = get_range_urls_to_download(
+            self._data_source,
+            api_sensors,
+            start,
+            end,
+            geo_ids=self._get_geo_ids_by_key(api_sensors),
+        )
+        requests = [
+            (sensor_key, url)
+            for sensor_key, urls in urls_by_key.items()
+            for url in urls
+        ]
+        results = await asyncio.gather(
+            *(
+                self._download_range_data(sensor_key, url)
+                for sensor_key, url in requests
+            )
+        )
+        range_data: dict[str, dict[date, EsiosResponse]] = {
+            sensor_key: {} for sensor_key in urls_by_key
+        }
+        for (sensor_key, _url), day_responses in zip(requests, results):
+            if day_responses:
+                range_data[sensor_key].update(day_responses)
+        return range_data
+
+    async def async_backfill(
+        self,
+        start: date,
+        end: date,
+        sensor_keys: set[str] | None = None,
+        checkpoint_path: str | None = None,
+        max_concurrency: int = DEFAULT_BACKFILL_CONCURRENCY,
+        chunk_days: int = DEFAULT_BACKFILL_CHUNK_DAYS,
+    ) -> BackfillReport:
+        """
+        Download the prices between `start` and `end` local days into the history.
+
+        Requests go with low priority, `max_concurrency` at a time: one per day
+        with the public source, and one per `chunk_days` days for each token
+        indicator. With a `checkpoint_path`, the finished days are recorded there,
+        so an interrupted backfill only downloads the pending days when run again.
+        Days without prices in the responses are reported as failed, and kept pending.
+        """
+        assert self._history is not None
+        geo_zone = self._get_history_geo_zone(self._data_source)
+        checkpoint = BackfillCheckpoint(
+            checkpoint_path, f"{self._data_source}:{geo_zone}"
+        )
+        await checkpoint.async_load()
+
+        if self._data_source == "esios_public":
+            backfill_keys, max_days = [KEY_PVPC], 1
+        else:
+            backfill_keys = sorted(
+                sensor_key
+                for sensor_key in self._get_api_sensor_keys(sensor_keys)
+                if sensor_key in SENSOR_KEY_TO_DATAID
+            )
+            max_days = chunk_days
+        num_days = max(0, (end - start).days + 1)
+        all_days = [start + timedelta(days=i) for i in range(num_days)]
+        report = BackfillReport()
+        day_ranges: list[tuple[str, date, date]] = []
+        for sensor_key in backfill_keys:
+            pending = [
+                day for day in all_days if not checkpoint.is_done(sensor_key, day)
+            ]
+            report.days_requested += num_days
+            report.days_skipped += num_days - len(pending)
+            day_ranges.extend(
+                (sensor_key, first_day, last_day)
+                for first_day, last_day in split_pending_days(pending, max_days)
+            )
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _api_get_counted(
+            sensor_key: str, url: str
+        ) -> dict[date, EsiosResponse] | None:
+            # only the requests sent, not the ones deferred or skipped
+            report.requests += 1
+            return await self._api_get_range_data(sensor_key, url)
+
+        async def _backfill_days(sensor_key: str, first_day: date, last_day: date):
+            url = get_range_urls_to_download(
+                self._data_source,
+                {sensor_key},
+                first_day,
+                last_day,
+                geo_ids=self._get_geo_ids_by_key({sensor_key}),
+            )[sensor_key][0]
+            async with semaphore:
+                day_responses = await self._download_range_data(
+                    sensor_key, url, PRIORITY_LOW, _api_get_counted
+                )
+            days = [
+                first_day + timedelta(days=i)
+                for i in range((last_day - first_day).days + 1)
+            ]
+            # days without prices (not published yet, or missing in ESIOS)
+            # are left pending, to be requested again in the next run
+            done_days = [
+                day
+                for day in days
+                if day_responses is not None
+                and day in day_responses
+                and day_responses[day].series[sensor_key]
+            ]
+            if failed_days := [day for day in days if day not in done_days]:
+                report.days_failed += len(failed_days)
+                report.failed.setdefault(sensor_key, []).extend(failed_days)
+            if done_days:
+                report.days_downloaded += len(done_days)
+                await checkpoint.async_mark_done(sensor_key, done_days)
+
+        bytes_start = self._bytes_downloaded
+        time_start = time.monotonic()
+        await asyncio.gather(*(_backfill_days(*day_range) for day_range in day_ranges))
+        report.elapsed = time.monotonic() - time_start
+        report.bytes_downloaded = self._bytes_downloaded - bytes_start
+        for failed_days in report.failed.values():
+            failed_days.sort()
+        _LOGGER.debug(
+            "Backfill of %s - %s done: %d days in %.1f s (%.2f days/s, %d bytes/s)",
+            start,
+            end,
+            report.days_downloaded,
+            report.elapsed,
+            report.days_per_second,
+            report.bytes_per_second,
+        )
+        return report
+
     async def async_update_all(
         self, current_data: EsiosApiData | None, now: datetime
     ) -> EsiosApiData:
@@ -237,23 +807,42 @@ class PVPCData:
                 last_update=utc_now,
             )
 
-        api_sensors = {
-            api_sensor_key
-            for sensor_key in self._sensor_keys
-            for api_sensor_key in SENSOR_KEY_TO_API_SERIES[sensor_key]
-        }
+        api_sensors = self._get_api_sensor_keys()
+        geo_ids = self._get_geo_ids_by_key(api_sensors)
         urls_now, urls_next = get_daily_urls_to_download(
             self._data_source,
             api_sensors,
             local_ref_now,
             next_day,
+            geo_ids=geo_ids,
         )
+        urls_range: dict[str, str] = {}
+        if self._data_source == "esios":
+            # token indicators can be requested for today and tomorrow at once
+            urls_range = {
+                sensor_key: urls[0]
+                for sensor_key, urls in get_range_urls_to_download(
+                    self._data_source,
+                    api_sensors,
+                    local_ref_now.date(),
+                    next_day.date(),
+                    geo_ids=geo_ids,
+                ).items()
+            }
         updated = False
         tasks = []
+        task_sensors = []
+        url_sensors = []
         for url_now, url_next, sensor_key in zip(urls_now, urls_next, api_sensors):
+            url_sensors.append(sensor_key)
             if sensor_key not in current_data.sensors:
-                current_data.sensors[sensor_key] = {}
+                current_data.sensors[sensor_key] = PriceSeries()
+            elif self._next_updates.get(sensor_key, utc_now) > utc_now:
+                # nothing new to download until then
+                self._metrics.record_skip(sensor_key, "not_due")
+                continue
 
+            task_sensors.append(sensor_key)
             tasks.append(
                 self._update_prices_series(
                     sensor_key,
@@ -261,11 +850,12 @@ class PVPCData:
                     url_now,
                     url_next,
                     local_ref_now,
+                    urls_range.get(sensor_key),
                 )
             )
 
         results = await asyncio.gather(*tasks)
-        for new_data, sensor_key in zip(results, api_sensors):
+        for new_data, sensor_key in zip(results, task_sensors):
             if new_data:
                 updated = True
                 current_data.sensors[sensor_key] = new_data
@@ -274,6 +864,12 @@ class PVPCData:
         if updated:
             current_data.data_source = self._data_source
             current_data.last_update = utc_now
+        self._next_updates = {
+            sensor_key: get_next_update_time(
+                sensor_key, current_data.sensors[sensor_key], utc_now
+            )
+            for sensor_key in url_sensors
+        }
 
         add_composed_price_sensors(current_data)
         for sensor_key in current_data.sensors:
@@ -283,25 +879,50 @@ class PVPCData:
     async def _update_prices_series(
         self,
         sensor_key: str,
-        current_prices: dict[datetime, float],
+        current_prices: PriceSeries,
         url_now: str,
         url_next: str,
         local_ref_now: datetime,
-    ) -> dict[datetime, float] | None:
+        url_range: str | None = None,
+    ) -> PriceSeries | None:
         current_num_prices = len(current_prices)
-        if local_ref_now.hour >= 20 and current_num_prices > 30:
+        resolution = get_series_resolution(current_prices)
+        steps_per_hour = DEFAULT_RESOLUTION // resolution
+        if sensor_key in SENSOR_KEY_TO_UPDATE_CADENCE_MINUTES and current_num_prices:
+            # near-real-time values for today change during the day
+            prices_response = await self._download_daily_data(
+                sensor_key, url_now, published=True
+            )
+            if prices_response is None or not prices_response.series.get(sensor_key):
+                return None
+            current_prices.update(prices_response.series[sensor_key])
+            if local_ref_now.hour >= DAY_AHEAD_PUBLICATION_HOUR:
+                prices_fut_response = await self._download_daily_data(
+                    sensor_key, url_next
+                )
+                if prices_fut_response:
+                    current_prices.update(prices_fut_response.series[sensor_key])
+            return current_prices
+        elif (
+            local_ref_now.hour >= DAY_AHEAD_PUBLICATION_HOUR
+            and current_num_prices > 30 * steps_per_hour
+        ):
             _LOGGER.debug(
                 "[%s] Evening download avoided, now with %d prices from %s UTC",
                 sensor_key,
                 current_num_prices,
-                next(iter(current_prices)).strftime("%Y-%m-%d %Hh"),
+                current_prices.first_timestamp.strftime("%Y-%m-%d %Hh"),
             )
+            self._metrics.record_skip(sensor_key, "evening_complete")
             return None
         elif (
-            local_ref_now.hour < 20
-            and current_num_prices > 20
+            local_ref_now.hour < DAY_AHEAD_PUBLICATION_HOUR
+            and current_num_prices > 20 * steps_per_hour
+            and (last_ts := current_prices.last_timestamp) is not None
             and (
-                list(current_prices)[-12].astimezone(REFERENCE_TZ).date()
+                (last_ts - timedelta(hours=12) + resolution)
+                .astimezone(REFERENCE_TZ)
+                .date()
                 == local_ref_now.date()
             )
         ):
@@ -309,30 +930,52 @@ class PVPCData:
                 "[%s] Download avoided, now with %d prices up to %s UTC",
                 sensor_key,
                 current_num_prices,
-                list(current_prices)[-1].strftime("%Y-%m-%d %Hh"),
+                last_ts.strftime("%Y-%m-%d %Hh"),
             )
+            self._metrics.record_skip(sensor_key, "day_complete")
             return None
 
-        if current_num_prices and (
-            next(iter(current_prices)).astimezone(REFERENCE_TZ).date()
-            == local_ref_now.date()
+        if (first_ts := current_prices.first_timestamp) is not None and (
+            first_ts.astimezone(REFERENCE_TZ).date() == local_ref_now.date()
         ):
             _LOGGER.debug(
                 "[%s] Avoided: %s, with %d prices -> last: %s, download-day: %s",
                 sensor_key,
                 local_ref_now,
                 current_num_prices,
-                next(iter(current_prices)).astimezone(REFERENCE_TZ).date(),
+                first_ts.astimezone(REFERENCE_TZ).date(),
                 local_ref_now.date(),
             )
+            self._metrics.record_skip(sensor_key, "today_complete")
+        elif local_ref_now.hour >= DAY_AHEAD_PUBLICATION_HOUR and url_range is not None:
+            # both days are missing, so ask for them in one range request
+            range_responses = await self._download_range_data(sensor_key, url_range)
+            range_prices = [
+                day_response.series[sensor_key]
+                for day_response in (range_responses or {}).values()
+                if day_response.series.get(sensor_key)
+            ]
+            if not range_prices:
+                return current_prices
+            for prices in range_prices:
+                current_prices.update(prices)
+            _LOGGER.debug(
+                "[%s] Range download done, now with %d prices from %s UTC",
+                sensor_key,
+                len(current_prices),
+                current_prices.first_timestamp.strftime("%Y-%m-%d %Hh"),
+            )
+            return current_prices
         else:
-            prices_response = await self._download_daily_data(sensor_key, url_now)
+            prices_response = await self._download_daily_data(
+                sensor_key, url_now, published=True
+            )
             if prices_response is None or not prices_response.series.get(sensor_key):
                 return current_prices
             prices = prices_response.series[sensor_key]
             current_prices.update(prices)
 
-        if local_ref_now.hour >= 20:
+        if local_ref_now.hour >= DAY_AHEAD_PUBLICATION_HOUR:
             prices_fut_response = await self._download_daily_data(sensor_key, url_next)
             if prices_fut_response:
                 prices_fut = prices_fut_response.series[sensor_key]
@@ -342,16 +985,136 @@ class PVPCData:
             "[%s] Download done, now with %d prices from %s UTC",
             sensor_key,
             len(current_prices),
-            next(iter(current_prices)).strftime("%Y-%m-%d %Hh"),
+            current_prices.first_timestamp.strftime("%Y-%m-%d %Hh"),
         )
 
         return current_prices
 
+    async def async_get_history(
+        self, sensor_key: str, start: datetime, end: datetime
+    ) -> PriceSeries:
+        """Return the stored prices of a series between `start` and `end`."""
+        assert self._history is not None
+        return await self._history.async_get_series(
+            sensor_key, start, end, self._get_history_geo_zone(self._data_source)
+        )
+
+    async def async_schedule_loads(
+        self,
+        current_data: EsiosApiData,
+        loads: Sequence[Load],
+        utc_now: datetime,
+        sensor_key: str = KEY_PVPC,
+        max_power: float | None = None,
+        time_budget: float = DEFAULT_SCHEDULE_TIME_BUDGET,
+    ) -> LoadSchedule:
+        """
+        Schedule loads from now on, for the lowest cost with the prices of a series.
+
+        The power limit of each time step is the contracted power of its tariff
+        period, capped with `max_power` (kW). The search runs in an executor.
+        """
+        prices = current_data.sensors.get(sensor_key, PriceSeries()).copy()
+        power_limits = make_power_limits(
+            prices,
+            self._power,
+            self._power_valley,
+            self._local_timezone,
+            zone_ceuta_melilla=self.tariff != TARIFFS[0],
+        )
+        if max_power is not None:
+            power_limits = [min(limit, max_power) for limit in power_limits]
+        start_after = floor_to_resolution(
+            ensure_utc_time(utc_now), get_series_resolution(prices)
+        )
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(
+                schedule_loads,
+                prices,
+                loads,
+                power_limits,
+                start_after,
+                time_budget,
+            ),
+        )
+
+    async def async_optimize_battery(
+        self,
+        current_data: EsiosApiData,
+        battery: Battery,
+        soc: float,
+        utc_now: datetime,
+        sensor_key: str = KEY_PVPC,
+        load: Sequence[float] | None = None,
+    ) -> BatteryPlan:
+        """
+        Plan the charge and discharge of a home battery from now on.
+
+        Energy is bought with the prices of `sensor_key`, and sold with the
+        INJECTION prices, when they are downloaded. It runs in an executor.
+        """
+        buy_prices = current_data.sensors.get(sensor_key, PriceSeries()).copy()
+        sell_prices = current_data.sensors.get(KEY_INJECTION)
+        start_after = floor_to_resolution(
+            ensure_utc_time(utc_now), get_series_resolution(buy_prices)
+        )
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(
+                optimize_battery,
+                buy_prices,
+                sell_prices.copy() if sell_prices else None,
+                battery,
+                soc,
+                start_after,
+                load,
+            ),
+        )
+
+    def get_next_update_time(self) -> datetime | None:
+        """Return the next time when an update can bring new data."""
+        return min(self._next_updates.values(), default=None)
+
     @property
     def attribution(self) -> str:
         """Return data-source attribution string."""
         return ATTRIBUTIONS[self._data_source]
 
+    def process_time_step(
+        self,
+        current_data: EsiosApiData,
+        sensor_keys: Iterable[str],
+        utc_now: datetime,
+    ) -> set[str]:
+        """
+        Update the state and attributes of some series, at the start of a time step.
+
+        Each series is only processed when one of its own time steps starts
+        (hourly prices do not change at quarter-hours). Return the sensor keys
+        with a different state or attributes, so only their sensors are written.
+        """
+        utc_now = ensure_utc_time(utc_now).replace(second=0, microsecond=0)
+        changed = set()
+        for sensor_key in sensor_keys:
+            resolution = get_series_resolution(
+                current_data.sensors.get(sensor_key, PriceSeries())
+            )
+            if floor_to_resolution(utc_now, resolution) != utc_now:
+                continue
+            state = self.states.get(sensor_key)
+            attributes = self.sensor_attributes.get(sensor_key)
+            self.process_state_and_attributes(current_data, sensor_key, utc_now)
+            if (
+                self.states.get(sensor_key) == state
+                and self.sensor_attributes[sensor_key] == attributes
+            ):
+                # keep the same attributes, so they are not processed again
+                self.sensor_attributes[sensor_key] = attributes
+            else:
+                changed.add(sensor_key)
+        return changed
+
     def process_state_and_attributes(
         self, current_data: EsiosApiData, sensor_key: str, utc_now: datetime
     ) -> bool:
@@ -365,22 +1128,25 @@ class PVPCData:
         If not, it is converted to UTC from the original timezone,
         or set as UTC-time if it is a naive datetime.
         """
+        time_start = time.perf_counter()
         attributes: dict[str, Any] = {
             "sensor_id": sensor_key,
             "data_id": SENSOR_KEY_TO_DATAID.get(sensor_key, "composed"),
         }
-        utc_time = ensure_utc_time(utc_now.replace(minute=0, second=0, microsecond=0))
+        current_prices = current_data.sensors.get(sensor_key, PriceSeries())
+        resolution = get_series_resolution(current_prices)
+        utc_time = floor_to_resolution(ensure_utc_time(utc_now), resolution)
         actual_time = utc_time.astimezone(self._local_timezone)
-        current_prices = current_data.sensors.get(sensor_key, {})
-        if len(current_prices) > 25 and actual_time.hour < 20:
+        if (
+            len(current_prices) > 25 * (DEFAULT_RESOLUTION // resolution)
+            and actual_time.hour < DAY_AHEAD_PUBLICATION_HOUR
+        ):
             max_age = (
-                utc_time.astimezone(REFERENCE_TZ).replace(hour=0).astimezone(UTC_TZ)
+                utc_time.astimezone(REFERENCE_TZ)
+                .replace(hour=0, minute=0)
+                .astimezone(UTC_TZ)
             )
-            current_data.sensors[sensor_key] = {
-                key_ts: price
-                for key_ts, price in current_prices.items()
-                if key_ts >= max_age
-            }
+            current_prices.drop_before(max_age)
 
         try:
             self.states[sensor_key] = current_data.sensors[sensor_key][utc_time]
@@ -392,7 +1158,11 @@ class PVPCData:
             return False
 
         price_attrs = make_price_sensor_attributes(
-            sensor_key, current_data.sensors[sensor_key], utc_time, self._local_timezone
+            sensor_key,
+            current_data.sensors[sensor_key],
+            utc_time,
+            self._local_timezone,
+            self._price_stats_cache,
         )
 
         if sensor_key == KEY_PVPC:
@@ -412,4 +1182,5 @@ class PVPCData:
             attributes["hours_to_next_period"] = int(delta.total_seconds()) // 3600
 
         self.sensor_attributes[sensor_key] = {**attributes, **price_attrs}
+        self._metrics.record_attributes(sensor_key, time.perf_counter() - time_start)
         return True
@@ -1,146 +1,155 @@
 """
 ESIOS API handler for HomeAssistant. PVPC tariff periods.
 Modified and maintained by Javisen - 2026.
-Updated for 2028 holidays.
 """
 
 from __future__ import annotations
 
-from datetime import date, datetime, timedelta
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
 
 _HOURS_P2 = (8, 9, 14, 15, 16, 17, 22, 23)
 _HOURS_P2_CYM = (8, 9, 10, 15, 16, 17, 18, 23)
-# TODO review 'festivos nacionales no sustituibles de fecha fija', + 6/1
-# obtained from `holidays` library,
-# - with weekend days disabled (already full P3)
-# - no 'translated' holidays
-# - no 'Jueves Santo' as special day
-_NATIONAL_EXTRA_HOLIDAYS_FOR_P3_PERIOD = {
-    2021: {
-        date(2021, 1, 1): "(viernes), Año nuevo",
-        date(2021, 1, 6): "(miércoles), Epifanía del Señor",
-        # date(2021, 4, 1): "(jueves), Jueves Santo",
-        date(2021, 4, 2): "(viernes), Viernes Santo",
-        # date(2021, 5, 1): "(sábado), Día del Trabajador",
-        # date(2021, 8, 15): "(domingo), Asunción de la Virgen",
-        date(2021, 10, 12): "(martes), Día de la Hispanidad",
-        date(2021, 11, 1): "(lunes), Todos los Santos",
-        date(2021, 12, 6): "(lunes), Día de la Constitución Española",
-        date(2021, 12, 8): "(miércoles), La Inmaculada Concepción",
-        # date(2021, 12, 25): "(sábado), Navidad",
-    },
-    2022: {
-        # date(2022, 1, 1): "(sábado), Año nuevo",
-        date(2022, 1, 6): "(jueves), Epifanía del Señor",
-        date(2022, 4, 15): "(viernes), Viernes Santo",
-        date(2022, 8, 15): "(lunes), Asunción de la Virgen",
-        date(2022, 10, 12): "(miércoles), Día de la Hispanidad",
-        date(2022, 11, 1): "(martes), Todos los Santos",
-        date(2022, 12, 6): "(martes), Día de la Constitución Española",
-        date(2022, 12, 8): "(jueves), La Inmaculada Concepción",
-        # date(2022, 12, 26): "(lunes), Navidad (Trasladado)",
-    },
-    2023: {
-        # date(2023, 1, 1): "(domingo), Año nuevo",
-        date(2023, 1, 6): "(viernes), Epifanía del Señor",
-        # date(2023, 4, 6): "(jueves), Jueves Santo",
-        date(2023, 4, 7): "(viernes), Viernes Santo",
-        date(2023, 5, 1): "(lunes), Día del Trabajador",
-        date(2023, 8, 15): "(martes), Asunción de la Virgen",
-        date(2023, 10, 12): "(jueves), Día de la Hispanidad",
-        date(2023, 11, 1): "(miércoles), Todos los Santos",
-        date(2023, 12, 6): "(miércoles), Día de la Constitución Española",
-        date(2023, 12, 8): "(viernes), La Inmaculada Concepción",
-        date(2023, 12, 25): "(lunes), Navidad",
-    },
-    2024: {
-        date(2024, 1, 1): "(lunes), Año nuevo",
-        # date(2024, 1, 6): "(sábado), Epifanía del Señor",
-        # date(2024, 3, 28): "(jueves), Jueves Santo",
-        date(2024, 3, 29): "(viernes), Viernes Santo",
-        date(2024, 5, 1): "(miércoles), Día del Trabajador",
-        date(2024, 8, 15): "(jueves), Asunción de la Virgen",
-        # date(2024, 10, 12): "(sábado), Día de la Hispanidad",
-        date(2024, 11, 1): "(viernes), Todos los Santos",
-        date(2024, 12, 6): "(viernes), Día de la Constitución Española",
-        # date(2024, 12, 8): "(domingo), La Inmaculada Concepción",
-        date(2024, 12, 25): "(miércoles), Navidad",
-    },
-    2025: {
-        date(2025, 1, 1): "(miércoles), Año nuevo",
-        date(2025, 1, 6): "(lunes), Epifanía del Señor",
-        # date(2025, 4, 17): "(jueves), Jueves Santo",
-        date(2025, 4, 18): "(viernes), Viernes Santo",
-        date(2025, 5, 1): "(jueves), Día del Trabajador",
-        date(2025, 8, 15): "(viernes), Asunción de la Virgen",
-        # date(2025, 10, 12): "(domingo), Día de la Hispanidad",
-        # date(2025, 11, 1): "(sábado), Todos los Santos",
-        # date(2025, 12, 6): "(sábado), Día de la Constitución Española",
-        date(2025, 12, 8): "(lunes), La Inmaculada Concepción",
-        date(2025, 12, 25): "(jueves), Navidad",
-    },
-    2026: {
-        date(2026, 1, 1): "(jueves), Año nuevo",
-        date(2026, 1, 6): "(martes), Epifanía del Señor",
-        date(2026, 4, 3): "(viernes), Viernes Santo",
-        date(2026, 5, 1): "(viernes), Día del Trabajador",
-        # date(2026, 8, 15): "(sábado), Asunción de la Virgen",
-        date(2026, 10, 12): "(lunes), Día de la Hispanidad",
-        # date(2026, 11, 1): "(domingo), Todos los Santos",
-        # date(2026, 12, 6): "(domingo), Día de la Constitución Española",
-        date(2026, 12, 8): "(martes), La Inmaculada Concepción",
-        date(2026, 12, 25): "(viernes), Navidad",
-    },
-    2027: {
-        date(2027, 1, 1): "(viernes), Año nuevo",
-        date(2027, 1, 6): "(miércoles), Epifanía del Señor",
-        date(2027, 3, 26): "(viernes), Viernes Santo",
-        # date(2027, 5, 1): "(sábado), Día del Trabajador",  # Cae en sábado, ya es P3
-        # date(2027, 8, 15): "(domingo), Asunción de la Virgen",  # Cae en domingo
-        date(2027, 10, 12): "(martes), Día de la Hispanidad",
-        date(2027, 11, 1): "(lunes), Todos los Santos",
-        date(2027, 12, 6): "(lunes), Día de la Constitución Española",
-        date(2027, 12, 8): "(miércoles), La Inmaculada Concepción",
-        date(
-            2027, 12, 25
-        ): "(sábado), Navidad",  # Aunque cae en sábado, se suele dejar por consistencia
-    },
-    2028: {
-        # date(2028, 1, 1): "(sábado), Año nuevo",  # Cae en sábado
-        date(2028, 1, 6): "(jueves), Epifanía del Señor",
-        date(2028, 4, 14): "(viernes), Viernes Santo",
-        date(2028, 5, 1): "(lunes), Día del Trabajador",
-        date(2028, 8, 15): "(martes), Asunción de la Virgen",
-        date(2028, 10, 12): "(jueves), Día de la Hispanidad",
-        date(2028, 11, 1): "(miércoles), Todos los Santos",
-        date(2028, 12, 6): "(miércoles), Día de la Constitución Española",
-        date(2028, 12, 8): "(viernes), La Inmaculada Concepción",
-        date(2028, 12, 25): "(lunes), Navidad",
-    },
-}
+_PERIOD_KEYS = ("P1", "P2", "P3")
+_P1, _P2, _P3 = 1, 2, 3
+# 'festivos nacionales no sustituibles de fecha fija', + 6/1 and 'Viernes Santo',
+# with no 'translated' holidays and no 'Jueves Santo' as special day
+# (weekend days are already full P3)
+_NATIONAL_FIXED_HOLIDAYS = (
+    (1, 1),  # Año nuevo
+    (1, 6),  # Epifanía del Señor
+    (5, 1),  # Día del Trabajador
+    (8, 15),  # Asunción de la Virgen
+    (10, 12),  # Día de la Hispanidad
+    (11, 1),  # Todos los Santos
+    (12, 6),  # Día de la Constitución Española
+    (12, 8),  # La Inmaculada Concepción
+    (12, 25),  # Navidad
+)
+
+
+def get_easter_sunday(year: int) -> date:
+    """Return the date of Easter Sunday (Gregorian computus)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    lw = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * lw) // 433
+    month, day = divmod(h + lw - 7 * m + 90, 25)
+    return date(year, month, (h + lw - 7 * m + 33 * month + 19) % 32)
+
+
+@lru_cache(maxsize=32)
+def get_national_holidays(year: int) -> frozenset[date]:
+    """Return the national holidays which are P3 days for the whole day."""
+    good_friday = get_easter_sunday(year) - timedelta(days=2)
+    return frozenset(
+        (good_friday, *(date(year, m, d) for m, d in _NATIONAL_FIXED_HOLIDAYS))
+    )
+
+
+@dataclass(frozen=True)
+class _YearTimeline:
+    """Tariff periods of each local (wall-clock) hour of a year."""
+
+    first_day: date
+    periods: bytes
+    boundaries: tuple[int, ...]
+
+
+@lru_cache(maxsize=16)
+def _get_year_timeline(year: int, zone_ceuta_melilla: bool) -> _YearTimeline:
+    hours_p2 = _HOURS_P2_CYM if zone_ceuta_melilla else _HOURS_P2
+    work_day = bytes(
+        _P3 if hour < 8 else _P2 if hour in hours_p2 else _P1 for hour in range(24)
+    )
+    free_day = bytes([_P3]) * 24
+    holidays = get_national_holidays(year)
+    first_day = date(year, 1, 1)
+    periods = b"".join(
+        free_day if day in holidays or day.isoweekday() >= 6 else work_day
+        for day in (
+            first_day + timedelta(days=i)
+            for i in range((date(year + 1, 1, 1) - first_day).days)
+        )
+    )
+    boundaries = tuple(
+        i for i in range(1, len(periods)) if periods[i] != periods[i - 1]
+    )
+    return _YearTimeline(first_day, periods, boundaries)
+
+
+def _tariff_period_code(local_ts: datetime, zone_ceuta_melilla: bool) -> int:
+    timeline = _get_year_timeline(local_ts.year, zone_ceuta_melilla)
+    day_index = local_ts.toordinal() - timeline.first_day.toordinal()
+    return timeline.periods[day_index * 24 + local_ts.hour]
 
 
 def _tariff_period_key(local_ts: datetime, zone_ceuta_melilla: bool) -> str:
     """Return period key (P1/P2/P3) for current hour."""
-    day = local_ts.date()
-    national_holiday = day in _NATIONAL_EXTRA_HOLIDAYS_FOR_P3_PERIOD[day.year]
-    if national_holiday or day.isoweekday() >= 6 or local_ts.hour < 8:
-        return "P3"
-    if zone_ceuta_melilla and local_ts.hour in _HOURS_P2_CYM:
-        return "P2"
-    if not zone_ceuta_melilla and local_ts.hour in _HOURS_P2:
-        return "P2"
-    return "P1"
+    return _PERIOD_KEYS[_tariff_period_code(local_ts, zone_ceuta_melilla) - 1]
+
+
+def get_tariff_period_codes(
+    first_day: date, last_day: date, zone_ceuta_melilla: bool
+) -> bytes:
+    """
+    Return the tariff periods (1, 2, 3 for P1, P2, P3) of a range of local days.
+
+    There are 24 values per day (both days included), for each wall-clock hour,
+    so bulk calculations can index them instead of checking each hour.
+    """
+    chunks = []
+    for year in range(first_day.year, last_day.year + 1):
+        timeline = _get_year_timeline(year, zone_ceuta_melilla)
+        start = max(first_day, date(year, 1, 1)).toordinal()
+        end = min(last_day, date(year, 12, 31)).toordinal() + 1
+        offset = timeline.first_day.toordinal()
+        chunks.append(timeline.periods[(start - offset) * 24 : (end - offset) * 24])
+    return b"".join(chunks)
+
+
+def _next_boundary(local_ts: datetime, zone_ceuta_melilla: bool) -> datetime:
+    """Return the wall-clock start of the next hour with a different period."""
+    year = local_ts.year
+    timeline = _get_year_timeline(year, zone_ceuta_melilla)
+    index = (local_ts.toordinal() - timeline.first_day.toordinal()) * 24
+    index += local_ts.hour
+    current = timeline.periods[index]
+    while True:
+        pos = bisect_right(timeline.boundaries, index)
+        if pos < len(timeline.boundaries):
+            day_index, hour = divmod(timeline.boundaries[pos], 24)
+            break
+        # no change until the end of the year, so look into the next one
+        year += 1
+        timeline = _get_year_timeline(year, zone_ceuta_melilla)
+        if timeline.periods[0] != current:
+            day_index, hour = 0, 0
+            break
+        index = 0
+    return datetime.combine(
+        timeline.first_day + timedelta(days=day_index),
+        time(hour),
+        tzinfo=local_ts.tzinfo,
+    )
 
 
 def get_current_and_next_tariff_periods(
     local_ts: datetime, zone_ceuta_melilla: bool
 ) -> tuple[str, str, timedelta]:
-    """Get tariff periods for PVPC 2.0TD."""
+    """
+    Get tariff periods for PVPC 2.0TD.
+
+    Periods change at o'clock, so for quarter-hour times the delta
+    to the next period is counted from the current time, not from the hour.
+    """
     current_period = _tariff_period_key(local_ts, zone_ceuta_melilla)
-    delta = timedelta(hours=1)
-    while (
-        next_period := _tariff_period_key(local_ts + delta, zone_ceuta_melilla)
-    ) == current_period:
-        delta += timedelta(hours=1)
-    return current_period, next_period, delta
+    next_change = _next_boundary(local_ts, zone_ceuta_melilla)
+    next_period = _tariff_period_key(next_change, zone_ceuta_melilla)
+    return current_period, next_period, next_change - local_ts
@@ -0,0 +1,136 @@
+"""
+ESIOS API handler for HomeAssistant. Retries and circuit breakers.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from random import uniform
+from typing import Callable, Literal
+
+from .const import (
+    DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+    DEFAULT_CIRCUIT_RESET_TIMEOUT,
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_BASE_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+    UTC_TZ,
+)
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class RetryableStatusError(Exception):
+    """Exception to signal a temporary HTTP error (429 or 5xx status)."""
+
+    def __init__(self, status: int, retry_after: float | None = None) -> None:
+        """Store the HTTP status and the requested wait, if any."""
+        super().__init__(f"HTTP status {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: str | None, now: datetime | None = None) -> float | None:
+    """Parse a `Retry-After` header, given in seconds or as an HTTP-date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC_TZ)
+    return max(0.0, (retry_at - (now or datetime.now(UTC_TZ))).total_seconds())
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with jitter for failed requests.
+
+    The jitter spreads the retries of several instances failing at the same
+    time, and a `Retry-After` from the server is honoured when it fits
+    in `max_delay`; when it does not, the request is not retried.
+    """
+
+    attempts: int = DEFAULT_RETRY_ATTEMPTS
+    base_delay: float = DEFAULT_RETRY_BASE_DELAY
+    max_delay: float = DEFAULT_RETRY_MAX_DELAY
+    jitter: float = 0.5
+
+    def get_delay(self, attempt: int, retry_after: float | None = None) -> float | None:
+        """Return the seconds to wait before the next attempt, or None to stop."""
+        if attempt + 1 >= self.attempts:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        backoff = min(self.max_delay, self.base_delay * 2**attempt)
+        return uniform(backoff * (1.0 - self.jitter), backoff)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a data source.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests are short-circuited for `reset_timeout` seconds. Then a single
+    trial request is allowed (half-open): a success closes the circuit again,
+    and a failure keeps it open for another period.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_CIRCUIT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Set up a closed circuit."""
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> CircuitState:
+        """Return the current state of the circuit."""
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self._reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        """Check if a request can be made now."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a request reaching the server."""
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_skipped(self) -> None:
+        """Forget an allowed request that was finally not made."""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failed request, opening the circuit if needed."""
+        self._failures += 1
+        if self._trial_in_flight or self._failures >= self._failure_threshold:
+            self._opened_at = self._clock()
+        self._trial_in_flight = False
@@ -0,0 +1,175 @@
+"""
+ESIOS API handler for HomeAssistant. Request scheduler.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from itertools import count
+from typing import Callable
+
+from .const import (
+    DEFAULT_DAILY_REQUEST_BUDGET,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    PRIORITY_NORMAL,
+    PRIORITY_TO_BUDGET_RATIO,
+    REFERENCE_TZ,
+    SENSOR_KEY_TO_PRIORITY,
+)
+
+_STATS_MAX_DAYS = 7
+
+
+class RequestDeferredError(Exception):
+    """Exception to signal a request deferred to save the daily budget."""
+
+    pass  # noqa PIE790
+
+
+def _today_ref() -> date:
+    return datetime.now(REFERENCE_TZ).date()
+
+
+class RequestBudgetLedger:
+    """
+    Daily count of issued and deferred requests for an ESIOS token.
+
+    Each priority class can only use a fraction of the daily budget
+    (see `PRIORITY_TO_BUDGET_RATIO`), so low-priority indicators are deferred
+    when the budget gets tight, leaving room for the main prices.
+    """
+
+    def __init__(
+        self,
+        daily_budget: int | None = DEFAULT_DAILY_REQUEST_BUDGET,
+        today: Callable[[], date] = _today_ref,
+    ) -> None:
+        """Set up the ledger with a daily budget (None for unlimited)."""
+        self._daily_budget = daily_budget
+        self._today = today
+        self._stats: dict[date, dict[str, int]] = {}
+
+    def _day_stats(self) -> dict[str, int]:
+        day = self._today()
+        if day not in self._stats:
+            self._stats[day] = {"issued": 0, "deferred": 0}
+            for old_day in sorted(self._stats)[:-_STATS_MAX_DAYS]:
+                self._stats.pop(old_day)
+        return self._stats[day]
+
+    def allows(self, priority: int) -> bool:
+        """Check if a request with this priority fits in today's budget."""
+        if self._daily_budget is None:
+            return True
+        ratio = PRIORITY_TO_BUDGET_RATIO.get(priority, 1.0)
+        return self._day_stats()["issued"] < ratio * self._daily_budget
+
+    def record_issued(self) -> None:
+        """Count an issued request."""
+        self._day_stats()["issued"] += 1
+
+    def record_deferred(self) -> None:
+        """Count a deferred request."""
+        self._day_stats()["deferred"] += 1
+
+    @property
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return the issued and deferred requests for the last days."""
+        return {
+            day.isoformat(): dict(day_stats)
+            for day, day_stats in sorted(self._stats.items())
+        }
+
+
+class RequestScheduler:
+    """
+    Limit the concurrent requests to ESIOS, serving them by priority.
+
+    When all slots are busy, waiting requests are released in priority order
+    (FIFO for the same priority), so PVPC and INJECTION go before the
+    DEMAND or CO2 indicators.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        ledger: RequestBudgetLedger | None = None,
+    ) -> None:
+        """Set up the scheduler with a concurrency limit and a budget ledger."""
+        self._max_concurrency = max_concurrency
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._counter = count()
+        self.ledger = ledger or RequestBudgetLedger()
+
+    async def _acquire(self, priority: int) -> None:
+        if self._active < self._max_concurrency and not self._waiters:
+            self._active += 1
+            return
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was already handed over, so pass it on
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # hand over the slot, without changing the active count
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(
+        self, sensor_key: str, priority: int | None = None
+    ) -> AsyncIterator[None]:
+        """
+        Wait for a free request slot for an indicator.
+
+        Without a `priority`, the one of the indicator is used.
+        Raises `RequestDeferredError` if the request does not fit
+        in the remaining daily budget for its priority.
+        """
+        if priority is None:
+            priority = SENSOR_KEY_TO_PRIORITY.get(sensor_key, PRIORITY_NORMAL)
+        if not self.ledger.allows(priority):
+            self.ledger.record_deferred()
+            raise RequestDeferredError(sensor_key)
+
+        await self._acquire(priority)
+        self.ledger.record_issued()
+        try:
+            yield
+        finally:
+            self._release()
+
+
+_SCHEDULERS: dict[str | None, RequestScheduler] = {}
+
+
+def get_request_scheduler(api_token: str | None) -> RequestScheduler:
+    """
+    Return the process-wide request scheduler for an ESIOS token.
+
+    All instances using the same token share the concurrency limit and the
+    daily budget. Requests without token have no budget.
+    """
+    if api_token not in _SCHEDULERS:
+        _SCHEDULERS[api_token] = RequestScheduler(
+            ledger=RequestBudgetLedger(
+                DEFAULT_DAILY_REQUEST_BUDGET if api_token is not None else None
+            )
+        )
+    return _SCHEDULERS[api_token]
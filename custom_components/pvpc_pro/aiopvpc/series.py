@@ -0,0 +1,349 @@
+"""
+ESIOS API handler for HomeAssistant. Compact price series.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import date, datetime, time, timedelta, tzinfo
+from math import isnan, nan
+from typing import Any
+import zoneinfo
+
+_UTC = zoneinfo.ZoneInfo("UTC")
+_DEFAULT_STEP = 3600
+
+
+def _to_epoch(ts: datetime) -> int:
+    return int(ts.timestamp())
+
+
+def _to_datetime(epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, _UTC)
+
+
+def _count_values(values: Iterable[float]) -> int:
+    return sum(1 for value in values if not isnan(value))
+
+
+class PriceSeries(Mapping[datetime, float]):
+    """
+    Regular time series of prices, as a read-write mapping of UTC datetimes.
+
+    Values are stored in an `array('d')` from a `start` timestamp, with a fixed
+    `step`, so lookups by time are index arithmetic. Missing values are NaN gaps,
+    and they are not listed as keys.
+
+    The `version` counter increases with each change, so derived data
+    can be cached while it does not change.
+    """
+
+    __slots__ = ("_start", "_step", "_values", "_count", "_version")
+
+    def __init__(
+        self,
+        start: int = 0,
+        step: int = _DEFAULT_STEP,
+        values: Iterable[float] = (),
+    ) -> None:
+        """Set up a series from its first epoch timestamp, step (s) and values."""
+        self._start = start
+        self._step = step
+        self._values: array[float] | memoryview = (
+            values if isinstance(values, (array, memoryview)) else array("d", values)
+        )
+        self._count = _count_values(self._values)
+        self._version = 0
+
+    @classmethod
+    def from_items(
+        cls, items: Iterable[tuple[datetime, float]], step: int | None = None
+    ) -> PriceSeries:
+        """
+        Make a series from (datetime, price) pairs.
+
+        Without a `step`, the shortest time between pairs is used.
+        """
+        return cls.from_epoch_items(
+            ((_to_epoch(ts), value) for ts, value in items), step
+        )
+
+    @classmethod
+    def from_epoch_items(
+        cls, items: Iterable[tuple[int, float]], step: int | None = None
+    ) -> PriceSeries:
+        """Make a series from (epoch timestamp, price) pairs, as `from_items`."""
+        pairs = sorted(items)
+        if not pairs:
+            return cls(step=step or _DEFAULT_STEP)
+        if step is None:
+            step = min(
+                (b[0] - a[0] for a, b in zip(pairs, pairs[1:]) if b[0] > a[0]),
+                default=_DEFAULT_STEP,
+            )
+        start = pairs[0][0]
+        values = array("d", [nan]) * ((pairs[-1][0] - start) // step + 1)
+        for epoch, value in pairs:
+            values[(epoch - start) // step] = value
+        return cls(start, step, values)
+
+    @classmethod
+    def concat(cls, parts: Iterable[PriceSeries]) -> PriceSeries:
+        """
+        Join series that do not overlap (like daily blocks) in one buffer.
+
+        If the steps are different, the finer one is used for the result.
+        """
+        parts = [part for part in parts if part]
+        if not parts:
+            return cls()
+        step = min(part._step for part in parts)
+        start = min(part._start for part in parts)
+        end = max(part._start + len(part._values) * part._step for part in parts)
+        values = array("d", [nan]) * ((end - start) // step)
+        for part in parts:
+            part = part._resampled(step)
+            offset = (part._start - start) // step
+            values[offset : offset + len(part._values)] = array("d", part._values)
+        return cls(start, step, values)
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any]) -> PriceSeries:
+        """Load a series made with `as_dict`."""
+        return cls(
+            raw["start"],
+            raw["step"],
+            (nan if value is None else value for value in raw["values"]),
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a compact, JSON-serializable representation."""
+        return {
+            "start": self._start,
+            "step": self._step,
+            "values": [None if isnan(value) else value for value in self._values],
+        }
+
+    @property
+    def version(self) -> int:
+        """Return a counter of the changes in the series."""
+        return self._version
+
+    @property
+    def step(self) -> timedelta:
+        """Return the time between values."""
+        return timedelta(seconds=self._step)
+
+    @property
+    def first_timestamp(self) -> datetime | None:
+        """Return the time of the first value."""
+        for i, value in enumerate(self._values):
+            if not isnan(value):
+                return _to_datetime(self._start + i * self._step)
+        return None
+
+    @property
+    def last_timestamp(self) -> datetime | None:
+        """Return the time of the last value."""
+        for i in range(len(self._values) - 1, -1, -1):
+            if not isnan(self._values[i]):
+                return _to_datetime(self._start + i * self._step)
+        return None
+
+    def _index(self, ts: datetime) -> int | None:
+        offset = _to_epoch(ts) - self._start
+        if offset % self._step:
+            return None
+        return offset // self._step
+
+    def __getitem__(self, ts: datetime) -> float:
+        """Return the price at a time, in O(1)."""
+        idx = self._index(ts)
+        if idx is None or not 0 <= idx < len(self._values):
+            raise KeyError(ts)
+        value = self._values[idx]
+        if isnan(value):
+            raise KeyError(ts)
+        return value
+
+    def __iter__(self) -> Iterator[datetime]:
+        """Iterate over the times with a value."""
+        for i, value in enumerate(self._values):
+            if not isnan(value):
+                yield _to_datetime(self._start + i * self._step)
+
+    def __len__(self) -> int:
+        """Return the number of values, without gaps."""
+        return self._count
+
+    def __repr__(self) -> str:
+        """Return a short representation."""
+        first_ts = self.first_timestamp
+        return (
+            f"PriceSeries({len(self)} values, step={self._step}s, "
+            f"from={first_ts.isoformat() if first_ts else None})"
+        )
+
+    def items(self) -> Iterator[tuple[datetime, float]]:  # type: ignore[override]
+        """Iterate over the (time, price) pairs, without gaps."""
+        for i, value in enumerate(self._values):
+            if not isnan(value):
+                yield _to_datetime(self._start + i * self._step), value
+
+    def values(self) -> Iterator[float]:  # type: ignore[override]
+        """Iterate over the prices, without gaps."""
+        return (value for value in self._values if not isnan(value))
+
+    def __setitem__(self, ts: datetime, value: float) -> None:
+        """Set the price at a time aligned with the series step."""
+        if not self._values:
+            self._start = _to_epoch(ts)
+        idx = self._index(ts)
+        if idx is None:
+            raise ValueError(f"{ts} is not aligned with a step of {self._step}s")
+        if not 0 <= idx < len(self._values):
+            self._resize(min(idx, 0), max(idx + 1, len(self._values)))
+            idx = self._index(ts)
+            assert idx is not None
+        elif isinstance(self._values, memoryview):
+            # copy on write, so a view never changes the series it comes from
+            self._values = array("d", self._values)
+        if isnan(self._values[idx]):
+            self._count += 1
+        self._values[idx] = value
+        self._version += 1
+
+    def _resize(self, first_idx: int, end_idx: int) -> None:
+        # a new buffer, so the views of the old one are still valid
+        values = array("d", [nan]) * (end_idx - first_idx)
+        values[-first_idx : -first_idx + len(self._values)] = array("d", self._values)
+        self._values = values
+        self._start += first_idx * self._step
+
+    def _resampled(self, step: int) -> PriceSeries:
+        if step == self._step:
+            return self
+        # each value covers the finer steps inside its own step
+        repeat = self._step // step
+        return PriceSeries(
+            self._start,
+            step,
+            (value for value in self._values for _ in range(repeat)),
+        )
+
+    def update(self, other: Mapping[datetime, float]) -> None:  # type: ignore[override]
+        """
+        Merge the values of another series, which take precedence.
+
+        If the steps are different, the finer one is used for the result.
+        """
+        if not isinstance(other, PriceSeries):
+            other = PriceSeries.from_items(other.items(), step=self._step)
+        if not other:
+            return
+        if not self:
+            self._start, self._step = other._start, other._step
+            self._values = array("d", other._values)
+            self._count = other._count
+            self._version += 1
+            return
+
+        step = min(self._step, other._step)
+        current = self._resampled(step)
+        other = other._resampled(step)
+        start = min(current._start, other._start)
+        end = max(
+            current._start + len(current._values) * step,
+            other._start + len(other._values) * step,
+        )
+        values = array("d", [nan]) * ((end - start) // step)
+        offset = (current._start - start) // step
+        values[offset : offset + len(current._values)] = array("d", current._values)
+        offset = (other._start - start) // step
+        for i, value in enumerate(other._values):
+            if not isnan(value):
+                values[offset + i] = value
+
+        self._start, self._step, self._values = start, step, values
+        self._count = _count_values(values)
+        self._version += 1
+
+    def drop_before(self, ts: datetime) -> None:
+        """Remove the values before some time."""
+        idx = -(-(_to_epoch(ts) - self._start) // self._step)
+        if idx <= 0:
+            return
+        self._values = array("d", self._values[idx:])
+        self._start += idx * self._step
+        self._count = _count_values(self._values)
+        self._version += 1
+
+    def slice(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> PriceSeries:
+        """
+        Return a view of the values between `start` (included) and `end`.
+
+        The view shares the buffer of the series (no copy), read-only:
+        setting a value in the view copies its values first.
+        """
+        size = len(self._values)
+        first_idx = (
+            0
+            if start is None
+            else min(size, max(0, -(-(_to_epoch(start) - self._start) // self._step)))
+        )
+        end_idx = (
+            size
+            if end is None
+            else min(size, max(0, -(-(_to_epoch(end) - self._start) // self._step)))
+        )
+        end_idx = max(first_idx, end_idx)
+        return PriceSeries(
+            self._start + first_idx * self._step,
+            self._step,
+            memoryview(self._values)[first_idx:end_idx].toreadonly(),
+        )
+
+    def day_slice(self, day: date, tz: tzinfo) -> PriceSeries:
+        """Return a view of the values of a local day."""
+        day_start = datetime.combine(day, time(), tz)
+        day_end = datetime.combine(day + timedelta(days=1), time(), tz)
+        return self.slice(day_start, day_end)
+
+    def copy(self) -> PriceSeries:
+        """Return a copy with its own buffer."""
+        return PriceSeries(self._start, self._step, array("d", self._values))
+
+    def step_range(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> range:
+        """
+        Return the indexes in the buffer of the steps inside a time range.
+
+        Steps start at or after `start`, and end at or before `end`.
+        """
+        size = len(self._values)
+        first_idx = (
+            0
+            if start is None
+            else max(0, -(-(_to_epoch(start) - self._start) // self._step))
+        )
+        end_idx = (
+            size
+            if end is None
+            else min(size, (_to_epoch(end) - self._start) // self._step)
+        )
+        return range(first_idx, max(first_idx, end_idx))
+
+    def raw_epochs(self) -> range:
+        """Return the epoch timestamps of the buffer of values, gaps included."""
+        return range(
+            self._start, self._start + len(self._values) * self._step, self._step
+        )
+
+    def raw_values(self) -> memoryview:
+        """Return a read-only view of the buffer of values, with NaN gaps."""
+        return memoryview(self._values).toreadonly()
@@ -0,0 +1,77 @@
+"""
+ESIOS API handler for HomeAssistant. Shared fetch cache.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from .const import DEFAULT_SHARED_CACHE_TTL
+
+FetchKey = tuple[str, ...]
+
+_FAILED = object()
+
+
+class SharedFetchCache:
+    """
+    Cache of parsed downloads shared by several `PVPCData` instances.
+
+    Entries are keyed by (data source, indicator, day, ...), so two config entries
+    requesting the same data at the same time make only one request
+    (single-flight), and results are reused for `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_SHARED_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Set up an empty cache."""
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: dict[FetchKey, tuple[float, Any]] = {}
+        self._in_flight: dict[FetchKey, asyncio.Future[Any]] = {}
+
+    def _purge(self) -> None:
+        min_ts = self._clock() - self._ttl
+        for key in [k for k, (ts, _) in self._entries.items() if ts < min_ts]:
+            self._entries.pop(key)
+
+    async def get_or_fetch(
+        self, key: FetchKey, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return the cached result for `key`, or fetch it.
+
+        If the same key is already being fetched, wait for that result.
+        When that fetch fails, followers fetch on their own, so errors
+        (like an invalid token) stay with the caller that caused them.
+        """
+        self._purge()
+        if key in self._entries:
+            return self._entries[key][1]
+
+        if (in_flight := self._in_flight.get(key)) is not None:
+            result = await asyncio.shield(in_flight)
+            if result is not _FAILED:
+                return result
+            return await fetch()
+
+        in_flight = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = in_flight
+        try:
+            result = await fetch()
+        except BaseException:
+            in_flight.set_result(_FAILED)
+            raise
+        else:
+            in_flight.set_result(_FAILED if result is None else result)
+            if result is not None:
+                self._entries[key] = (self._clock(), result)
+        finally:
+            self._in_flight.pop(key, None)
+        return result
@@ -0,0 +1,139 @@
+"""
+ESIOS API handler for HomeAssistant. Streaming decoder for indicator files.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from collections.abc import AsyncIterable, Iterable
+from typing import Any
+
+from .const import GEOZONE_ID2NAME
+
+_VALUES_KEY = re.compile(r'(?<!\\)"values"\s*:\s*\[')
+_ITEM_SEPARATORS = " \t\n\r,"
+
+
+def get_geo_ids_for_zones(zones: Iterable[str]) -> set[int]:
+    """Return the ESIOS geo ids for some geo zone names."""
+    zones = set(zones)
+    return {geo_id for geo_id, name in GEOZONE_ID2NAME.items() if name in zones}
+
+
+class IndicatorStreamDecoder:
+    """
+    Incremental decoder for 'indicator' json files.
+
+    The body is fed in chunks and each item of `indicator.values` is decoded
+    as soon as it is complete, keeping only the fields needed by the parser
+    for the items of the wanted geo ids. If none of them is present, the items
+    of the lowest geo id are kept instead, as the parser would select them.
+
+    The rest of the document is small, and it is decoded at the end.
+    """
+
+    def __init__(self, geo_ids: set[int]) -> None:
+        """Set up the decoder for the wanted geo ids."""
+        self._geo_ids = geo_ids
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._head: str | None = None
+        self._tail: list[str] | None = None
+        self._values: list[dict[str, Any]] = []
+        self._fallback_geo_id: int | None = None
+        self._fallback_values: list[dict[str, Any]] = []
+
+    def _keep(self, item: Any) -> None:
+        geo_id = item.get("geo_id") if isinstance(item, dict) else None
+        if not isinstance(geo_id, int):
+            raise ValueError(f"Invalid item in 'values' of indicator file: {item}")
+        value = {
+            "datetime": item["datetime"],
+            "value": item.get("value"),
+            "geo_id": geo_id,
+        }
+        if geo_id in self._geo_ids:
+            self._values.append(value)
+        elif not self._values:
+            if self._fallback_geo_id is None or geo_id < self._fallback_geo_id:
+                self._fallback_geo_id = geo_id
+                self._fallback_values = [value]
+            elif geo_id == self._fallback_geo_id:
+                self._fallback_values.append(value)
+
+    def _decode_values(self) -> None:
+        buffer = self._buffer
+        idx = 0
+        while True:
+            while idx < len(buffer) and buffer[idx] in _ITEM_SEPARATORS:
+                idx += 1
+            if idx == len(buffer):
+                break
+            if buffer[idx] == "]":
+                self._tail = [buffer[idx + 1 :]]
+                idx = len(buffer)
+                break
+            try:
+                item, idx_end = self._json_decoder.raw_decode(buffer, idx)
+            except json.JSONDecodeError:
+                # incomplete item, wait for more data
+                break
+            self._keep(item)
+            idx = idx_end
+        self._buffer = buffer[idx:]
+
+    def feed(self, chunk: bytes) -> None:
+        """Decode a new chunk of the body."""
+        text = self._text_decoder.decode(chunk)
+        if self._tail is not None:
+            self._tail.append(text)
+            return
+
+        self._buffer += text
+        if self._head is None:
+            if (match := _VALUES_KEY.search(self._buffer)) is None:
+                return
+            self._head = self._buffer[: match.end() - 1]
+            self._buffer = self._buffer[match.end() :]
+        self._decode_values()
+
+    def close(self) -> dict[str, Any]:
+        """
+        Finish decoding, and return the document with the kept values.
+
+        Raise `ValueError` if the body is not a complete indicator file.
+        """
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        if self._head is None:
+            # no 'values' key found, so this is a plain document
+            data = json.loads(self._buffer)
+            if not isinstance(data, dict):
+                raise ValueError("Unexpected content in indicator file")
+            return data
+        if self._tail is None:
+            raise ValueError("Unexpected end of 'values' in indicator file")
+
+        data = json.loads(self._head + "[]" + "".join(self._tail))
+        if not isinstance(data, dict) or not isinstance(data.get("indicator"), dict):
+            raise ValueError("Unexpected 'values' outside of 'indicator' in file")
+        data["indicator"]["values"] = self._values or self._fallback_values
+        return data
+
+
+async def decode_indicator_stream(
+    chunks: AsyncIterable[bytes], geo_ids: set[int]
+) -> dict[str, Any]:
+    """
+    Decode an 'indicator' json body as it is received.
+
+    Raise `ValueError` if the body is not a valid indicator file,
+    so it is handled as any other bad payload.
+    """
+    decoder = IndicatorStreamDecoder(geo_ids)
+    async for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
@@ -0,0 +1,87 @@
+"""
+ESIOS API handler for HomeAssistant. Publication-aware update planning.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+
+from .const import (
+    DAY_AHEAD_PUBLICATION_HOUR,
+    DEFAULT_UPDATE_INTERVAL_MINUTES,
+    PUBLICATION_RAMP_MINUTES,
+    PUBLICATION_RETRY_MINUTES,
+    REFERENCE_TZ,
+    SENSOR_KEY_TO_UPDATE_CADENCE_MINUTES,
+    UTC_TZ,
+)
+from .series import PriceSeries
+
+
+def get_last_price_day(prices: PriceSeries) -> date | None:
+    """Return the last local day with prices in a series."""
+    if (last_ts := prices.last_timestamp) is None:
+        return None
+    return last_ts.astimezone(REFERENCE_TZ).date()
+
+
+def has_prices_for_day(prices: PriceSeries, day: date) -> bool:
+    """Check if a series reaches the local `day`."""
+    last_day = get_last_price_day(prices)
+    return last_day is not None and last_day >= day
+
+
+def get_publication_times(day: date) -> list[datetime]:
+    """
+    Return the times to poll for the prices of the day after `day`.
+
+    The ramp starts at the publication hour, with tighter polls first,
+    and then it continues every `PUBLICATION_RETRY_MINUTES` until midnight.
+    """
+    start = datetime.combine(day, time(DAY_AHEAD_PUBLICATION_HOUR), REFERENCE_TZ)
+    end = datetime.combine(day + timedelta(days=1), time(), REFERENCE_TZ)
+    poll_times = [start + timedelta(minutes=m) for m in PUBLICATION_RAMP_MINUTES]
+    while (
+        next_poll := poll_times[-1] + timedelta(minutes=PUBLICATION_RETRY_MINUTES)
+    ) < end:
+        poll_times.append(next_poll)
+    return [t.astimezone(UTC_TZ) for t in poll_times if t < end]
+
+
+def _next_cadence_time(utc_now: datetime, minutes: int) -> datetime:
+    local_now = utc_now.astimezone(REFERENCE_TZ)
+    midnight = datetime.combine(local_now.date(), time(), REFERENCE_TZ)
+    elapsed = (local_now - midnight) // timedelta(minutes=minutes) + 1
+    return (midnight + elapsed * timedelta(minutes=minutes)).astimezone(UTC_TZ)
+
+
+def get_next_update_time(
+    sensor_key: str, prices: PriceSeries, utc_now: datetime
+) -> datetime:
+    """
+    Return the next time when an update can bring new data for an indicator.
+
+    * Without prices for today, it is retried soon.
+    * Near-real-time indicators are refreshed with their own cadence.
+    * Without prices for tomorrow, it waits for the publication window,
+      and then it polls with a ramp until they arrive.
+    * With prices for tomorrow, it waits until the next publication window.
+    """
+    today = utc_now.astimezone(REFERENCE_TZ).date()
+    if not has_prices_for_day(prices, today):
+        return utc_now + timedelta(minutes=DEFAULT_UPDATE_INTERVAL_MINUTES)
+
+    if sensor_key in SENSOR_KEY_TO_UPDATE_CADENCE_MINUTES:
+        return _next_cadence_time(
+            utc_now, SENSOR_KEY_TO_UPDATE_CADENCE_MINUTES[sensor_key]
+        )
+
+    tomorrow = today + timedelta(days=1)
+    if has_prices_for_day(prices, tomorrow):
+        return get_publication_times(tomorrow)[0]
+    for poll_time in get_publication_times(today):
+        if poll_time > utc_now:
+            return poll_time
+    # still missing after the publication window, retry from midnight
+    return datetime.combine(tomorrow, time(), REFERENCE_TZ).astimezone(UTC_TZ)
@@ -3,8 +3,13 @@ ESIOS API handler for HomeAssistant. Utilities.
 Modified and maintained by Javisen - 2026.
 """
 
-from datetime import datetime
-from .const import UTC_TZ
+from datetime import datetime, timedelta
+from typing import Any, Mapping
+
+from .const import DEFAULT_RESOLUTION, EsiosApiData, REFERENCE_TZ, UTC_TZ
+from .series import PriceSeries
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC_TZ)
 
 
 def ensure_utc_time(ts: datetime) -> datetime:
@@ -16,3 +21,61 @@ def ensure_utc_time(ts: datetime) -> datetime:
         return ts.astimezone(UTC_TZ)
 
     return ts
+
+
+def get_series_resolution(prices: Mapping[datetime, Any]) -> timedelta:
+    """Return the time step of a series (hourly or quarter-hourly)."""
+    if isinstance(prices, PriceSeries):
+        return prices.step if prices else DEFAULT_RESOLUTION
+    timestamps = iter(prices)
+    first_ts = next(timestamps, None)
+    second_ts = next(timestamps, None)
+    if first_ts is None or second_ts is None:
+        return DEFAULT_RESOLUTION
+    step = second_ts - first_ts
+    if timedelta(0) < step < DEFAULT_RESOLUTION:
+        return step
+    return DEFAULT_RESOLUTION
+
+
+def floor_to_resolution(ts: datetime, resolution: timedelta) -> datetime:
+    """Round down a tz-aware datetime to the start of its time step."""
+    ts = ts.replace(second=0, microsecond=0)
+    return ts - (ts - _EPOCH) % resolution
+
+
+def esios_data_to_dict(data: EsiosApiData) -> dict[str, Any]:
+    """Make a compact, JSON-serializable snapshot of the downloaded data."""
+    return {
+        "last_update": data.last_update.isoformat(),
+        "data_source": data.data_source,
+        "availability": dict(data.availability),
+        "sensors": {
+            sensor_key: prices.as_dict() for sensor_key, prices in data.sensors.items()
+        },
+    }
+
+
+def esios_data_from_dict(raw: dict[str, Any], now: datetime) -> EsiosApiData:
+    """
+    Load a data snapshot made with `esios_data_to_dict`.
+
+    Prices from days before the current local day are discarded,
+    so the restored data does not look up-to-date when it is not.
+    """
+    local_ref_now = ensure_utc_time(now).astimezone(REFERENCE_TZ)
+    min_ts = local_ref_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    sensors = {}
+    for sensor_key, raw_prices in raw["sensors"].items():
+        prices = PriceSeries.from_dict(raw_prices)
+        prices.drop_before(min_ts)
+        sensors[sensor_key] = prices
+    return EsiosApiData(
+        last_update=ensure_utc_time(datetime.fromisoformat(raw["last_update"])),
+        data_source=raw["data_source"],
+        sensors=sensors,
+        availability={
+            sensor_key: bool(available) and bool(sensors.get(sensor_key))
+            for sensor_key, available in raw["availability"].items()
+        },
+    )
@@ -0,0 +1,90 @@
+"""
+ESIOS API handler for HomeAssistant. Cheapest time windows.
+Modified and maintained by Javisen - 2026.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from math import isnan
+from typing import Any
+
+from .const import PRICE_PRECISION, UTC_TZ
+from .series import PriceSeries
+
+
+@dataclass(frozen=True)
+class PriceWindow:
+    """Contiguous time window with its average price."""
+
+    start: datetime
+    end: datetime
+    average_price: float
+
+    @property
+    def duration(self) -> timedelta:
+        """Return the length of the window."""
+        return self.end - self.start
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serializable representation."""
+        return {
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "average_price": self.average_price,
+        }
+
+
+def find_cheapest_window(
+    prices: Mapping[datetime, float],
+    duration: timedelta,
+    start_after: datetime | None = None,
+    end_before: datetime | None = None,
+) -> PriceWindow | None:
+    """
+    Find the contiguous window of `duration` with the lowest average price.
+
+    The window starts at a time step of the series, not before `start_after`,
+    and ends not after `end_before`. Durations are rounded up to whole steps.
+    Windows do not cross gaps in the series, and today and tomorrow prices
+    are one series, so windows can cross midnight.
+
+    A running sum over the series finds it in O(n).
+    Ties are resolved with the earliest window.
+    """
+    if not isinstance(prices, PriceSeries):
+        prices = PriceSeries.from_items(prices.items())
+    step = int(prices.step.total_seconds())
+    num_steps = max(1, -(-int(duration.total_seconds()) // step))
+    epochs = prices.raw_epochs()
+    values = prices.raw_values()
+    if not values:
+        return None
+
+    best_sum = best_idx = None
+    window_sum = 0.0
+    valid_steps = 0
+    for idx in prices.step_range(start_after, end_before):
+        value = values[idx]
+        if isnan(value):
+            window_sum = 0.0
+            valid_steps = 0
+            continue
+        window_sum += value
+        valid_steps += 1
+        if valid_steps > num_steps:
+            window_sum -= values[idx - num_steps]
+        if valid_steps >= num_steps and (best_sum is None or window_sum < best_sum):
+            best_sum = window_sum
+            best_idx = idx - num_steps + 1
+
+    if best_idx is None:
+        return None
+    start = datetime.fromtimestamp(epochs[best_idx], UTC_TZ)
+    return PriceWindow(
+        start=start,
+        end=start + num_steps * prices.step,
+        average_price=round(best_sum / num_steps, PRICE_PRECISION),
+    )
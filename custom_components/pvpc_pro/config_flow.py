@@ -11,6 +11,7 @@ from typing import Any
 import voluptuous as vol
 
 from .aiopvpc import DEFAULT_POWER_KW, PVPCData
+from .aiopvpc.const import DEFAULT_BATTERY_SOC_STEPS, KEY_INDEXED, KEY_PVPC
 
 from homeassistant.config_entries import (
     SOURCE_REAUTH,
@@ -21,6 +22,7 @@ from homeassistant.config_entries import (
 )
 from homeassistant.const import CONF_API_TOKEN, CONF_NAME
 from homeassistant.core import callback
+from homeassistant.helpers import selector
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.util import dt as dt_util
 
@@ -28,13 +30,31 @@ from .const import (
     ATTR_POWER,
     ATTR_POWER_P3,
     ATTR_TARIFF,
+    CHEAPEST_WINDOW_HOURS,
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_EFFICIENCY,
+    CONF_BATTERY_POWER,
+    CONF_BATTERY_SOC_ENTITY,
+    CONF_BATTERY_SOC_STEPS,
+    CONF_BILLING_DAY,
+    CONF_CHEAPEST_WINDOWS,
+    CONF_COMPACT_ATTRIBUTES,
+    CONF_COST_INDICATOR,
+    CONF_ENERGY_ENTITY,
     CONF_USE_API_TOKEN,
+    DEFAULT_BATTERY_EFFICIENCY,
     DEFAULT_NAME,
     DEFAULT_TARIFF,
     DOMAIN,
+    VALID_BATTERY_CAPACITY,
+    VALID_BATTERY_EFFICIENCY,
+    VALID_BATTERY_POWER,
+    VALID_BATTERY_SOC_STEPS,
+    VALID_BILLING_DAY,
     VALID_POWER,
     VALID_TARIFF,
 )
+from .helpers import parse_window_durations
 
 _MAIL_TO_LINK = (
     "[consultasios@ree.es]"
@@ -185,21 +205,17 @@ class TariffSelectorConfigFlow(ConfigFlow, domain=DOMAIN):
 class PVPCOptionsFlowHandler(OptionsFlowWithReload):
     """Handle PVPC options."""
 
-    _power: float | None = None
-    _power_p3: float | None = None
+    _options: dict[str, Any] | None = None
 
     async def async_step_api_token(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
         """Handle optional step to define API token for extra sensors."""
         if user_input is not None and user_input.get(CONF_API_TOKEN):
+            assert self._options is not None
             return self.async_create_entry(
                 title="",
-                data={
-                    ATTR_POWER: self._power,
-                    ATTR_POWER_P3: self._power_p3,
-                    CONF_API_TOKEN: user_input[CONF_API_TOKEN],
-                },
+                data={**self._options, CONF_API_TOKEN: user_input[CONF_API_TOKEN]},
             )
 
         api_token = self.config_entry.options.get(
@@ -217,19 +233,24 @@ class PVPCOptionsFlowHandler(OptionsFlowWithReload):
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
         """Manage the options."""
+        errors: dict[str, str] = {}
         if user_input is not None:
-            if user_input[CONF_USE_API_TOKEN]:
-                self._power = user_input[ATTR_POWER]
-                self._power_p3 = user_input[ATTR_POWER_P3]
-                return await self.async_step_api_token(user_input)
-            return self.async_create_entry(
-                title="",
-                data={
-                    ATTR_POWER: user_input[ATTR_POWER],
-                    ATTR_POWER_P3: user_input[ATTR_POWER_P3],
-                    CONF_API_TOKEN: None,
-                },
-            )
+            try:
+                parse_window_durations(user_input[CONF_CHEAPEST_WINDOWS])
+            except ValueError:
+                errors[CONF_CHEAPEST_WINDOWS] = "invalid_window_duration"
+            else:
+                options = {
+                    key: value
+                    for key, value in user_input.items()
+                    if key != CONF_USE_API_TOKEN
+                }
+                if user_input[CONF_USE_API_TOKEN]:
+                    self._options = options
+                    return await self.async_step_api_token(user_input)
+                return self.async_create_entry(
+                    title="", data={**options, CONF_API_TOKEN: None}
+                )
 
         options = self.config_entry.options
         data = self.config_entry.data
@@ -237,11 +258,70 @@ class PVPCOptionsFlowHandler(OptionsFlowWithReload):
         power_valley = options.get(ATTR_POWER_P3, data[ATTR_POWER_P3])
         api_token = options.get(CONF_API_TOKEN, data.get(CONF_API_TOKEN))
         use_api_token = api_token is not None
+        cheapest_windows = options.get(CONF_CHEAPEST_WINDOWS, [])
         schema = vol.Schema(
             {
                 vol.Required(ATTR_POWER, default=power): VALID_POWER,
                 vol.Required(ATTR_POWER_P3, default=power_valley): VALID_POWER,
                 vol.Required(CONF_USE_API_TOKEN, default=use_api_token): bool,
+                vol.Optional(
+                    CONF_CHEAPEST_WINDOWS, default=cheapest_windows
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=CHEAPEST_WINDOW_HOURS,
+                        multiple=True,
+                        custom_value=True,
+                    )
+                ),
+                vol.Optional(
+                    CONF_BATTERY_CAPACITY,
+                    default=options.get(CONF_BATTERY_CAPACITY, 0.0),
+                ): VALID_BATTERY_CAPACITY,
+                vol.Optional(
+                    CONF_BATTERY_POWER,
+                    default=options.get(CONF_BATTERY_POWER, DEFAULT_POWER_KW),
+                ): VALID_BATTERY_POWER,
+                vol.Optional(
+                    CONF_BATTERY_EFFICIENCY,
+                    default=options.get(
+                        CONF_BATTERY_EFFICIENCY, DEFAULT_BATTERY_EFFICIENCY
+                    ),
+                ): VALID_BATTERY_EFFICIENCY,
+                vol.Optional(
+                    CONF_BATTERY_SOC_ENTITY,
+                    description={
+                        "suggested_value": options.get(CONF_BATTERY_SOC_ENTITY)
+                    },
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(domain="sensor")
+                ),
+                vol.Optional(
+                    CONF_BATTERY_SOC_STEPS,
+                    default=options.get(
+                        CONF_BATTERY_SOC_STEPS, DEFAULT_BATTERY_SOC_STEPS
+                    ),
+                ): VALID_BATTERY_SOC_STEPS,
+                vol.Optional(
+                    CONF_ENERGY_ENTITY,
+                    description={"suggested_value": options.get(CONF_ENERGY_ENTITY)},
+                ): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="energy"
+                    )
+                ),
+                vol.Optional(
+                    CONF_COST_INDICATOR,
+                    default=options.get(CONF_COST_INDICATOR, KEY_PVPC),
+                ): vol.In([KEY_PVPC, KEY_INDEXED]),
+                vol.Optional(
+                    CONF_BILLING_DAY, default=options.get(CONF_BILLING_DAY, 1)
+                ): VALID_BILLING_DAY,
+                vol.Optional(
+                    CONF_COMPACT_ATTRIBUTES,
+                    default=options.get(CONF_COMPACT_ATTRIBUTES, False),
+                ): bool,
             }
         )
-        return self.async_show_form(step_id="init", data_schema=schema)
+        if user_input is not None:
+            schema = self.add_suggested_values_to_schema(schema, user_input)
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
@@ -3,15 +3,65 @@ Constant values for PVPC REE Data (Pro Version).
 Modified and maintained by Javisen - 2026.
 """
 
+from .aiopvpc import HistoryStore, SharedFetchCache
 from .aiopvpc.const import TARIFFS
 import voluptuous as vol
 
+from homeassistant.util.hass_dict import HassKey
+
 DOMAIN = "pvpc_pro"
+DATA_FETCH_CACHE: HassKey[SharedFetchCache] = HassKey(f"{DOMAIN}_fetch_cache")
+DATA_HISTORY_STORE: HassKey[HistoryStore] = HassKey(f"{DOMAIN}_history_store")
+EVENT_TOMORROW_PRICES_AVAILABLE = f"{DOMAIN}_tomorrow_prices_available"
 DEFAULT_NAME = "PVPC REE Data"
 ATTR_POWER = "power"
 ATTR_POWER_P3 = "power_p3"
 ATTR_TARIFF = "tariff"
 CONF_USE_API_TOKEN = "use_api_token"
+CONF_CHEAPEST_WINDOWS = "cheapest_windows"
+CONF_BATTERY_CAPACITY = "battery_capacity"
+CONF_BATTERY_POWER = "battery_power"
+CONF_BATTERY_EFFICIENCY = "battery_efficiency"
+CONF_BATTERY_SOC_ENTITY = "battery_soc_entity"
+CONF_BATTERY_SOC_STEPS = "battery_soc_steps"
+CONF_ENERGY_ENTITY = "energy_entity"
+CONF_COST_INDICATOR = "cost_indicator"
+CONF_BILLING_DAY = "billing_day"
+CONF_COMPACT_ATTRIBUTES = "compact_attributes"
 VALID_POWER = vol.All(vol.Coerce(float), vol.Range(min=1.0, max=15.0))
 VALID_TARIFF = vol.In(TARIFFS)
+CHEAPEST_WINDOW_HOURS = ["1", "2", "3", "4", "6", "8"]
+VALID_BATTERY_CAPACITY = vol.All(vol.Coerce(float), vol.Range(min=0.0, max=200.0))
+VALID_BATTERY_POWER = vol.All(vol.Coerce(float), vol.Range(min=0.1, max=50.0))
+VALID_BATTERY_EFFICIENCY = vol.All(vol.Coerce(float), vol.Range(min=50.0, max=100.0))
+VALID_BATTERY_SOC_STEPS = vol.All(vol.Coerce(int), vol.Range(min=2, max=100))
+DEFAULT_BATTERY_EFFICIENCY = 90.0
+VALID_BILLING_DAY = vol.All(vol.Coerce(int), vol.Range(min=1, max=28))
 DEFAULT_TARIFF = TARIFFS[0]
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 30
+# days of a backfill call, so it does not take the whole daily request budget
+MAX_BACKFILL_DAYS = 366
+SERVICE_GET_HISTORY = "get_history"
+SERVICE_BACKFILL_HISTORY = "backfill_history"
+SERVICE_FIND_CHEAPEST_WINDOW = "find_cheapest_window"
+SERVICE_SCHEDULE_LOADS = "schedule_loads"
+SERVICE_OPTIMIZE_BATTERY = "optimize_battery"
+ATTR_CONFIG_ENTRY = "config_entry"
+ATTR_INDICATOR = "indicator"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_DURATION = "duration"
+ATTR_START_AFTER = "start_after"
+ATTR_END_BEFORE = "end_before"
+ATTR_LOADS = "loads"
+ATTR_EARLIEST_START = "earliest_start"
+ATTR_LATEST_END = "latest_end"
+ATTR_MAX_POWER = "max_power"
+ATTR_CAPACITY = "capacity"
+ATTR_CHARGE_POWER = "charge_power"
+ATTR_DISCHARGE_POWER = "discharge_power"
+ATTR_EFFICIENCY = "efficiency"
+ATTR_SOC = "soc"
+ATTR_SOC_STEPS = "soc_steps"
+ATTR_LOAD = "load"
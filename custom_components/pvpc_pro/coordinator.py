@@ -4,26 +4,87 @@ Maintains the connection with ESIOS API and manages data refresh.
 Updated by Javisen - 2026.
 """
 
-from datetime import timedelta
+from collections.abc import Callable
+from datetime import datetime, timedelta
 import logging
+from typing import Any
 
-from .aiopvpc import BadApiTokenAuthError, EsiosApiData, PVPCData
-from .aiopvpc.const import KEY_ADJUSTMENT, KEY_INDEXED, KEY_PVPC
+from .aiopvpc import (
+    BadApiTokenAuthError,
+    EsiosApiData,
+    HistoryStore,
+    PVPCData,
+    SharedFetchCache,
+)
+from .aiopvpc.const import (
+    DEFAULT_HISTORY_DB_NAME,
+    DEFAULT_UPDATE_INTERVAL_MINUTES,
+    KEY_ADJUSTMENT,
+    KEY_INDEXED,
+    KEY_PVPC,
+    REFERENCE_TZ,
+)
+from .aiopvpc.update_plan import has_prices_for_day
+from .aiopvpc.utils import esios_data_from_dict, esios_data_to_dict
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_API_TOKEN
-from homeassistant.core import HomeAssistant
+from homeassistant.const import CONF_API_TOKEN, EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.util import dt as dt_util
 
-from .const import ATTR_POWER, ATTR_POWER_P3, ATTR_TARIFF, DOMAIN
+from .const import (
+    ATTR_POWER,
+    ATTR_POWER_P3,
+    ATTR_TARIFF,
+    DATA_FETCH_CACHE,
+    DATA_HISTORY_STORE,
+    DOMAIN,
+    EVENT_TOMORROW_PRICES_AVAILABLE,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
 type PVPCConfigEntry = ConfigEntry[ElecPricesDataUpdateCoordinator]
 
+DEFAULT_UPDATE_INTERVAL = timedelta(minutes=DEFAULT_UPDATE_INTERVAL_MINUTES)
+MIN_UPDATE_INTERVAL = timedelta(seconds=30)
+# prices change at o'clock, or at quarter-hours for 15-minute prices
+TICK_MINUTES = [0, 15, 30, 45]
+
+TickListener = Callable[[datetime], None]
+
+
+def get_shared_fetch_cache(hass: HomeAssistant) -> SharedFetchCache:
+    """Return the fetch cache shared by all config entries."""
+    if DATA_FETCH_CACHE not in hass.data:
+        hass.data[DATA_FETCH_CACHE] = SharedFetchCache()
+    return hass.data[DATA_FETCH_CACHE]
+
+
+def get_history_store(hass: HomeAssistant) -> HistoryStore:
+    """Return the local history store shared by all config entries."""
+    if DATA_HISTORY_STORE not in hass.data:
+        store = HistoryStore(hass.config.path(DEFAULT_HISTORY_DB_NAME))
+
+        async def _async_close_store(_event: Event) -> None:
+            await store.async_close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_close_store)
+        hass.data[DATA_HISTORY_STORE] = store
+    return hass.data[DATA_HISTORY_STORE]
+
+
+def make_data_store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    """Make the store for the data snapshot of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+
 
 class ElecPricesDataUpdateCoordinator(DataUpdateCoordinator[EsiosApiData]):
     """Class to manage fetching Electricity prices data from API."""
@@ -58,25 +119,121 @@ class ElecPricesDataUpdateCoordinator(DataUpdateCoordinator[EsiosApiData]):
             power_valley=config[ATTR_POWER_P3],
             api_token=config.get(CONF_API_TOKEN),
             sensor_keys=tuple(final_keys),
+            shared_cache=get_shared_fetch_cache(hass),
+            history=get_history_store(hass),
         )
 
         super().__init__(
             hass,
             _LOGGER,
             config_entry=entry,
-            name=DOMAIN, 
-            update_interval=timedelta(minutes=5),
+            name=DOMAIN,
+            update_interval=DEFAULT_UPDATE_INTERVAL,
         )
+        self._store = make_data_store(hass, entry.entry_id)
+        # listeners of the time steps, by sensor key (None for every tick)
+        self._tick_listeners: dict[str | None, list[TickListener]] = {}
+        self._unsub_tick: CALLBACK_TYPE | None = None
 
     @property
     def entry_id(self) -> str:
         """Return entry ID."""
         return self.config_entry.entry_id
 
+    @callback
+    def async_add_tick_listener(
+        self, update_callback: TickListener, sensor_key: str | None = None
+    ) -> CALLBACK_TYPE:
+        """
+        Listen to the start of the time steps, and return a function to stop.
+
+        With a `sensor_key`, the callback only runs when the state or the
+        attributes of that series change. The timer runs while there are
+        listeners, and each series is processed once per tick for all of them.
+        """
+        listeners = self._tick_listeners.setdefault(sensor_key, [])
+        listeners.append(update_callback)
+        if self._unsub_tick is None:
+            self._unsub_tick = async_track_time_change(
+                self.hass, self._async_handle_tick, second=0, minute=TICK_MINUTES
+            )
+
+        @callback
+        def remove_listener() -> None:
+            listeners.remove(update_callback)
+            if not listeners:
+                del self._tick_listeners[sensor_key]
+            if not self._tick_listeners and self._unsub_tick is not None:
+                self._unsub_tick()
+                self._unsub_tick = None
+
+        return remove_listener
+
+    @callback
+    def _async_handle_tick(self, now: datetime) -> None:
+        """Update the series at the start of a time step, and notify the changes."""
+        if self.data is None:
+            return
+        changed = self.api.process_time_step(
+            self.data,
+            [key for key in self._tick_listeners if key is not None],
+            dt_util.as_utc(now),
+        )
+        for sensor_key, listeners in list(self._tick_listeners.items()):
+            if sensor_key is None or sensor_key in changed:
+                for update_callback in list(listeners):
+                    update_callback(now)
+
+    async def async_restore_data(self) -> None:
+        """Load the last data snapshot, so only missing data is downloaded."""
+        if (raw_data := await self._store.async_load()) is None:
+            return
+        try:
+            self.data = esios_data_from_dict(raw_data, dt_util.utcnow())
+        except (KeyError, TypeError, ValueError) as exc:
+            _LOGGER.warning("PVPC Pro: Ignorando datos guardados no válidos (%s)", exc)
+            return
+        _LOGGER.debug(
+            "PVPC Pro: Datos restaurados de %s (%s)",
+            self.data.last_update,
+            ", ".join(
+                f"{key}: {len(prices)}" for key, prices in self.data.sensors.items()
+            ),
+        )
+
+    def _data_to_store(self) -> dict[str, Any]:
+        return esios_data_to_dict(self.data)
+
+    def _get_sensors_with_tomorrow_prices(
+        self, data: EsiosApiData, now: datetime
+    ) -> set[str]:
+        tomorrow = now.astimezone(REFERENCE_TZ).date() + timedelta(days=1)
+        return {
+            sensor_key
+            for sensor_key, prices in data.sensors.items()
+            if has_prices_for_day(prices, tomorrow)
+        }
+
+    def _schedule_next_update(self, now: datetime) -> None:
+        """Wake up only when new data can be available, instead of polling."""
+        if (next_update := self.api.get_next_update_time()) is None:
+            self.update_interval = DEFAULT_UPDATE_INTERVAL
+            return
+        self.update_interval = max(next_update - now, MIN_UPDATE_INTERVAL)
+        _LOGGER.debug("PVPC Pro: Próxima actualización a las %s", next_update)
+
     async def _async_update_data(self) -> EsiosApiData:
         """Update electricity prices from the ESIOS API."""
+        now = dt_util.utcnow()
+        # poll with the default interval until the update succeeds
+        self.update_interval = DEFAULT_UPDATE_INTERVAL
+        with_tomorrow = (
+            None
+            if self.data is None
+            else self._get_sensors_with_tomorrow_prices(self.data, now)
+        )
         try:
-            api_data = await self.api.async_update_all(self.data, dt_util.utcnow())
+            api_data = await self.api.async_update_all(self.data, now)
         except BadApiTokenAuthError as exc:
             _LOGGER.error("Error de autenticación con el Token de ESIOS en PVPC Pro")
             raise ConfigEntryAuthFailed from exc
@@ -99,4 +256,25 @@ class ElecPricesDataUpdateCoordinator(DataUpdateCoordinator[EsiosApiData]):
             )
             raise UpdateFailed
 
+        self._store.async_delay_save(self._data_to_store, STORAGE_SAVE_DELAY)
+        self._schedule_next_update(now)
+        if with_tomorrow is not None:
+            self._notify_tomorrow_prices(api_data, now, with_tomorrow)
         return api_data
+
+    def _notify_tomorrow_prices(
+        self, api_data: EsiosApiData, now: datetime, with_tomorrow: set[str]
+    ) -> None:
+        """Fire an event for each sensor that has just got tomorrow prices."""
+        tomorrow = now.astimezone(REFERENCE_TZ).date() + timedelta(days=1)
+        for sensor_key in sorted(
+            self._get_sensors_with_tomorrow_prices(api_data, now) - with_tomorrow
+        ):
+            self.hass.bus.async_fire(
+                EVENT_TOMORROW_PRICES_AVAILABLE,
+                {
+                    "entry_id": self.entry_id,
+                    "sensor_key": sensor_key,
+                    "date": tomorrow.isoformat(),
+                },
+            )
@@ -0,0 +1,49 @@
+"""
+Diagnostics support for PVPC REE Data.
+Developed and maintained by Javisen.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_API_TOKEN
+from homeassistant.core import HomeAssistant
+
+from .coordinator import PVPCConfigEntry
+
+TO_REDACT = {CONF_API_TOKEN, "unique_id", "title"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: PVPCConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry, with the fetch metrics."""
+    coordinator = entry.runtime_data
+    api = coordinator.api
+    data = coordinator.data
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "data": (
+            None
+            if data is None
+            else {
+                "data_source": data.data_source,
+                "last_update": data.last_update.isoformat(),
+                "availability": dict(data.availability),
+                "num_prices": {
+                    sensor_key: len(prices)
+                    for sensor_key, prices in data.sensors.items()
+                },
+            }
+        ),
+        "next_update": (
+            None
+            if (next_update := api.get_next_update_time()) is None
+            else next_update.isoformat()
+        ),
+        "bytes_downloaded": api.bytes_downloaded,
+        "request_stats": api.request_stats,
+        "metrics": api.metrics.as_dict(),
+    }
@@ -4,6 +4,9 @@ Developed by Javisen.
 Relates sensors keys with Home Assistant unique IDs.
 """
 
+from collections.abc import Iterable
+from datetime import timedelta
+
 from .aiopvpc.const import (
     ALL_SENSORS,
     KEY_ADJUSTMENT,
@@ -21,6 +24,8 @@ from .aiopvpc.const import (
 
 from homeassistant.helpers.entity_registry import RegistryEntry
 
+MAX_WINDOW_DURATION = timedelta(hours=24)
+
 _ha_uniqueid_to_sensor_key = {
     TARIFFS[0]: KEY_PVPC,
     TARIFFS[1]: KEY_PVPC,
@@ -71,3 +76,14 @@ def make_sensor_unique_id(config_entry_id: str | None, sensor_key: str) -> str:
     if sensor_key == KEY_PVPC:
         return config_entry_id
     return f"{config_entry_id}_{sensor_key}"
+
+
+def parse_window_durations(hours: Iterable[str]) -> list[timedelta]:
+    """Parse the durations (in hours) of the cheapest windows to follow."""
+    durations = set()
+    for value in hours:
+        duration = timedelta(hours=float(str(value).replace(",", ".")))
+        if not timedelta(0) < duration <= MAX_WINDOW_DURATION:
+            raise ValueError(f"Invalid window duration: {value}")
+        durations.add(duration)
+    return sorted(durations)
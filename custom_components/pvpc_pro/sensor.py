@@ -6,12 +6,16 @@ Developed and maintained by Javisen.
 
 from __future__ import annotations
 
-from collections.abc import Mapping
-from datetime import datetime
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 import logging
+import re
 from typing import Any
 
+from .aiopvpc import Battery, BatteryPlan, CostAccumulator
 from .aiopvpc.const import (
+    DEFAULT_BATTERY_SOC_STEPS,
     KEY_INJECTION,
     KEY_MAG,
     KEY_OMIE,
@@ -20,24 +24,59 @@ from .aiopvpc.const import (
     KEY_CO2,
     KEY_DEMAND,
     KEY_RENEWABLES,
+    MAX_COST_READING_SPAN,
+    TARIFFS,
 )
+from .aiopvpc.metrics import IndicatorMetrics
+from .aiopvpc.pvpc_tariff import get_current_and_next_tariff_periods
+from .aiopvpc.series import PriceSeries
+from .aiopvpc.utils import floor_to_resolution, get_series_resolution
+from .aiopvpc.windows import PriceWindow, find_cheapest_window
 
 from homeassistant.components.sensor import (
+    SensorDeviceClass,
     SensorEntity,
     SensorEntityDescription,
     SensorStateClass,
 )
-from homeassistant.const import CURRENCY_EURO, UnitOfEnergy
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import (
+    ATTR_UNIT_OF_MEASUREMENT,
+    CURRENCY_EURO,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
+    EntityCategory,
+    UnitOfEnergy,
+    UnitOfInformation,
+    UnitOfTime,
+)
+from homeassistant.core import Event, EventStateChangedData, HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
-from homeassistant.helpers.event import async_track_time_change
+from homeassistant.helpers.restore_state import ExtraStoredData, RestoreEntity
+from homeassistant.helpers.event import (
+    async_track_state_change_event,
+    async_track_time_change,
+)
 from homeassistant.helpers.typing import StateType
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
-from .const import DOMAIN
+from .const import (
+    CONF_BATTERY_CAPACITY,
+    CONF_BATTERY_EFFICIENCY,
+    CONF_BATTERY_POWER,
+    CONF_BATTERY_SOC_ENTITY,
+    CONF_BATTERY_SOC_STEPS,
+    CONF_BILLING_DAY,
+    CONF_CHEAPEST_WINDOWS,
+    CONF_COMPACT_ATTRIBUTES,
+    CONF_COST_INDICATOR,
+    CONF_ENERGY_ENTITY,
+    DEFAULT_BATTERY_EFFICIENCY,
+    DOMAIN,
+)
 from .coordinator import ElecPricesDataUpdateCoordinator, PVPCConfigEntry
-from .helpers import make_sensor_unique_id
+from .helpers import make_sensor_unique_id, parse_window_durations
 
 _LOGGER = logging.getLogger(__name__)
 PARALLEL_UPDATES = 1
@@ -118,6 +157,83 @@ SENSOR_TYPES: tuple[SensorEntityDescription, ...] = (
     ),
 )
 
+
+@dataclass(frozen=True, kw_only=True)
+class FetchMetricsSensorEntityDescription(SensorEntityDescription):
+    """Description of a diagnostic sensor of the fetch and processing metrics."""
+
+    value_fn: Callable[[IndicatorMetrics], StateType]
+    # breakdown of the metric for all indicators
+    extra_fn: Callable[[IndicatorMetrics], dict[str, Any]] | None = None
+
+
+def _round_ms(value: float | None) -> float | None:
+    return None if value is None else round(value, 3)
+
+
+FETCH_METRICS_SENSOR_TYPES: tuple[FetchMetricsSensorEntityDescription, ...] = (
+    FetchMetricsSensorEntityDescription(
+        key="fetch_requests",
+        icon="mdi:api",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        name="PVPC Peticiones API",
+        value_fn=lambda metrics: metrics.requests,
+        extra_fn=lambda metrics: {
+            "status_codes": metrics.as_dict()["status_codes"],
+            "decode_errors": metrics.decode_errors,
+        },
+    ),
+    FetchMetricsSensorEntityDescription(
+        key="fetch_bytes",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        name="PVPC Datos Descargados",
+        value_fn=lambda metrics: metrics.bytes_received,
+    ),
+    FetchMetricsSensorEntityDescription(
+        key="fetch_latency",
+        icon="mdi:timer-outline",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+        name="PVPC Latencia API",
+        value_fn=lambda metrics: _round_ms(metrics.average_latency_ms),
+        extra_fn=lambda metrics: {
+            "latency_histogram": metrics.as_dict()["latency_histogram"]
+        },
+    ),
+    FetchMetricsSensorEntityDescription(
+        key="parse_time",
+        icon="mdi:code-json",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=2,
+        name="PVPC Tiempo de Analisis",
+        value_fn=lambda metrics: _round_ms(metrics.average_parse_ms),
+    ),
+    FetchMetricsSensorEntityDescription(
+        key="attributes_time",
+        icon="mdi:format-list-bulleted",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=2,
+        name="PVPC Tiempo de Atributos",
+        value_fn=lambda metrics: _round_ms(metrics.average_attributes_ms),
+    ),
+    FetchMetricsSensorEntityDescription(
+        key="skipped_downloads",
+        icon="mdi:download-off",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        name="PVPC Descargas Evitadas",
+        value_fn=lambda metrics: sum(metrics.skipped.values()),
+        extra_fn=lambda metrics: {"reasons": dict(sorted(metrics.skipped.items()))},
+    ),
+)
+
 _PRICE_SENSOR_ATTRIBUTES_MAP = {
     "data_id": "data_id",
     "name": "data_name",
@@ -197,6 +313,15 @@ _PRICE_SENSOR_ATTRIBUTES_MAP = {
     "price_next_day_22h": "price_next_day_22h",
     "price_next_day_23h": "price_next_day_23h",
 }
+# hourly price tags, as `price_00h`, `price_02h_d` or `price_next_day_23h`
+_PRICE_TAG_PATTERN = re.compile(r"price_(next_day_)?\d{2}h(_d)?")
+# with compact attributes, the prices of each day go in arrays
+ATTR_PRICES_TODAY = "prices_today"
+ATTR_PRICES_TOMORROW = "prices_tomorrow"
+_COMPACT_UNRECORDED_ATTRIBUTES = frozenset(
+    {ATTR_PRICES_TODAY, ATTR_PRICES_TOMORROW, "next_best_at"}
+)
+_NO_ATTRIBUTES: Mapping[str, Any] = {}
 
 
 async def async_setup_entry(
@@ -206,19 +331,84 @@ async def async_setup_entry(
 ) -> None:
     """Set up the electricity price sensor from config_entry."""
     coordinator = entry.runtime_data
+    price_sensor_class = (
+        CompactElecPriceSensor
+        if entry.options.get(CONF_COMPACT_ATTRIBUTES)
+        else ElecPriceSensor
+    )
     sensors = [
-        ElecPriceSensor(coordinator, SENSOR_TYPES[0], entry.unique_id),
-        ElecPriceSensor(coordinator, SENSOR_TYPES[1], entry.unique_id),
-        ElecPriceSensor(coordinator, SENSOR_TYPES[3], entry.unique_id),
+        price_sensor_class(coordinator, SENSOR_TYPES[0], entry.unique_id),
+        price_sensor_class(coordinator, SENSOR_TYPES[1], entry.unique_id),
+        price_sensor_class(coordinator, SENSOR_TYPES[3], entry.unique_id),
     ]
     if coordinator.api.using_private_api:
-        sensors.append(ElecPriceSensor(coordinator, SENSOR_TYPES[2], entry.unique_id))
+        sensors.append(
+            price_sensor_class(coordinator, SENSOR_TYPES[2], entry.unique_id)
+        )
         sensors.extend(
-            ElecPriceSensor(coordinator, s, entry.unique_id) for s in SENSOR_TYPES[4:]
+            price_sensor_class(coordinator, s, entry.unique_id)
+            for s in SENSOR_TYPES[4:]
+        )
+    sensors.extend(
+        CheapestWindowSensor(coordinator, duration, entry.unique_id)
+        for duration in parse_window_durations(
+            entry.options.get(CONF_CHEAPEST_WINDOWS, [])
+        )
+    )
+    options = entry.options
+    if options.get(CONF_BATTERY_CAPACITY) and options.get(CONF_BATTERY_SOC_ENTITY):
+        battery = Battery(
+            capacity=options[CONF_BATTERY_CAPACITY],
+            charge_power=options[CONF_BATTERY_POWER],
+            discharge_power=options[CONF_BATTERY_POWER],
+            efficiency=options.get(CONF_BATTERY_EFFICIENCY, DEFAULT_BATTERY_EFFICIENCY)
+            / 100,
+            soc_steps=int(
+                options.get(CONF_BATTERY_SOC_STEPS, DEFAULT_BATTERY_SOC_STEPS)
+            ),
+        )
+        sensors.append(
+            BatteryActionSensor(
+                coordinator,
+                battery,
+                options[CONF_BATTERY_SOC_ENTITY],
+                entry.unique_id,
+            )
+        )
+    if options.get(CONF_ENERGY_ENTITY):
+        sensors.append(
+            EnergyCostSensor(
+                coordinator,
+                options[CONF_ENERGY_ENTITY],
+                options.get(CONF_COST_INDICATOR, KEY_PVPC),
+                int(options.get(CONF_BILLING_DAY, 1)),
+                entry.unique_id,
+            )
         )
+    sensors.extend(
+        FetchMetricsSensor(coordinator, description, entry.unique_id)
+        for description in FETCH_METRICS_SENSOR_TYPES
+    )
     async_add_entities(sensors)
 
 
+_ENERGY_UNIT_TO_KWH = {
+    UnitOfEnergy.WATT_HOUR: 0.001,
+    UnitOfEnergy.KILO_WATT_HOUR: 1.0,
+    UnitOfEnergy.MEGA_WATT_HOUR: 1000.0,
+}
+
+
+def _make_device_info(coordinator: ElecPricesDataUpdateCoordinator) -> DeviceInfo:
+    return DeviceInfo(
+        configuration_url="https://api.esios.ree.es",
+        entry_type=DeviceEntryType.SERVICE,
+        identifiers={(DOMAIN, coordinator.entry_id)},
+        manufacturer="REE",
+        name="PVPC REE Data (Pro)",
+    )
+
+
 class ElecPriceSensor(CoordinatorEntity[ElecPricesDataUpdateCoordinator], SensorEntity):
     """Class to hold the prices of electricity as a sensor."""
 
@@ -252,13 +442,10 @@ class ElecPriceSensor(CoordinatorEntity[ElecPricesDataUpdateCoordinator], Sensor
             self.entity_id = f"sensor.{slug}"
         # ----------------------------------------
 
-        self._attr_device_info = DeviceInfo(
-            configuration_url="https://api.esios.ree.es",
-            entry_type=DeviceEntryType.SERVICE,
-            identifiers={(DOMAIN, coordinator.entry_id)},
-            manufacturer="REE",
-            name="PVPC REE Data (Pro)",
-        )
+        self._attr_device_info = _make_device_info(coordinator)
+        # attributes of the API handler, and their filtered mapping
+        self._source_attributes: Mapping[str, Any] | None = None
+        self._attributes: Mapping[str, Any] = _NO_ATTRIBUTES
 
     @property
     def available(self) -> bool:
@@ -283,22 +470,14 @@ class ElecPriceSensor(CoordinatorEntity[ElecPricesDataUpdateCoordinator], Sensor
             lambda: self.coordinator.api.update_active_sensors(source_key, False)
         )
         self.async_on_remove(
-            async_track_time_change(
-                self.hass, self.update_current_price, second=[0], minute=[0]
+            self.coordinator.async_add_tick_listener(
+                self.update_current_price, source_key
             )
         )
 
     @callback
     def update_current_price(self, now: datetime) -> None:
-        """Update the sensor state."""
-        source_key = (
-            KEY_PVPC
-            if self.entity_description.key == KEY_PERIOD
-            else self.entity_description.key
-        )
-        self.coordinator.api.process_state_and_attributes(
-            self.coordinator.data, source_key, now
-        )
+        """Write the new state, when the current price of its series changes."""
         self.async_write_ha_state()
 
     @property
@@ -310,16 +489,451 @@ class ElecPriceSensor(CoordinatorEntity[ElecPricesDataUpdateCoordinator], Sensor
             )
         return self.coordinator.api.states.get(self.entity_description.key)
 
+    def _filter_attributes(self, attrs: Mapping[str, Any]) -> Mapping[str, Any]:
+        return {
+            _PRICE_SENSOR_ATTRIBUTES_MAP[k]: v
+            for k, v in attrs.items()
+            if k in _PRICE_SENSOR_ATTRIBUTES_MAP
+        }
+
     @property
     def extra_state_attributes(self) -> Mapping[str, Any]:
-        """Return the state attributes."""
+        """
+        Return the state attributes.
+
+        The API handler makes new attributes when prices or time steps change,
+        so the filtered mapping is reused for the state writes in between.
+        """
         if self.entity_description.key == KEY_PERIOD:
-            return {}
+            return _NO_ATTRIBUTES
         attrs = self.coordinator.api.sensor_attributes.get(
-            self.entity_description.key, {}
+            self.entity_description.key, _NO_ATTRIBUTES
+        )
+        if attrs is not self._source_attributes:
+            self._source_attributes = attrs
+            self._attributes = self._filter_attributes(attrs)
+        return self._attributes
+
+
+class CompactElecPriceSensor(ElecPriceSensor):
+    """
+    Price sensor with compact attributes.
+
+    The hourly prices of today and tomorrow go in two arrays, instead of one
+    attribute per hour, and the statistics of tomorrow are left out.
+    The arrays and the best hours are not recorded, to keep the database small.
+    """
+
+    _unrecorded_attributes = _COMPACT_UNRECORDED_ATTRIBUTES
+
+    def _filter_attributes(self, attrs: Mapping[str, Any]) -> Mapping[str, Any]:
+        compact: dict[str, Any] = {}
+        prices_today: list[float] = []
+        prices_tomorrow: list[float] = []
+        for key, value in attrs.items():
+            if (match := _PRICE_TAG_PATTERN.fullmatch(key)) is not None:
+                (prices_tomorrow if match.group(1) else prices_today).append(value)
+            elif key in _PRICE_SENSOR_ATTRIBUTES_MAP and not key.endswith(
+                " (next day)"
+            ):
+                compact[_PRICE_SENSOR_ATTRIBUTES_MAP[key]] = value
+        compact[ATTR_PRICES_TODAY] = prices_today
+        compact[ATTR_PRICES_TOMORROW] = prices_tomorrow
+        return compact
+
+
+class CheapestWindowSensor(
+    CoordinatorEntity[ElecPricesDataUpdateCoordinator], SensorEntity
+):
+    """Start of the cheapest PVPC window of some duration, from now on."""
+
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_icon = "mdi:timer-sand"
+    _attr_has_entity_name = False
+
+    def __init__(
+        self,
+        coordinator: ElecPricesDataUpdateCoordinator,
+        duration: timedelta,
+        unique_id: str | None,
+    ) -> None:
+        """Initialize the sensor for a window duration."""
+        super().__init__(coordinator)
+        self._duration = duration
+        self._window: PriceWindow | None = None
+        hours = f"{duration.total_seconds() / 3600:g}"
+        self._attr_attribution = coordinator.api.attribution
+        self._attr_unique_id = (
+            f"{unique_id}_cheapest_window_{int(duration.total_seconds()) // 60}"
+        )
+        self._attr_name = f"Ventana más barata {hours} h"
+        self.entity_id = f"sensor.ventana_mas_barata_{hours.replace('.', '_')}h"
+        self._attr_device_info = _make_device_info(coordinator)
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return self.coordinator.data.availability.get(KEY_PVPC, False)
+
+    async def async_added_to_hass(self) -> None:
+        """Handle entity which will be added."""
+        await super().async_added_to_hass()
+        self._update_window(dt_util.utcnow())
+        self.async_on_remove(
+            self.coordinator.async_add_tick_listener(self.update_window)
+        )
+
+    def _update_window(self, now: datetime) -> None:
+        prices = self.coordinator.data.sensors.get(KEY_PVPC)
+        if not prices:
+            self._window = None
+            return
+        # the current time step is still a valid start
+        self._window = find_cheapest_window(
+            prices,
+            self._duration,
+            start_after=floor_to_resolution(now, get_series_resolution(prices)),
         )
+
+    @callback
+    def update_window(self, now: datetime) -> None:
+        """Update the window, as time steps go by."""
+        self._update_window(dt_util.as_utc(now))
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Update the window with new prices."""
+        self._update_window(dt_util.utcnow())
+        super()._handle_coordinator_update()
+
+    @property
+    def native_value(self) -> datetime | None:
+        """Return the start of the window."""
+        return self._window.start if self._window is not None else None
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        """Return the end and the average price of the window."""
+        if self._window is None:
+            return {}
         return {
-            _PRICE_SENSOR_ATTRIBUTES_MAP[k]: v
-            for k, v in attrs.items()
-            if k in _PRICE_SENSOR_ATTRIBUTES_MAP
+            "end": self._window.end.isoformat(),
+            "average_price": self._window.average_price,
+            "duration_hours": self._duration.total_seconds() / 3600,
+        }
+
+
+class BatteryActionSensor(
+    CoordinatorEntity[ElecPricesDataUpdateCoordinator], SensorEntity
+):
+    """Planned action of the home battery for the current time step."""
+
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = ["charge", "discharge", "idle"]
+    _attr_icon = "mdi:home-battery"
+    _attr_has_entity_name = False
+
+    def __init__(
+        self,
+        coordinator: ElecPricesDataUpdateCoordinator,
+        battery: Battery,
+        soc_entity_id: str,
+        unique_id: str | None,
+    ) -> None:
+        """Initialize the sensor for a battery."""
+        super().__init__(coordinator)
+        self._battery = battery
+        self._soc_entity_id = soc_entity_id
+        self._plan: BatteryPlan | None = None
+        self._planned_soc_level: int | None = None
+        self._attr_attribution = coordinator.api.attribution
+        self._attr_unique_id = f"{unique_id}_battery_action"
+        self._attr_name = "Acción batería"
+        self.entity_id = "sensor.accion_bateria"
+        self._attr_device_info = _make_device_info(coordinator)
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return self.coordinator.data.availability.get(KEY_PVPC, False)
+
+    async def async_added_to_hass(self) -> None:
+        """Handle entity which will be added."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_tick_listener(self._async_schedule_plan_update)
+        )
+        self.async_on_remove(
+            async_track_state_change_event(
+                self.hass, [self._soc_entity_id], self._async_soc_changed
+            )
+        )
+        await self._async_update_plan()
+
+    def _get_soc(self) -> float | None:
+        """Return the state of charge (0 to 1) from its sensor."""
+        if (state := self.hass.states.get(self._soc_entity_id)) is None:
+            return None
+        try:
+            return min(100.0, max(0.0, float(state.state))) / 100
+        except ValueError:
+            return None
+
+    async def _async_update_plan(self) -> None:
+        soc = self._get_soc()
+        if soc is None or not self.coordinator.data.sensors.get(KEY_PVPC):
+            self._plan = self._planned_soc_level = None
+        else:
+            self._planned_soc_level = round(soc * self._battery.soc_steps)
+            self._plan = await self.coordinator.api.async_optimize_battery(
+                self.coordinator.data, self._battery, soc, dt_util.utcnow()
+            )
+        self.async_write_ha_state()
+
+    @callback
+    def _async_schedule_plan_update(self, *_: Any) -> None:
+        self.hass.async_create_task(self._async_update_plan())
+
+    @callback
+    def _async_soc_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Plan again only when the state of charge changes of level."""
+        soc = self._get_soc()
+        level = None if soc is None else round(soc * self._battery.soc_steps)
+        if level != self._planned_soc_level:
+            self._async_schedule_plan_update()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Plan again with new prices."""
+        self._async_schedule_plan_update()
+
+    @property
+    def native_value(self) -> str | None:
+        """Return the planned action for now."""
+        return self._plan.current_action if self._plan is not None else None
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        """Return the details of the plan."""
+        if self._plan is None or not self._plan.steps:
+            return {}
+        current = self._plan.steps[0]
+        next_change = next(
+            (step.start for step in self._plan.steps if step.action != current.action),
+            None,
+        )
+        return {
+            "energy": current.energy,
+            "target_soc": round(100 * current.soc, 1),
+            "next_change_at": next_change.isoformat() if next_change else None,
+            "plan_cost": self._plan.cost,
+            "plan_savings": self._plan.savings,
+        }
+
+
+class CostAccumulatorData(ExtraStoredData):
+    """Totals of the energy cost sensor, to restore them."""
+
+    def __init__(self, accumulator: CostAccumulator) -> None:
+        """Initialize the stored data."""
+        self._accumulator = accumulator
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a dict representation of the totals."""
+        return self._accumulator.as_dict()
+
+
+class EnergyCostSensor(
+    CoordinatorEntity[ElecPricesDataUpdateCoordinator], SensorEntity, RestoreEntity
+):
+    """Cost of the energy of a meter, for today, month and billing period."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_native_unit_of_measurement = CURRENCY_EURO
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:cash-multiple"
+    _attr_has_entity_name = False
+
+    def __init__(
+        self,
+        coordinator: ElecPricesDataUpdateCoordinator,
+        energy_entity_id: str,
+        price_key: str,
+        billing_day: int,
+        unique_id: str | None,
+    ) -> None:
+        """Initialize the sensor for an energy meter."""
+        super().__init__(coordinator)
+        self._energy_entity_id = energy_entity_id
+        self._price_key = price_key
+        self._billing_day = billing_day
+        self._accumulator = CostAccumulator(billing_day)
+        # the recent prices, as the energy of a reading can be from the previous day
+        self._recent_prices = PriceSeries()
+        self._attr_attribution = coordinator.api.attribution
+        self._attr_unique_id = f"{unique_id}_energy_cost"
+        self._attr_name = "Coste Energía"
+        self.entity_id = "sensor.coste_energia"
+        self._attr_device_info = _make_device_info(coordinator)
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the totals, and follow the energy meter."""
+        await super().async_added_to_hass()
+        if (last_data := await self.async_get_last_extra_data()) is not None:
+            try:
+                self._accumulator = CostAccumulator.from_dict(
+                    last_data.as_dict(), self._billing_day
+                )
+            except (KeyError, TypeError, ValueError) as exc:
+                _LOGGER.warning(
+                    "PVPC Pro: Ignorando totales de coste no válidos (%s)", exc
+                )
+        self._accumulator.roll_over(dt_util.now())
+        self._update_recent_prices()
+        self.async_on_remove(
+            async_track_state_change_event(
+                self.hass, [self._energy_entity_id], self._async_meter_changed
+            )
+        )
+        self.async_on_remove(
+            async_track_time_change(
+                self.hass, self._async_day_started, hour=0, minute=0, second=0
+            )
+        )
+
+    @property
+    def extra_restore_state_data(self) -> CostAccumulatorData:
+        """Return the totals to restore."""
+        return CostAccumulatorData(self._accumulator)
+
+    def _update_recent_prices(self) -> None:
+        """Keep the new prices, and those of the last readings."""
+        if self.coordinator.data is not None and (
+            prices := self.coordinator.data.sensors.get(self._price_key)
+        ):
+            self._recent_prices.update(prices)
+        self._recent_prices.drop_before(dt_util.utcnow() - MAX_COST_READING_SPAN)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Keep the new prices."""
+        self._update_recent_prices()
+        super()._handle_coordinator_update()
+
+    def _get_price(self, utc_time: datetime) -> float | None:
+        """Return the price for the time step of a UTC time."""
+        prices = self._recent_prices
+        if not prices:
+            return None
+        return prices.get(floor_to_resolution(utc_time, get_series_resolution(prices)))
+
+    @callback
+    def _async_meter_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Add the energy since the last reading, with the prices of its steps."""
+        new_state = event.data["new_state"]
+        if new_state is None or new_state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return
+        try:
+            reading = float(new_state.state) * _ENERGY_UNIT_TO_KWH.get(
+                new_state.attributes.get(ATTR_UNIT_OF_MEASUREMENT), 1.0
+            )
+        except ValueError:
+            return
+        self._accumulator.add_reading(
+            reading,
+            dt_util.now(),
+            self._get_price,
+            self._get_tariff_period,
+            get_series_resolution(self._recent_prices),
+        )
+        self.async_write_ha_state()
+
+    def _get_tariff_period(self, local_time: datetime) -> str:
+        """Return the tariff period at a local time."""
+        period, _, _ = get_current_and_next_tariff_periods(
+            local_time, zone_ceuta_melilla=self.coordinator.api.tariff != TARIFFS[0]
+        )
+        return period
+
+    @callback
+    def _async_day_started(self, now: datetime) -> None:
+        """Start the totals of the new day, month or billing period."""
+        if self._accumulator.roll_over(dt_util.as_local(now)):
+            self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the cost of today."""
+        if (today := self._accumulator.totals.get("today")) is None:
+            return None
+        return round(today.total_cost, 5)
+
+    @property
+    def last_reset(self) -> datetime | None:
+        """Return the start of today."""
+        if (today := self._accumulator.totals.get("today")) is None:
+            return None
+        return dt_util.start_of_local_day(today.start)
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        """Return the totals by scope and tariff period."""
+        return {
+            "energy_entity": self._energy_entity_id,
+            "indicator": self._price_key,
+            **self._accumulator.as_attributes(),
+        }
+
+
+class FetchMetricsSensor(
+    CoordinatorEntity[ElecPricesDataUpdateCoordinator], SensorEntity
+):
+    """
+    Diagnostic sensor of the downloads and processing of the ESIOS data.
+
+    The state is for all indicators together, with the value of each one
+    in the attributes. Metrics start again when Home Assistant restarts.
+    """
+
+    entity_description: FetchMetricsSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_has_entity_name = False
+
+    def __init__(
+        self,
+        coordinator: ElecPricesDataUpdateCoordinator,
+        description: FetchMetricsSensorEntityDescription,
+        unique_id: str | None,
+    ) -> None:
+        """Initialize the sensor for a metric."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_unique_id = f"{unique_id}_{description.key}"
+        self._attr_name = description.name
+        self.entity_id = f"sensor.{str(description.name).lower().replace(' ', '_')}"
+        self._attr_device_info = _make_device_info(coordinator)
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available (metrics are, even without data)."""
+        return True
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the metric for all indicators."""
+        return self.entity_description.value_fn(self.coordinator.api.metrics.merged())
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        """Return the metric of each indicator, and its breakdown."""
+        metrics = self.coordinator.api.metrics
+        attributes: dict[str, Any] = {
+            sensor_key: self.entity_description.value_fn(indicator_metrics)
+            for sensor_key, indicator_metrics in sorted(metrics.indicators.items())
         }
+        if self.entity_description.extra_fn is not None:
+            attributes.update(self.entity_description.extra_fn(metrics.merged()))
+        return attributes
@@ -0,0 +1,385 @@
+"""
+Services for PVPC REE Data.
+Developed and maintained by Javisen.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_NAME
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv, selector
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import dt as dt_util
+
+from .aiopvpc import Battery, Load
+from .aiopvpc.const import (
+    ALL_SENSORS,
+    DEFAULT_BATTERY_SOC_STEPS,
+    KEY_INDEXED,
+    KEY_PERIOD,
+    KEY_PVPC,
+    REFERENCE_TZ,
+    SENSOR_KEY_TO_DATAID,
+)
+from .aiopvpc.utils import floor_to_resolution, get_series_resolution
+from .aiopvpc.windows import find_cheapest_window
+from .const import (
+    ATTR_CAPACITY,
+    ATTR_CHARGE_POWER,
+    ATTR_CONFIG_ENTRY,
+    ATTR_DISCHARGE_POWER,
+    ATTR_DURATION,
+    ATTR_EARLIEST_START,
+    ATTR_EFFICIENCY,
+    ATTR_END,
+    ATTR_END_BEFORE,
+    ATTR_INDICATOR,
+    ATTR_LATEST_END,
+    ATTR_LOAD,
+    ATTR_LOADS,
+    ATTR_MAX_POWER,
+    ATTR_POWER,
+    ATTR_SOC,
+    ATTR_SOC_STEPS,
+    ATTR_START,
+    ATTR_START_AFTER,
+    DEFAULT_BATTERY_EFFICIENCY,
+    DOMAIN,
+    MAX_BACKFILL_DAYS,
+    SERVICE_BACKFILL_HISTORY,
+    SERVICE_FIND_CHEAPEST_WINDOW,
+    SERVICE_GET_HISTORY,
+    SERVICE_OPTIMIZE_BATTERY,
+    SERVICE_SCHEDULE_LOADS,
+    VALID_BATTERY_CAPACITY,
+    VALID_BATTERY_EFFICIENCY,
+    VALID_BATTERY_POWER,
+    VALID_BATTERY_SOC_STEPS,
+)
+from .helpers import MAX_WINDOW_DURATION
+from .coordinator import ElecPricesDataUpdateCoordinator, PVPCConfigEntry
+
+GET_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): selector.ConfigEntrySelector(
+            {"integration": DOMAIN}
+        ),
+        vol.Required(ATTR_INDICATOR): vol.In(list(SENSOR_KEY_TO_DATAID)),
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Required(ATTR_END): cv.datetime,
+    }
+)
+
+BACKFILL_HISTORY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): selector.ConfigEntrySelector(
+            {"integration": DOMAIN}
+        ),
+        vol.Required(ATTR_START): cv.date,
+        vol.Required(ATTR_END): cv.date,
+    }
+)
+
+FIND_CHEAPEST_WINDOW_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): selector.ConfigEntrySelector(
+            {"integration": DOMAIN}
+        ),
+        vol.Required(ATTR_DURATION): vol.All(
+            cv.positive_time_period,
+            vol.Range(min=timedelta(minutes=1), max=MAX_WINDOW_DURATION),
+        ),
+        vol.Optional(ATTR_START_AFTER): cv.datetime,
+        vol.Optional(ATTR_END_BEFORE): cv.datetime,
+        vol.Optional(ATTR_INDICATOR, default=KEY_PVPC): vol.In(
+            [sensor_key for sensor_key in ALL_SENSORS if sensor_key != KEY_PERIOD]
+        ),
+    }
+)
+
+_VALID_LOAD_POWER = vol.All(vol.Coerce(float), vol.Range(min=0.0, max=15.0))
+
+LOAD_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_NAME): cv.string,
+        vol.Required(ATTR_DURATION): vol.All(
+            cv.positive_time_period,
+            vol.Range(min=timedelta(minutes=1), max=MAX_WINDOW_DURATION),
+        ),
+        vol.Required(ATTR_POWER): vol.Any(
+            _VALID_LOAD_POWER, vol.All([_VALID_LOAD_POWER], vol.Length(min=1))
+        ),
+        vol.Optional(ATTR_EARLIEST_START): cv.datetime,
+        vol.Optional(ATTR_LATEST_END): cv.datetime,
+    }
+)
+
+SCHEDULE_LOADS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): selector.ConfigEntrySelector(
+            {"integration": DOMAIN}
+        ),
+        vol.Required(ATTR_LOADS): vol.All(
+            cv.ensure_list, [LOAD_SCHEMA], vol.Length(min=1)
+        ),
+        vol.Optional(ATTR_INDICATOR, default=KEY_PVPC): vol.In([KEY_PVPC, KEY_INDEXED]),
+        vol.Optional(ATTR_MAX_POWER): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    }
+)
+
+OPTIMIZE_BATTERY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY): selector.ConfigEntrySelector(
+            {"integration": DOMAIN}
+        ),
+        vol.Required(ATTR_CAPACITY): vol.All(
+            VALID_BATTERY_CAPACITY, vol.Range(min=0.1)
+        ),
+        vol.Required(ATTR_CHARGE_POWER): VALID_BATTERY_POWER,
+        vol.Optional(ATTR_DISCHARGE_POWER): VALID_BATTERY_POWER,
+        vol.Optional(
+            ATTR_EFFICIENCY, default=DEFAULT_BATTERY_EFFICIENCY
+        ): VALID_BATTERY_EFFICIENCY,
+        vol.Required(ATTR_SOC): vol.All(
+            vol.Coerce(float), vol.Range(min=0.0, max=100.0)
+        ),
+        vol.Optional(ATTR_LOAD): vol.All(
+            cv.ensure_list, [vol.All(vol.Coerce(float), vol.Range(min=0.0))]
+        ),
+        vol.Optional(
+            ATTR_SOC_STEPS, default=DEFAULT_BATTERY_SOC_STEPS
+        ): VALID_BATTERY_SOC_STEPS,
+        vol.Optional(ATTR_INDICATOR, default=KEY_PVPC): vol.In([KEY_PVPC, KEY_INDEXED]),
+    }
+)
+
+
+def _get_coordinator(call: ServiceCall) -> ElecPricesDataUpdateCoordinator:
+    """Get the coordinator of the config entry in the service call."""
+    entry_id: str = call.data[ATTR_CONFIG_ENTRY]
+    entry: PVPCConfigEntry | None = call.hass.config_entries.async_get_entry(entry_id)
+    if entry is None or entry.domain != DOMAIN:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_config_entry",
+            translation_placeholders={"config_entry": entry_id},
+        )
+    if entry.state is not ConfigEntryState.LOADED:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="unloaded_config_entry",
+            translation_placeholders={"config_entry": entry.title},
+        )
+    return entry.runtime_data
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Take naive datetimes in the local time of Home Assistant."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_util.get_default_time_zone())
+    return dt_util.as_utc(value)
+
+
+async def _async_get_history(call: ServiceCall) -> ServiceResponse:
+    """Return the stored prices of an indicator, from the local history."""
+    coordinator = _get_coordinator(call)
+    start = _as_utc(call.data[ATTR_START])
+    end = _as_utc(call.data[ATTR_END])
+    if start >= end:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN, translation_key="invalid_time_range"
+        )
+    series = await coordinator.api.async_get_history(
+        call.data[ATTR_INDICATOR], start, end
+    )
+    # values go from the start of the series buffer, with the gaps as None
+    raw = series.as_dict()
+    return {
+        ATTR_INDICATOR: call.data[ATTR_INDICATOR],
+        ATTR_START: (
+            dt_util.utc_from_timestamp(raw["start"]).isoformat()
+            if raw["values"]
+            else None
+        ),
+        "step": int(series.step.total_seconds()),
+        "values": raw["values"],
+    }
+
+
+async def _async_backfill_history(call: ServiceCall) -> ServiceResponse:
+    """Download a range of days into the local history, resuming previous runs."""
+    coordinator = _get_coordinator(call)
+    start, end = call.data[ATTR_START], call.data[ATTR_END]
+    if start > end:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN, translation_key="invalid_time_range"
+        )
+    # prices are published up to the next day
+    end = min(end, dt_util.now(REFERENCE_TZ).date() + timedelta(days=1))
+    if (end - start).days + 1 > MAX_BACKFILL_DAYS:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="backfill_range_too_long",
+            translation_placeholders={"max_days": str(MAX_BACKFILL_DAYS)},
+        )
+    report = await coordinator.api.async_backfill(
+        start,
+        end,
+        checkpoint_path=call.hass.config.path(
+            STORAGE_DIR, f"{DOMAIN}.{coordinator.entry_id}.backfill"
+        ),
+    )
+    return report.as_dict()
+
+
+async def _async_find_cheapest_window(call: ServiceCall) -> ServiceResponse:
+    """Find the cheapest window of some duration in the downloaded prices."""
+    coordinator = _get_coordinator(call)
+    indicator = call.data[ATTR_INDICATOR]
+    prices = coordinator.data.sensors.get(indicator)
+    if not prices:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="unavailable_indicator",
+            translation_placeholders={"indicator": indicator},
+        )
+    start_after = (
+        _as_utc(call.data[ATTR_START_AFTER])
+        if ATTR_START_AFTER in call.data
+        else floor_to_resolution(dt_util.utcnow(), get_series_resolution(prices))
+    )
+    end_before = (
+        _as_utc(call.data[ATTR_END_BEFORE]) if ATTR_END_BEFORE in call.data else None
+    )
+    if end_before is not None and start_after >= end_before:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN, translation_key="invalid_time_range"
+        )
+    window = find_cheapest_window(
+        prices, call.data[ATTR_DURATION], start_after, end_before
+    )
+    if window is None:
+        return {
+            ATTR_INDICATOR: indicator,
+            "start": None,
+            "end": None,
+            "average_price": None,
+        }
+    return {ATTR_INDICATOR: indicator, **window.as_dict()}
+
+
+def _make_load(raw_load: dict[str, Any]) -> Load:
+    """Make a load to schedule from the service data."""
+    power = raw_load[ATTR_POWER]
+    earliest_start = raw_load.get(ATTR_EARLIEST_START)
+    latest_end = raw_load.get(ATTR_LATEST_END)
+    return Load(
+        name=raw_load[CONF_NAME],
+        duration=raw_load[ATTR_DURATION],
+        power=tuple(power) if isinstance(power, list) else (power,),
+        earliest_start=_as_utc(earliest_start) if earliest_start else None,
+        latest_end=_as_utc(latest_end) if latest_end else None,
+    )
+
+
+async def _async_schedule_loads(call: ServiceCall) -> ServiceResponse:
+    """Find the start times of some loads with the lowest total cost."""
+    coordinator = _get_coordinator(call)
+    indicator = call.data[ATTR_INDICATOR]
+    if not coordinator.data.sensors.get(indicator):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="unavailable_indicator",
+            translation_placeholders={"indicator": indicator},
+        )
+    schedule = await coordinator.api.async_schedule_loads(
+        coordinator.data,
+        [_make_load(raw_load) for raw_load in call.data[ATTR_LOADS]],
+        dt_util.utcnow(),
+        sensor_key=indicator,
+        max_power=call.data.get(ATTR_MAX_POWER),
+    )
+    return {ATTR_INDICATOR: indicator, **schedule.as_dict()}
+
+
+async def _async_optimize_battery(call: ServiceCall) -> ServiceResponse:
+    """Plan the charge and discharge of a home battery."""
+    coordinator = _get_coordinator(call)
+    indicator = call.data[ATTR_INDICATOR]
+    if not coordinator.data.sensors.get(indicator):
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="unavailable_indicator",
+            translation_placeholders={"indicator": indicator},
+        )
+    battery = Battery(
+        capacity=call.data[ATTR_CAPACITY],
+        charge_power=call.data[ATTR_CHARGE_POWER],
+        discharge_power=call.data.get(
+            ATTR_DISCHARGE_POWER, call.data[ATTR_CHARGE_POWER]
+        ),
+        efficiency=call.data[ATTR_EFFICIENCY] / 100,
+        soc_steps=call.data[ATTR_SOC_STEPS],
+    )
+    plan = await coordinator.api.async_optimize_battery(
+        coordinator.data,
+        battery,
+        call.data[ATTR_SOC] / 100,
+        dt_util.utcnow(),
+        sensor_key=indicator,
+        load=call.data.get(ATTR_LOAD),
+    )
+    return {ATTR_INDICATOR: indicator, **plan.as_dict()}
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Set up the services of PVPC REE Data."""
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_HISTORY,
+        _async_get_history,
+        schema=GET_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BACKFILL_HISTORY,
+        _async_backfill_history,
+        schema=BACKFILL_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_FIND_CHEAPEST_WINDOW,
+        _async_find_cheapest_window,
+        schema=FIND_CHEAPEST_WINDOW_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SCHEDULE_LOADS,
+        _async_schedule_loads,
+        schema=SCHEDULE_LOADS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_OPTIMIZE_BATTERY,
+        _async_optimize_battery,
+        schema=OPTIMIZE_BATTERY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )